@@ -2,6 +2,7 @@ from django.shortcuts import render
 from rest_framework.generics import CreateAPIView
 from notify.apps.notifications.models import FailureLog
 from notify.apps.notifications.serializers import DummyAPI1Serializer, DummyAPI2Serializer
+from notify.apps.notifications.threshold import report_failure
 from rest_framework import serializers
 
 def dummy_api1_age_validation_view(request):
@@ -24,12 +25,15 @@ class DummyAPI1(CreateAPIView):
         age = serializer.validated_data.get('age')
         if age < 18:
             failure_details = f"Age validation failed. Provided age: {age} (must be 18 or older)."
-            FailureLog.objects.create(
-                api_name="Dummy API 1",
-                error_message=failure_details,
-                severity="critical",
-                notification_method="none"
-            )
+            # Notify through the shared threshold service; without a rule, just log it as before
+            outcome, _ = report_failure("Dummy API 1", failure_details)
+            if outcome == 'no_rule':
+                FailureLog.objects.create(
+                    api_name="Dummy API 1",
+                    error_message=failure_details,
+                    severity="critical",
+                    notification_method="none"
+                )
             return Response({"message": "Failure logged for age validation."}, status=status.HTTP_201_CREATED)
 
         return Response({"message": "Age is valid."}, status=status.HTTP_200_OK)
@@ -46,13 +50,15 @@ class DummyAPI2(CreateAPIView):
             field_value = serializer.validated_data.get('field_value')
             failure_details = f"Dummy API 2 failed due to invalid data format for 'field_value': {field_value}."
 
-            # Create a failure log
-            FailureLog.objects.create(
-                api_name="Dummy API 2",
-                error_message=failure_details,
-                severity="critical",
-                notification_method="none"
-            )
+            # Notify through the shared threshold service; without a rule, just log it as before
+            outcome, _ = report_failure("Dummy API 2", failure_details)
+            if outcome == 'no_rule':
+                FailureLog.objects.create(
+                    api_name="Dummy API 2",
+                    error_message=failure_details,
+                    severity="critical",
+                    notification_method="none"
+                )
 
             return Response({"message": "Failure logged for data validation."}, status=status.HTTP_201_CREATED)
         except serializers.ValidationError as e:
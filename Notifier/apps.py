@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
+
+
+class NotificationsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'notify.apps.notifications'
+    label = 'notifications'
+
+    def ready(self):
+        # Every process that loads the app, not just those that import the views,
+        # must tell the others when a rule changes.
+        from .models import NotificationRule
+        from .rules import invalidate_rules
+
+        post_save.connect(invalidate_rules, sender=NotificationRule, dispatch_uid="notifier_rules_saved")
+        post_delete.connect(invalidate_rules, sender=NotificationRule, dispatch_uid="notifier_rules_deleted")
@@ -0,0 +1,222 @@
+"""
+Coalescing of suppressed failures.
+
+Once an API is over its notification threshold, identical failures are not
+written one row at a time. The Coalescer groups them in memory by
+(api_name, fingerprint) for NOTIFIER_COALESCE_WINDOW seconds, where the
+fingerprint is the error message with volatile parts (numbers, hex ids, UUIDs,
+quoted values) masked out. Each group is one FailureLog row, marked with the
+fingerprint: it is written (or the open row of the same group, e.g. written by
+another process, is joined through failurelog_coalesce_idx) on the first
+occurrence, its ``occurrences`` count is updated in place every
+NOTIFIER_COALESCE_FLUSH_INTERVAL seconds, and when the window closes one digest
+notification is queued for it.
+
+So a process that stops loses at most the last flush interval of counts, never
+a failure. The process-wide coalescer also flushes every group at interpreter
+exit; digests that were queued but not delivered then are picked up by the
+requeue_notifications command.
+"""
+import atexit
+import hashlib
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils.timezone import now, timedelta
+
+from .dispatch import enqueue_notification
+from .models import FailureLog
+from .rate_counter import get_threshold_engine
+
+logger = logging.getLogger(__name__)
+
+VOLATILE_PATTERNS = [
+    (re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"), "<uuid>"),
+    (re.compile(r"\b0x[0-9a-f]+\b|\b[0-9a-f]{16,}\b"), "<hex>"),
+    (re.compile(r"'[^']*'|\"[^\"]*\""), "<str>"),
+    (re.compile(r"\d+(\.\d+)?"), "<n>"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def normalize_error(error_message):
+    """``error_message`` with ids, numbers and quoted values masked, so repeats of one failure compare equal."""
+    normalized = error_message.strip().lower()
+    for pattern, replacement in VOLATILE_PATTERNS:
+        normalized = pattern.sub(replacement, normalized)
+    return normalized
+
+
+def error_fingerprint(error_message):
+    return hashlib.sha256(normalize_error(error_message).encode()).hexdigest()
+
+
+class FailureGroup:
+    """Occurrences of one (api_name, fingerprint) seen during the current window."""
+
+    def __init__(self, api_name, fingerprint, failure_details, notification_method, opened_at):
+        self.api_name = api_name
+        self.fingerprint = fingerprint
+        self.failure_details = failure_details  # First occurrence, kept as the sample message
+        self.notification_method = notification_method
+        self.opened_at = opened_at
+        self.first_seen = self.last_seen = now()
+        self.occurrences = 0
+        self.unsaved = 0  # Occurrences not yet added to the row
+        self.log_id = None
+        self.lock = threading.Lock()  # Serializes writes of this group's row
+
+    def add(self):
+        self.occurrences += 1
+        self.unsaved += 1
+        self.last_seen = now()
+
+    @property
+    def digest(self):
+        return (f"{self.occurrences} occurrence(s) between {self.first_seen:%Y-%m-%d %H:%M:%S} and "
+                f"{self.last_seen:%Y-%m-%d %H:%M:%S}: {self.failure_details}")
+
+
+class Coalescer:
+    def __init__(self, window=60, flush_interval=1.0):
+        self.window = window
+        self.flush_interval = flush_interval
+        self._groups = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="notifier-coalescer", daemon=True)
+            self._thread.start()
+
+    def add(self, api_name, failure_details, notification_method):
+        """
+        Count one occurrence of a suppressed failure. Returns the number of
+        occurrences in its group so far (1 means a new group was opened).
+        """
+        self.start()
+        key = (api_name, error_fingerprint(failure_details))
+        with self._lock:
+            group = self._groups.get(key)
+            opened = group is None
+            if opened:
+                group = self._groups[key] = FailureGroup(*key, failure_details, notification_method, time.monotonic())
+            group.add()
+            occurrences = group.occurrences
+        if opened:
+            # Persist the group right away so a restart cannot lose it
+            self.save(group)
+        return occurrences
+
+    def pending(self):
+        with self._lock:
+            return sum(group.occurrences for group in self._groups.values())
+
+    def flush(self, force=False):
+        """
+        Save the new occurrences of every open group, then close and notify every
+        group whose window has ended (every group when ``force``). Returns the
+        number of groups closed.
+        """
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            closed = [key for key, group in self._groups.items() if force or group.opened_at <= cutoff]
+            groups = [self._groups.pop(key) for key in closed]
+            dirty = [group for group in self._groups.values() if group.unsaved]
+        for group in dirty:
+            self.save(group)
+        for group in groups:
+            self.write(group)
+        return len(groups)
+
+    def open_log_id(self, group):
+        """The row of the same group still open in this window (e.g. in another process), or None."""
+        # Equality on api_name, fingerprint and notification_method plus a timestamp range: failurelog_coalesce_idx.
+        # Only coalesced rows have a fingerprint, so an ordinary row is never joined.
+        return FailureLog.objects.filter(
+            api_name=group.api_name,
+            fingerprint=group.fingerprint,
+            notification_method=group.notification_method,
+            timestamp__gte=now() - timedelta(seconds=self.window),
+            delivery_status='pending',
+        ).values_list('pk', flat=True).first()
+
+    def save(self, group):
+        """Add the group's unsaved occurrences to its row, creating or joining the row on first save."""
+        with group.lock:
+            with self._lock:
+                unsaved, group.unsaved = group.unsaved, 0
+            if group.log_id is None:
+                group.log_id = self.open_log_id(group)
+                if group.log_id is None:
+                    group.log_id = FailureLog.objects.create(
+                        api_name=group.api_name,
+                        error_message=group.failure_details,
+                        severity="critical",
+                        notification_method=group.notification_method,
+                        occurrences=unsaved,
+                        fingerprint=group.fingerprint,
+                    ).pk
+                    return
+            if unsaved:
+                FailureLog.objects.filter(pk=group.log_id).update(occurrences=F('occurrences') + unsaved)
+
+    def write(self, group):
+        """Close a group: save its last occurrences and queue its digest notification."""
+        self.save(group)
+        logger.info(f"Coalesced {group.occurrences} suppressed failure(s) for {group.api_name} into log {group.log_id}")
+        if group.notification_method not in ['email', 'sms', 'both']:
+            return
+        # Claim the row so a process that joined it does not send a second digest
+        claimed = FailureLog.objects.filter(pk=group.log_id, delivery_status='pending').update(
+            delivery_status='queued', queued_at=now()
+        )
+        if not claimed:
+            return
+        failure_log = FailureLog.objects.get(pk=group.log_id)
+        group.occurrences = failure_log.occurrences  # Includes occurrences counted by other processes
+        # The digest is a notification too: it counts against the API's threshold
+        get_threshold_engine().record(group.api_name)
+        enqueue_notification(failure_log, group.notification_method, failure_details=group.digest)
+
+    def shutdown(self):
+        try:
+            self.flush(force=True)
+        except Exception:
+            logger.exception("Unexpected error flushing coalesced failures at shutdown")
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Unexpected error flushing coalesced failures")
+            finally:
+                close_old_connections()
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_coalescer():
+    """Return the process-wide coalescer, built from the NOTIFIER_COALESCE_* settings on first use."""
+    global _coalescer
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                _coalescer = Coalescer(
+                    window=getattr(settings, 'NOTIFIER_COALESCE_WINDOW', 60),
+                    flush_interval=getattr(settings, 'NOTIFIER_COALESCE_FLUSH_INTERVAL', 1.0),
+                )
+                atexit.register(_coalescer.shutdown)
+    return _coalescer
@@ -0,0 +1,280 @@
+"""
+Background delivery of failure notifications.
+
+Views enqueue a NotificationJob and return immediately; a pool of worker
+threads (or, with NOTIFIER_DISPATCH_BACKEND = 'asyncio', an event loop running
+in a background thread) delivers the email/SMS with retries and exponential
+backoff, then records the final delivery status on the FailureLog row.
+
+Jobs are handed to the workers only once the transaction that logged them
+commits, so a worker never records a delivery against a row it cannot see yet.
+They only live in memory: rows left 'queued' by a process that stopped before
+delivering them are picked up again by ``requeue_stale()`` (the
+requeue_notifications command).
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models.functions import Coalesce
+from django.utils.timezone import now, timedelta
+
+from .models import FailureLog
+from .utils.email_sender import send_failure_notification
+from .utils.sms_sender import MockSMSService
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationJob:
+    """A notification to deliver for one FailureLog row."""
+
+    def __init__(self, log_id, api_name, failure_details, notification_method):
+        self.log_id = log_id
+        self.api_name = api_name
+        self.failure_details = failure_details
+        self.notification_method = notification_method
+        self.attempts = 0
+
+    @property
+    def message(self):
+        return f"API: {self.api_name}, Details: {self.failure_details}"
+
+    def channels(self):
+        channels = []
+        if self.notification_method in ['email', 'both']:
+            channels.append('email')
+        if self.notification_method in ['sms', 'both']:
+            channels.append('sms')
+        return channels
+
+
+def deliver(job, channel):
+    """Send one channel of a job. Raises on failure so the caller can retry."""
+    if channel == 'email':
+        logger.info(f"Sending email notification for {job.api_name}.")
+        send_failure_notification(job.message)
+    elif channel == 'sms':
+        logger.info(f"Sending SMS notification for {job.api_name}.")
+        sms_service = MockSMSService(from_number="mock_sender_number")
+        sms_service.send_sms("mock_recipient_number", job.message)
+
+
+def record_delivery(job, delivery_status):
+    FailureLog.objects.filter(pk=job.log_id).update(
+        delivery_status=delivery_status,
+        delivery_attempts=job.attempts,
+    )
+    logger.info(f"Delivery of notification for {job.api_name} (log {job.log_id}): {delivery_status} "
+                f"after {job.attempts} attempt(s)")
+
+
+class DispatchQueue:
+    """Thread-based dispatch queue: ``workers`` daemon threads pull jobs off a shared queue."""
+
+    def __init__(self, workers=4, max_attempts=5, backoff=1.0, max_backoff=60.0):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def backoff_delay(self, attempt):
+        return min(self.backoff * (2 ** (attempt - 1)), self.max_backoff)
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"notifier-dispatch-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def enqueue(self, job):
+        self.enqueue_many([job])
+
+    def enqueue_many(self, jobs, chunk_size=1000):
+        """
+        Mark the jobs' logs as queued (one UPDATE per ``chunk_size`` jobs) and hand
+        them to the workers when the current transaction commits.
+        """
+        self.start()
+        queued_at = now()
+        for i in range(0, len(jobs), chunk_size):
+            log_ids = [job.log_id for job in jobs[i:i + chunk_size]]
+            FailureLog.objects.filter(pk__in=log_ids).update(delivery_status='queued', queued_at=queued_at)
+        transaction.on_commit(lambda: self._submit_all(jobs))
+
+    def _submit_all(self, jobs):
+        for job in jobs:
+            self._submit(job)
+
+    def _submit(self, job):
+        self._queue.put(job)
+
+    def join(self):
+        """Block until every queued job has been delivered or given up on (used by tests and shutdown)."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self.process(job)
+            except Exception:
+                logger.exception(f"Unexpected error dispatching notification for {job.api_name}")
+            finally:
+                close_old_connections()
+                self._queue.task_done()
+
+    def process(self, job):
+        pending = job.channels()
+        while pending and job.attempts < self.max_attempts:
+            job.attempts += 1
+            failed = []
+            for channel in pending:
+                try:
+                    deliver(job, channel)
+                except Exception as e:
+                    logger.warning(f"{channel} notification for {job.api_name} failed "
+                                   f"(attempt {job.attempts}/{self.max_attempts}): {e}")
+                    failed.append(channel)
+            pending = failed
+            if pending and job.attempts < self.max_attempts:
+                time.sleep(self.backoff_delay(job.attempts))
+        record_delivery(job, 'failed' if pending else 'sent')
+
+
+class AsyncioDispatchQueue(DispatchQueue):
+    """
+    asyncio backend: one event loop in a background thread, at most ``workers``
+    deliveries in flight. Backoff waits do not hold a thread; the blocking
+    senders run via asyncio.to_thread.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loop = None
+        self._semaphore = None
+        self._pending = 0
+        self._idle = threading.Condition()
+
+    def start(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=self._loop.run_forever, name="notifier-dispatch-asyncio", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _submit(self, job):
+        with self._idle:
+            self._pending += 1
+        asyncio.run_coroutine_threadsafe(self._process(job), self._loop)
+
+    def join(self):
+        with self._idle:
+            self._idle.wait_for(lambda: self._pending == 0)
+
+    async def _process(self, job):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        try:
+            async with self._semaphore:
+                pending = job.channels()
+                while pending and job.attempts < self.max_attempts:
+                    job.attempts += 1
+                    results = await asyncio.gather(
+                        *(asyncio.to_thread(deliver, job, channel) for channel in pending),
+                        return_exceptions=True,
+                    )
+                    pending = [channel for channel, result in zip(pending, results) if isinstance(result, Exception)]
+                    if pending and job.attempts < self.max_attempts:
+                        await asyncio.sleep(self.backoff_delay(job.attempts))
+                await asyncio.to_thread(self._record, job, 'failed' if pending else 'sent')
+        except Exception:
+            logger.exception(f"Unexpected error dispatching notification for {job.api_name}")
+        finally:
+            with self._idle:
+                self._pending -= 1
+                self._idle.notify_all()
+
+    @staticmethod
+    def _record(job, delivery_status):
+        try:
+            record_delivery(job, delivery_status)
+        finally:
+            close_old_connections()
+
+
+_dispatch_queue = None
+_dispatch_queue_lock = threading.Lock()
+
+
+def get_dispatch_queue():
+    """Return the process-wide dispatch queue, built from the NOTIFIER_DISPATCH_* settings on first use."""
+    global _dispatch_queue
+    if _dispatch_queue is None:
+        with _dispatch_queue_lock:
+            if _dispatch_queue is None:
+                backend = getattr(settings, 'NOTIFIER_DISPATCH_BACKEND', 'thread')
+                queue_class = AsyncioDispatchQueue if backend == 'asyncio' else DispatchQueue
+                _dispatch_queue = queue_class(
+                    workers=getattr(settings, 'NOTIFIER_DISPATCH_WORKERS', 4),
+                    max_attempts=getattr(settings, 'NOTIFIER_DISPATCH_MAX_ATTEMPTS', 5),
+                    backoff=getattr(settings, 'NOTIFIER_DISPATCH_BACKOFF', 1.0),
+                    max_backoff=getattr(settings, 'NOTIFIER_DISPATCH_MAX_BACKOFF', 60.0),
+                )
+    return _dispatch_queue
+
+
+def enqueue_notification(failure_log, notification_method, failure_details=None):
+    """
+    Queue delivery of ``failure_log`` over ``notification_method`` ('email', 'sms' or 'both').
+    ``failure_details`` replaces the log's error message in the notification text (e.g. a digest);
+    it is stored on the row as its ``digest`` so a re-queued job sends the same text.
+    """
+    if failure_details is not None:
+        FailureLog.objects.filter(pk=failure_log.pk).update(digest=failure_details)
+    job = NotificationJob(failure_log.pk, failure_log.api_name, failure_details or failure_log.error_message,
+                          notification_method)
+    get_dispatch_queue().enqueue(job)
+    return job
+
+
+def enqueue_notifications(failure_logs):
+    """Queue delivery of many ``(failure_log, notification_method)`` pairs with a single status update per chunk."""
+    jobs = [
+        NotificationJob(failure_log.pk, failure_log.api_name, failure_log.error_message, notification_method)
+        for failure_log, notification_method in failure_logs
+    ]
+    get_dispatch_queue().enqueue_many(jobs)
+    return jobs
+
+
+def requeue_stale(older_than=600, chunk_size=1000):
+    """
+    Queue delivery again for FailureLog rows still 'queued' more than
+    ``older_than`` seconds after they were handed to the dispatch queue. Their
+    jobs were lost with the process that held them (restart, deploy, crash), so
+    ``older_than`` must be longer than a job can wait in a live queue. Returns
+    the number of rows re-queued.
+    """
+    cutoff = now() - timedelta(seconds=older_than)
+    stale = (
+        FailureLog.objects.filter(delivery_status='queued', queued_at__lt=cutoff)
+        .values_list('pk', 'api_name', Coalesce('digest', 'error_message'), 'notification_method')
+    )
+    jobs = [NotificationJob(*row) for row in stale.iterator(chunk_size=chunk_size)]
+    if jobs:
+        logger.warning(f"Re-queueing {len(jobs)} notification(s) left undelivered by a stopped process")
+        get_dispatch_queue().enqueue_many(jobs, chunk_size=chunk_size)
+    return len(jobs)
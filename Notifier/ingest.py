@@ -0,0 +1,87 @@
+"""
+Batch ingestion of failure reports.
+
+``ingest_failures`` handles a list of ``{api_name, failure_details,
+notification_method}`` items the way FailureNotificationView handles one,
+but in a single pass: rules come from the rule registry, each api_name
+reserves the notification slots it needs in one atomic step, the notified failures
+are inserted with one bulk_create and queued with one status update per chunk,
+and over-threshold failures go to the coalescer.
+"""
+import logging
+
+from django.conf import settings
+
+from .coalesce import get_coalescer
+from .dispatch import enqueue_notifications
+from .models import FailureLog
+from .rate_counter import get_threshold_engine
+from .rules import get_rule_registry
+from .serializers import FailureReportSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def ingest_failures(items):
+    """Return one outcome dict per item, in order: 'queued', 'suppressed', 'no_rule' or 'invalid'."""
+    registry = get_rule_registry()
+    engine = get_threshold_engine()
+    coalescer = get_coalescer()
+
+    outcomes = []
+    accepted = []  # (outcome index, rule, failure_details, notification_method)
+
+    for index, item in enumerate(items):
+        # Same validation as notify-failure/; a bad item is reported, not raised, so the rest still go through
+        serializer = FailureReportSerializer(data=item)
+        if not serializer.is_valid():
+            outcomes.append({'index': index, 'status': 'invalid', 'error': serializer.errors})
+            continue
+        api_name = serializer.validated_data['api_name']
+        failure_details = serializer.validated_data['failure_details']
+
+        rule = registry.get(api_name)
+        if rule is None:
+            outcomes.append({'index': index, 'status': 'no_rule',
+                             'error': f"No notification rule found for API: {api_name}"})
+            continue
+        notification_method = serializer.validated_data.get('notification_method') or rule.notification_method
+        outcomes.append({'index': index})
+        accepted.append((index, rule, failure_details, notification_method))
+
+    # One atomic reservation per api_name; the earliest items of each API get the granted slots.
+    rules, wanted = {}, {}
+    for _, rule, _, _ in accepted:
+        rules[rule.api_name] = rule
+        wanted[rule.api_name] = wanted.get(rule.api_name, 0) + 1
+    granted = {
+        api_name: engine.reserve_many(api_name, rules[api_name].threshold, rules[api_name].frequency, n)
+        for api_name, n in wanted.items()
+    }
+
+    to_create = []  # (outcome index, FailureLog, notification_method)
+    for index, rule, failure_details, notification_method in accepted:
+        if not granted[rule.api_name]:
+            coalescer.add(rule.api_name, failure_details, notification_method)
+            outcomes[index]['status'] = 'suppressed'
+            continue
+        granted[rule.api_name] -= 1
+        failure_log = FailureLog(
+            api_name=rule.api_name,
+            error_message=failure_details,
+            error_hash=FailureLog.hash_error(failure_details),  # bulk_create() does not call save()
+            severity="critical",
+            notification_method=notification_method,
+        )
+        outcomes[index]['status'] = 'queued'
+        to_create.append((index, failure_log, notification_method))
+
+    if to_create:
+        batch_size = getattr(settings, 'NOTIFIER_BULK_CREATE_BATCH_SIZE', 1000)
+        FailureLog.objects.bulk_create([log for _, log, _ in to_create], batch_size=batch_size)
+        enqueue_notifications([(log, method) for (_, log, method) in to_create])
+        for (position, log, _) in to_create:
+            outcomes[position]['log_id'] = log.pk
+
+    logger.info(f"Ingested {len(items)} failure report(s): {len(to_create)} queued")
+    return outcomes
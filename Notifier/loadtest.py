@@ -0,0 +1,221 @@
+"""
+In-process load generator for the failure-reporting DummyAPIs.
+
+Requests are fired concurrently from a thread pool through the Django test
+client (routed endpoints, given by URL name) or straight at a view class
+(unrouted ones such as the Notifier2 DummyAPIs, given by dotted path). Each
+worker counts the INSERT/UPDATE/DELETE statements its requests run, so the
+report shows latency, throughput and database writes per endpoint.
+
+The run uses a throwaway test database (the configured NotificationRules are
+copied into it) and in-process threshold counters, so it neither leaves rows
+behind nor uses up real notification slots. Before measuring, the coalescer is
+flushed and the dispatch queue drained; the writes those background threads
+make are reported separately.
+"""
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, connection, close_old_connections
+from django.db.backends.signals import connection_created
+from django.test import Client, RequestFactory
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from .coalesce import get_coalescer
+from .dispatch import get_dispatch_queue
+from .models import FailureLog
+from .rules import get_rule_registry
+
+# Payload kinds per API: 'ok' passes validation, 'failure' is valid input that takes
+# the failure path, 'malformed' is rejected by the serializer.
+PAYLOADS = {
+    'age': {
+        'ok': lambda: {'age': random.randint(18, 99)},
+        'failure': lambda: {'age': random.randint(1, 17)},
+        'malformed': lambda: {'age': 'not-a-number'},
+    },
+    'field_value': {
+        'ok': lambda: {'field_value': random.randint(1, 1000)},
+        'failure': lambda: {'field_value': random.randint(1, 1000)},  # DummyAPI2 logs every valid value
+        'malformed': lambda: {'field_value': 'not-a-number'},
+    },
+}
+
+DEFAULT_ENDPOINTS = {
+    'dummy-api-1': 'age',
+    'dummy-api-2': 'field_value',
+}
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, math.ceil(pct * len(sorted_samples) / 100) - 1))
+    return sorted_samples[index]
+
+
+class WriteCounter:
+    """connection.execute_wrapper() hook counting the write statements run on this thread's connection."""
+
+    def __init__(self):
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip()[:6].upper() in WRITE_STATEMENTS:
+            with self._lock:
+                self.writes += len(params) if many and params else 1
+        return execute(sql, params, many, context)
+
+
+class BackgroundWriteCounter(WriteCounter):
+    """Counts the writes of the notifier's own threads (dispatch workers, coalescer), hooked into each new connection."""
+
+    THREAD_PREFIX = 'notifier-'
+
+    def connection_created(self, sender, connection, **kwargs):
+        if threading.current_thread().name.startswith(self.THREAD_PREFIX):
+            connection.execute_wrappers.append(self)
+
+
+class Endpoint:
+    def __init__(self, name, target, payloads):
+        self.name = name
+        self.payloads = payloads
+        self._view = None
+        self._url = None
+        if '.' in target:
+            self._view = import_string(target).as_view()
+        else:
+            self._url = reverse(target)
+        self._local = threading.local()
+
+    def post(self, data):
+        if self._url is not None:
+            client = getattr(self._local, 'client', None)
+            if client is None:
+                client = self._local.client = Client()
+            return client.post(self._url, data, content_type='application/json').status_code
+        request = RequestFactory().post(f'/{self.name}/', data, content_type='application/json')
+        return self._view(request).status_code
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def add(self, latency, status_code, writes):
+        with self._lock:
+            self.latencies.append(latency)
+            self.statuses[status_code] = self.statuses.get(status_code, 0) + 1
+            if status_code is None or status_code >= 500:
+                self.errors += 1
+            self.writes += writes
+
+    def summary(self, elapsed):
+        ordered = sorted(self.latencies)
+        return {
+            'requests': len(ordered),
+            'throughput_rps': round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+            'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+            'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+            'max_ms': round(ordered[-1] * 1000, 3) if ordered else 0.0,
+            'statuses': {str(code): count for code, count in sorted(self.statuses.items(), key=str)},
+            'errors': self.errors,
+            'db_writes': self.writes,
+            'db_writes_per_request': round(self.writes / len(ordered), 2) if ordered else 0.0,
+        }
+
+
+def choose_kind(failure_ratio, malformed_ratio):
+    roll = random.random()
+    if roll < malformed_ratio:
+        return 'malformed'
+    if roll < malformed_ratio + failure_ratio:
+        return 'failure'
+    return 'ok'
+
+
+def run(endpoints=None, requests=1000, concurrency=16, failure_ratio=0.5, malformed_ratio=0.1, progress=None):
+    """
+    Fire ``requests`` requests spread evenly over ``endpoints`` ({name_or_path: payload family}) from
+    ``concurrency`` threads and return a JSON-serialisable report.
+    """
+    endpoints = endpoints or DEFAULT_ENDPOINTS
+    progress = progress or (lambda message: None)
+
+    # Every installed NotificationRule model (Notifier and Notifier2), copied into the test database
+    rules = {model: list(model.objects.all()) for model in apps.get_models() if model.__name__ == 'NotificationRule'}
+    background = BackgroundWriteCounter()
+
+    setup_test_environment()  # Allows the 'testserver' host and keeps outgoing email in memory
+    old_config = setup_databases(verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS})
+    connection_created.connect(background.connection_created)
+    try:
+        with override_settings(NOTIFIER_RATE_BACKEND='memory'):
+            return _run(endpoints, requests, concurrency, failure_ratio, malformed_ratio, progress, rules, background)
+    finally:
+        connection_created.disconnect(background.connection_created)
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+def _run(endpoints, requests, concurrency, failure_ratio, malformed_ratio, progress, rules, background):
+    for model, model_rules in rules.items():
+        model.objects.bulk_create(model_rules)
+    get_rule_registry().invalidate()
+
+    targets = [Endpoint(name, name, PAYLOADS[family]) for name, family in endpoints.items()]
+    stats = {endpoint.name: EndpointStats() for endpoint in targets}
+
+    def fire(i):
+        endpoint = targets[i % len(targets)]
+        counter = WriteCounter()
+        status_code = None
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(counter):
+                status_code = endpoint.post(endpoint.payloads[choose_kind(failure_ratio, malformed_ratio)]())
+        except Exception:
+            pass  # Counted as an error (no status code)
+        finally:
+            stats[endpoint.name].add(time.perf_counter() - started, status_code, counter.writes)
+            close_old_connections()
+
+    progress(f"Firing {requests} requests at {', '.join(endpoints)} from {concurrency} threads...")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(fire, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    # Let the background work finish before counting: coalesced groups, then deliveries
+    progress("Flushing coalesced failures and draining the dispatch queue...")
+    with connection.execute_wrapper(background):
+        get_coalescer().flush(force=True)
+    get_dispatch_queue().join()
+
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else 0.0,
+        'failure_logs_created': FailureLog.objects.count(),
+        'background_db_writes': background.writes,
+        'endpoints': {name: endpoint_stats.summary(elapsed) for name, endpoint_stats in stats.items()},
+    }
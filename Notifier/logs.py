@@ -1,8 +1,111 @@
+import base64
+import csv
+import json
 import logging
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
 from .models import FailureLog
 
 logger = logging.getLogger(__name__)
 
-def get_failure_logs():
-    # Fetch failure logs
-    return FailureLog.objects.all().order_by('-timestamp')
+FILTER_FIELDS = ('api_name', 'severity', 'notification_method')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def create_failure_log(**fields):
+    # Used by the Notifier2 DummyAPI views
+    return FailureLog.objects.create(**fields)
+
+
+def encode_cursor(log):
+    """Opaque cursor pointing just past ``log`` in newest-first order."""
+    raw = f"{log.timestamp.isoformat()}|{log.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def page_size(requested=None):
+    default = getattr(settings, 'NOTIFIER_FAILURE_LOG_PAGE_SIZE', 50)
+    maximum = getattr(settings, 'NOTIFIER_FAILURE_LOG_MAX_PAGE_SIZE', 500)
+    try:
+        size = int(requested) if requested else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+def get_failure_logs(cursor=None, limit=None, **filters):
+    """
+    One page of failure logs, newest first, plus the cursor of the next page
+    (None on the last page).
+
+    Pages are keyset-paginated on (timestamp, id): the next page starts with
+    ``WHERE (timestamp, id) < cursor`` rather than an OFFSET, so it is an index
+    range scan on failurelog_ts_desc_idx whatever the depth.
+    """
+    limit = page_size(limit)
+    logs = FailureLog.objects.order_by('-timestamp', '-id')
+    for field in FILTER_FIELDS:
+        if filters.get(field):
+            logs = logs.filter(**{field: filters[field]})
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        logs = logs.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+
+    # Fetch one extra row to know whether there is a next page without a COUNT.
+    page = list(logs[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return page[:limit], next_cursor
+
+
+EXPORT_FIELDS = (
+    'id', 'timestamp', 'api_name', 'severity', 'notification_method',
+    'delivery_status', 'delivery_attempts', 'occurrences', 'error_message',
+)
+
+
+class Echo:
+    """File-like object whose write() returns the value, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def export_failure_logs(since=None, until=None, api_name=None):
+    """Tuples of EXPORT_FIELDS, oldest first, streamed from the database in chunks."""
+    logs = FailureLog.objects.order_by('timestamp', 'id')
+    if since:
+        logs = logs.filter(timestamp__gte=since)
+    if until:
+        logs = logs.filter(timestamp__lt=until)
+    if api_name:
+        logs = logs.filter(api_name=api_name)
+    chunk_size = getattr(settings, 'NOTIFIER_EXPORT_CHUNK_SIZE', 2000)
+    return logs.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow((row[0], row[1].isoformat(), *row[2:]))
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        record = dict(zip(EXPORT_FIELDS, row))
+        record['timestamp'] = record['timestamp'].isoformat()
+        yield json.dumps(record) + "\n"
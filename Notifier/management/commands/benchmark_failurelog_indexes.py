@@ -0,0 +1,114 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils.timezone import now, timedelta
+
+from ...models import FailureLog
+
+API_NAMES = [f"API {i}" for i in range(20)]
+ERRORS = [f"Upstream returned {code} for request" for code in (400, 401, 403, 404, 409, 422, 500, 502, 503, 504)]
+METHODS = ['email', 'sms', 'both', 'none']
+
+
+class Command(BaseCommand):
+    help = ("Seed FailureLog rows inside a transaction, time the threshold, dedup and latest-page queries "
+            "without and with the Meta indexes, then roll everything back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--days', type=int, default=30, help="Spread the seeded rows over this many days.")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per query; the median is reported.")
+
+    def handle(self, *args, **options):
+        # SQLite can only run the schema editor inside a transaction with foreign key checks off.
+        constraints_disabled = connection.disable_constraint_checking()
+        try:
+            self.run(options)
+        finally:
+            if constraints_disabled:
+                connection.enable_constraint_checking()
+
+    def run(self, options):
+        with transaction.atomic():
+            self.seed(options['rows'], options['days'])
+            indexes = FailureLog._meta.indexes
+
+            with connection.schema_editor() as schema_editor:
+                for index in indexes:
+                    schema_editor.remove_index(FailureLog, index)
+            before = self.measure(options['repeat'])
+
+            with connection.schema_editor() as schema_editor:
+                for index in indexes:
+                    schema_editor.add_index(FailureLog, index)
+            after = self.measure(options['repeat'])
+
+            # Leave the database exactly as it was.
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{'query':<16}{'no indexes (ms)':>18}{'indexes (ms)':>16}{'speedup':>10}")
+        for name in before:
+            speedup = before[name] / after[name] if after[name] else float('inf')
+            self.stdout.write(f"{name:<16}{before[name]:>18.2f}{after[name]:>16.2f}{speedup:>9.1f}x")
+
+    def seed(self, rows, days):
+        self.stderr.write(f"Seeding {rows} FailureLog rows...")
+        start = now() - timedelta(days=days)
+        span = days * 24 * 3600
+        error_hashes = {error: FailureLog.hash_error(error) for error in ERRORS}
+        batch = []
+        for i in range(rows):
+            error = random.choice(ERRORS)
+            batch.append(FailureLog(
+                api_name=random.choice(API_NAMES),
+                error_message=error,
+                error_hash=error_hashes[error],  # bulk_create() does not call save()
+                severity='critical',
+                notification_method=random.choice(METHODS),
+            ))
+            if len(batch) == 10_000:
+                FailureLog.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            FailureLog.objects.bulk_create(batch)
+
+        # auto_now_add stamps every row with "now": spread the timestamps over the requested range.
+        with connection.cursor() as cursor:
+            table = connection.ops.quote_name(FailureLog._meta.db_table)
+            cursor.execute(f"SELECT MIN(id), MAX(id) FROM {table}")
+            low, high = cursor.fetchone()
+        step = max(1, (high - low) // 1000 + 1)
+        for chunk_start in range(low, high + 1, step):
+            FailureLog.objects.filter(id__gte=chunk_start, id__lt=chunk_start + step).update(
+                timestamp=start + timedelta(seconds=span * (chunk_start - low) / max(1, high - low))
+            )
+        self.analyze()
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def measure(self, repeat):
+        self.analyze()
+        api_name = API_NAMES[0]
+        error_hash = FailureLog.hash_error(ERRORS[0])
+        since = now() - timedelta(minutes=60)
+        queries = {
+            'threshold': lambda: FailureLog.objects.filter(api_name=api_name, timestamp__gte=since).count(),
+            'dedup': lambda: FailureLog.objects.filter(
+                api_name=api_name, error_hash=error_hash, notification_method='none', timestamp__gte=since
+            ).exists(),
+            'latest_page': lambda: list(FailureLog.objects.order_by('-timestamp', '-id')[:50]),
+        }
+        results = {}
+        for name, query in queries.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                query()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = statistics.median(timings)
+        return results
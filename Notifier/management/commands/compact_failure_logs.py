@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from ...retention import compact_failure_logs, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = ("Roll FailureLog rows older than the retention period into hourly FailureLogRollup counts "
+            "and delete them in bounded batches. Safe to run from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int,
+                            help="Keep raw rows this many days (default: NOTIFIER_LOG_RETENTION_DAYS, 30).")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows rolled up and deleted per transaction.")
+        parser.add_argument('--max-batches', type=int, help="Stop after this many batches (default: until done).")
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options['retention_days'])
+        self.stdout.write(f"Compacting failure logs older than {cutoff}...")
+        deleted = compact_failure_logs(options['retention_days'], options['batch_size'], options['max_batches'])
+        self.stdout.write(self.style.SUCCESS(f"Rolled up and deleted {deleted} failure log(s)."))
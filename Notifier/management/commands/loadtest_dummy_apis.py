@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import loadtest
+
+
+class Command(BaseCommand):
+    help = ("Fire a mix of passing, failing and malformed payloads at the DummyAPIs in-process, from many "
+            "threads, and print throughput, latency percentiles and DB writes per endpoint as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=16, help="Worker threads.")
+        parser.add_argument('--failure-ratio', type=float, default=0.5,
+                            help="Share of valid payloads that take the failure path.")
+        parser.add_argument('--malformed-ratio', type=float, default=0.1,
+                            help="Share of payloads the serializer rejects.")
+        parser.add_argument('--endpoint', action='append', metavar='TARGET=FAMILY',
+                            help="URL name or dotted view path, with its payload family (age or field_value), "
+                                 "e.g. dummy_apis.views.DummyAPI1=age for an unrouted Notifier2 view. "
+                                 "Repeatable; defaults to dummy-api-1=age and dummy-api-2=field_value.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        endpoints = None
+        if options['endpoint']:
+            endpoints = {}
+            for spec in options['endpoint']:
+                target, _, family = spec.partition('=')
+                if family not in loadtest.PAYLOADS:
+                    raise CommandError(f"Unknown payload family in {spec!r}: use one of {', '.join(loadtest.PAYLOADS)}")
+                endpoints[target] = family
+
+        report = loadtest.run(
+            endpoints=endpoints,
+            requests=options['requests'],
+            concurrency=options['concurrency'],
+            failure_ratio=options['failure_ratio'],
+            malformed_ratio=options['malformed_ratio'],
+            progress=lambda message: self.stderr.write(message),
+        )
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from ...dispatch import get_dispatch_queue, requeue_stale
+
+
+class Command(BaseCommand):
+    help = ("Re-queue notifications whose FailureLog is still 'queued' after a restart or crash lost the in-memory "
+            "job, and wait until they are delivered. Run it after each deploy, or from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=600,
+                            help="Only rows queued more than this many seconds ago (default: 600), so jobs still "
+                                 "waiting or being retried in a running process are left alone.")
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale(options['older_than'])
+        get_dispatch_queue().join()
+        self.stdout.write(self.style.SUCCESS(f"Re-queued {requeued} notification(s)."))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FailureLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('error_message', models.TextField()),
+                ('severity', models.CharField(max_length=50)),
+                ('notification_method', models.CharField(default='unknown', max_length=50)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NotificationRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('api_name', models.CharField(max_length=255, unique=True)),
+                ('notification_method', models.CharField(choices=[('email', 'Email'), ('sms', 'SMS'), ('both', 'Both')], default='both', max_length=50)),
+                ('threshold', models.IntegerField(default=1)),
+                ('frequency', models.IntegerField(default=60)),
+            ],
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:35
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_error_hash(apps, schema_editor):
+    FailureLog = apps.get_model('notifications', 'FailureLog')
+    batch = []
+    for log in FailureLog.objects.only('id', 'error_message').iterator(chunk_size=2000):
+        log.error_hash = hashlib.sha256(log.error_message.encode()).hexdigest()
+        batch.append(log)
+        if len(batch) >= 2000:
+            FailureLog.objects.bulk_update(batch, ['error_hash'])
+            batch = []
+    if batch:
+        FailureLog.objects.bulk_update(batch, ['error_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='failurelog',
+            name='api_name',
+            field=models.CharField(default='unknown', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='failurelog',
+            name='delivery_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='failurelog',
+            name='delivery_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('queued', 'Queued'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='failurelog',
+            name='error_hash',
+            field=models.CharField(default='', editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_error_hash, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='failurelog',
+            index=models.Index(fields=['api_name', 'timestamp'], name='failurelog_api_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='failurelog',
+            index=models.Index(fields=['api_name', 'error_hash', 'notification_method', 'timestamp'], name='failurelog_dedup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='failurelog',
+            index=models.Index(fields=['-timestamp', '-id'], name='failurelog_ts_desc_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_failurelog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FailureLogRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('api_name', models.CharField(max_length=255)),
+                ('severity', models.CharField(max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='failurelogrollup_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('api_name', 'severity', 'hour'), name='failurelogrollup_unique_hour')],
+            },
+        ),
+    ]
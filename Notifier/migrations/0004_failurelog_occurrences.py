@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_failurelogrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='failurelog',
+            name='occurrences',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
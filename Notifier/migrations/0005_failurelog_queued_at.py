@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:14
+
+from django.db import migrations, models
+
+
+def backfill_queued_at(apps, schema_editor):
+    # Rows queued before this migration: their log time is the best estimate
+    FailureLog = apps.get_model('notifications', 'FailureLog')
+    FailureLog.objects.filter(delivery_status='queued').update(queued_at=models.F('timestamp'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_failurelog_occurrences'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='failurelog',
+            name='digest',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='failurelog',
+            name='queued_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_queued_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='failurelog',
+            index=models.Index(fields=['delivery_status', 'queued_at'], name='failurelog_queued_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_failurelog_queued_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='failurelog',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='failurelog',
+            index=models.Index(fields=['api_name', 'fingerprint', 'notification_method', 'timestamp'], name='failurelog_coalesce_idx'),
+        ),
+    ]
@@ -1,13 +1,73 @@
+import hashlib
+
 from django.db import models
 
 class FailureLog(models.Model):
+    DELIVERY_STATUS_CHOICES = [
+        ('pending', 'Pending'),  # Not handed to the dispatch queue (e.g. suppressed)
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),  # Gave up after the configured number of attempts
+    ]
+
     timestamp = models.DateTimeField(auto_now_add=True)
+    api_name = models.CharField(max_length=255, default='unknown')
     error_message = models.TextField()
     severity = models.CharField(max_length=50)
     notification_method = models.CharField(max_length=50, default='unknown')
+    delivery_status = models.CharField(max_length=20, choices=DELIVERY_STATUS_CHOICES, default='pending')
+    delivery_attempts = models.PositiveIntegerField(default=0)
+    error_hash = models.CharField(max_length=64, editable=False, default='')  # SHA-256 of error_message, for dedup
+    occurrences = models.PositiveIntegerField(default=1)  # > 1 when identical suppressed failures were coalesced
+    queued_at = models.DateTimeField(null=True, blank=True)  # Last handed to the dispatch queue
+    digest = models.TextField(null=True, blank=True)  # Notification text of a coalesced row, sent instead of error_message
+    fingerprint = models.CharField(max_length=64, blank=True, default='')  # Set on coalesced rows only (coalesce.py)
+
+    class Meta:
+        indexes = [
+            # Threshold counts and rebuilds: api_name = ? AND timestamp >= ?
+            models.Index(fields=['api_name', 'timestamp'], name='failurelog_api_ts_idx'),
+            # Suppression dedup: equality columns first, the timestamp range last
+            models.Index(fields=['api_name', 'error_hash', 'notification_method', 'timestamp'],
+                         name='failurelog_dedup_idx'),
+            # Joining the open coalesced row of a group: same layout, on the group's fingerprint
+            models.Index(fields=['api_name', 'fingerprint', 'notification_method', 'timestamp'],
+                         name='failurelog_coalesce_idx'),
+            # Log browser, latest first
+            models.Index(fields=['-timestamp', '-id'], name='failurelog_ts_desc_idx'),
+            # Re-queueing lost jobs: delivery_status = 'queued' AND queued_at < ?
+            models.Index(fields=['delivery_status', 'queued_at'], name='failurelog_queued_idx'),
+        ]
 
     def __str__(self):
         return f"{self.timestamp} - {self.severity}: {self.error_message}"
+
+    @staticmethod
+    def hash_error(error_message):
+        return hashlib.sha256(error_message.encode()).hexdigest()
+
+    def save(self, *args, **kwargs):
+        # bulk_create() skips save(): callers inserting in bulk must set error_hash themselves.
+        self.error_hash = self.hash_error(self.error_message)
+        super().save(*args, **kwargs)
+
+class FailureLogRollup(models.Model):
+    # Hourly FailureLog counts, written by the compact_failure_logs command before it deletes the raw rows
+    hour = models.DateTimeField()  # Start of the hour
+    api_name = models.CharField(max_length=255)
+    severity = models.CharField(max_length=50)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['api_name', 'severity', 'hour'], name='failurelogrollup_unique_hour'),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='failurelogrollup_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.hour} - {self.api_name} ({self.severity}): {self.count}"
     
 class NotificationRule(models.Model):
     api_name = models.CharField(max_length=255, unique=True)  # Name of the API
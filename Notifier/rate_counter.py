@@ -0,0 +1,241 @@
+"""
+Sliding-window notification counters for thresholds.
+
+Instead of running ``FailureLog.objects.filter(timestamp__gte=...).count()`` on
+every failure report, the ThresholdEngine keeps a per-api_name ring buffer of
+per-minute buckets counting the notifications sent. It is rebuilt from
+FailureLog when first used and answers "how many notifications in the last N
+minutes?" without touching the database.
+
+Call sites do not count and then insert: ``reserve()`` checks the window and
+takes a slot in one atomic step (under a lock in memory, with an incr and a
+compensating decr in the cache backend), so concurrent workers can never send
+more than ``threshold`` notifications per window.
+
+The default engine (NOTIFIER_RATE_BACKEND = 'cache') keeps the counters in the
+Django cache, which must be shared by every worker process (Redis, Memcached or
+DatabaseCache): with a per-process cache such as LocMemCache, N workers can
+send N times the threshold. 'memory' keeps them in the process, which is only
+right for a single-process deployment.
+
+Windows are minute-aligned: a count over ``frequency`` minutes covers the
+current minute plus the ``frequency - 1`` minutes before it.
+
+The engine counts notifications sent (reserved slots and coalesced digests),
+not failures logged: unlike the COUNT it replaces, rows logged with
+``notification_method='none'`` (failures of an API without a rule) do not use
+up the threshold, and suppressed failures no longer extend the suppression.
+"""
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Count
+from django.db.models.functions import TruncMinute
+from django.utils.timezone import now, timedelta
+
+from .models import FailureLog
+
+logger = logging.getLogger(__name__)
+
+
+def minute_of(timestamp):
+    return int(timestamp.timestamp() // 60)
+
+
+class SlidingWindowCounter:
+    """
+    Ring buffer of per-minute buckets for one api_name.
+
+    Rather than the count of each minute, every slot stores the running total
+    at the start of that minute, so the number of events in any window up to
+    ``size`` minutes is ``total - start_of_window``: O(1) whatever the window.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.total = 0
+        self.current_minute = None
+        self._starts = [None] * size  # slot -> (minute, total at the start of that minute)
+
+    def _advance(self, minute):
+        if self.current_minute is not None and minute <= self.current_minute:
+            return
+        first = minute if self.current_minute is None else max(self.current_minute + 1, minute - self.size + 1)
+        for m in range(first, minute + 1):
+            self._starts[m % self.size] = (m, self.total)
+        self.current_minute = minute
+
+    def add(self, minute, count=1):
+        self._advance(minute)
+        self.total += count
+
+    def count(self, minute, window):
+        self._advance(minute)
+        start = minute - min(window, self.size) + 1
+        slot = self._starts[start % self.size]
+        if slot is None or slot[0] != start:
+            # The counter was created inside the window: everything it has seen counts.
+            return self.total
+        return self.total - slot[1]
+
+
+class ThresholdEngine:
+    """In-process sliding-window counts of notifications per api_name, for rows of ``model``."""
+
+    def __init__(self, model=FailureLog, window_minutes=1440):
+        self.model = model
+        self.window_minutes = window_minutes
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def recent_counts(self):
+        """Per (api_name, minute) counts of notified rows (not 'none') for the tracked window, oldest first."""
+        since = now() - timedelta(minutes=self.window_minutes)
+        return (
+            self.model.objects.filter(timestamp__gte=since)
+            .exclude(notification_method='none')
+            .annotate(minute=TruncMinute('timestamp'))
+            .values('api_name', 'minute')
+            .annotate(n=Count('id'))
+            .order_by('minute')
+        )
+
+    def rebuild(self):
+        counters = {}
+        for row in self.recent_counts():
+            counter = counters.setdefault(row['api_name'], SlidingWindowCounter(self.window_minutes))
+            counter.add(minute_of(row['minute']), row['n'])
+        with self._lock:
+            self._counters = counters
+
+    def record(self, api_name, timestamp=None, count=1):
+        minute = minute_of(timestamp or now())
+        with self._lock:
+            counter = self._counters.get(api_name)
+            if counter is None:
+                counter = self._counters[api_name] = SlidingWindowCounter(self.window_minutes)
+            counter.add(minute, count)
+
+    def count(self, api_name, minutes):
+        """Failures recorded for ``api_name`` in the last ``minutes`` minutes."""
+        with self._lock:
+            counter = self._counters.get(api_name)
+            if counter is None:
+                return 0
+            return counter.count(minute_of(now()), minutes)
+
+    def is_within_threshold(self, api_name, threshold, frequency):
+        """Read-only check. Use reserve() when a notification is going to be sent."""
+        return self.count(api_name, frequency) < threshold
+
+    def reserve(self, api_name, threshold, frequency):
+        """Atomically take one notification slot in the window. Returns False when the threshold is reached."""
+        return self.reserve_many(api_name, threshold, frequency, 1) == 1
+
+    def reserve_many(self, api_name, threshold, frequency, n):
+        """Atomically take up to ``n`` slots in the window and return how many were granted."""
+        minute = minute_of(now())
+        with self._lock:
+            counter = self._counters.get(api_name)
+            if counter is None:
+                counter = self._counters[api_name] = SlidingWindowCounter(self.window_minutes)
+            granted = max(0, min(n, threshold - counter.count(minute, frequency)))
+            if granted:
+                counter.add(minute, granted)
+            return granted
+
+
+class CacheThresholdEngine(ThresholdEngine):
+    """
+    Same interface, with the per-minute buckets stored in the Django cache so
+    every process sees the same counts. A count is one ``get_many`` round trip.
+    """
+    CACHE_PREFIX = "notifier_rate_"
+
+    def _key(self, api_name, minute):
+        api_key = hashlib.md5(api_name.encode()).hexdigest()
+        return f"{self.CACHE_PREFIX}{self.model._meta.label_lower}_{api_key}_{minute}"
+
+    @property
+    def _timeout(self):
+        return (self.window_minutes + 1) * 60
+
+    def rebuild(self):
+        # Seed the shared buckets once: a process starting later must not overwrite live counts
+        if not cache.add(f"{self.CACHE_PREFIX}{self.model._meta.label_lower}_seeded", 1, self._timeout):
+            return
+        buckets = {}
+        for row in self.recent_counts():
+            key = self._key(row['api_name'], minute_of(row['minute']))
+            buckets[key] = buckets.get(key, 0) + row['n']
+        cache.set_many(buckets, self._timeout)
+
+    def _incr(self, key, count):
+        """Add ``count`` to a bucket and return its new value."""
+        if cache.add(key, count, self._timeout):
+            return count
+        try:
+            return cache.incr(key, count)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.add(key, count, self._timeout)
+            return count
+
+    def record(self, api_name, timestamp=None, count=1):
+        key = self._key(api_name, minute_of(timestamp or now()))
+        self._incr(key, count)
+        return key
+
+    def reserve_many(self, api_name, threshold, frequency, n):
+        # Take the slots first, then give back those past the threshold. The value incr() returns
+        # ranks this request among concurrent ones in the current minute, so exactly the slots
+        # below the threshold are granted whatever the interleaving (no over- or under-grant).
+        minute = minute_of(now())
+        earlier = self._sum(api_name, minute - min(frequency, self.window_minutes) + 1, minute)
+        key = self._key(api_name, minute)
+        taken = self._incr(key, n)
+        granted = max(0, min(n, threshold - earlier - (taken - n)))
+        if granted < n:
+            try:
+                cache.decr(key, n - granted)
+            except ValueError:
+                pass
+        return granted
+
+    def _sum(self, api_name, first_minute, end_minute):
+        """Total of the buckets for minutes ``first_minute`` up to, not including, ``end_minute``."""
+        keys = [self._key(api_name, m) for m in range(first_minute, end_minute)]
+        return sum(cache.get_many(keys).values()) if keys else 0
+
+    def count(self, api_name, minutes):
+        current = minute_of(now())
+        return self._sum(api_name, current - min(minutes, self.window_minutes) + 1, current + 1)
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_threshold_engine(model=FailureLog):
+    """
+    Return the process-wide engine for ``model``. It is built from the
+    NOTIFIER_RATE_* settings and rebuilt from the database on first use.
+    """
+    engine = _engines.get(model)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(model)
+            if engine is None:
+                backend = getattr(settings, 'NOTIFIER_RATE_BACKEND', 'cache')
+                engine_class = CacheThresholdEngine if backend == 'cache' else ThresholdEngine
+                if engine_class is CacheThresholdEngine and isinstance(caches['default'], LocMemCache):
+                    logger.warning("Notification thresholds use LocMemCache, which is per process: configure a "
+                                   "shared cache (Redis, Memcached or DatabaseCache) so they hold across workers.")
+                engine = engine_class(model, window_minutes=getattr(settings, 'NOTIFIER_RATE_WINDOW_MINUTES', 1440))
+                engine.rebuild()
+                _engines[model] = engine
+    return engine
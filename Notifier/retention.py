@@ -0,0 +1,108 @@
+"""
+Retention for FailureLog.
+
+Rows older than the retention period are folded into hourly FailureLogRollup
+counts per (api_name, severity) and then deleted, one bounded batch per
+transaction, so the raw table only holds what threshold checks, dedup and the
+log browser actually look at. Historical counts are answered from the rollups
+plus whatever raw rows are still inside the range.
+
+Overlapping runs (cron overlap, several hosts) are safe: each batch locks the
+rows it rolls up and skips rows locked by another run, so no row is counted
+twice, and a rollup row created concurrently is added to instead.
+"""
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncHour
+from django.utils.timezone import now, timedelta
+
+from .models import FailureLog, FailureLogRollup
+
+logger = logging.getLogger(__name__)
+
+
+def retention_cutoff(retention_days=None):
+    """Start of the hour ``retention_days`` ago: only whole hours are ever rolled up."""
+    if retention_days is None:
+        retention_days = getattr(settings, 'NOTIFIER_LOG_RETENTION_DAYS', 30)
+    return (now() - timedelta(days=retention_days)).replace(minute=0, second=0, microsecond=0)
+
+
+def add_to_rollups(counts):
+    """Add ``{(api_name, severity, hour): count}`` to the rollup table."""
+    for (api_name, severity, hour), count in counts.items():
+        rollup = FailureLogRollup.objects.filter(api_name=api_name, severity=severity, hour=hour)
+        if rollup.update(count=F('count') + count):
+            continue
+        try:
+            with transaction.atomic():
+                FailureLogRollup.objects.create(api_name=api_name, severity=severity, hour=hour, count=count)
+        except IntegrityError:
+            # Another run created the row since the UPDATE: add to it
+            rollup.update(count=F('count') + count)
+
+
+def compact_batch(cutoff, batch_size):
+    """Roll up and delete at most ``batch_size`` rows older than ``cutoff``. Returns the number deleted."""
+    with transaction.atomic():
+        # Lock the batch; rows another run has locked are left to it (no effect on SQLite, which
+        # serializes writers)
+        ids = list(
+            FailureLog.objects.select_for_update(skip_locked=True)
+            .filter(timestamp__lt=cutoff)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        rows = (
+            FailureLog.objects.filter(id__in=ids)
+            .annotate(hour=TruncHour('timestamp'))
+            .values('api_name', 'severity', 'hour')
+            .annotate(n=Sum('occurrences'))
+        )
+        add_to_rollups({(row['api_name'], row['severity'], row['hour']): row['n'] for row in rows})
+        deleted, _ = FailureLog.objects.filter(id__in=ids).delete()
+    return deleted
+
+
+def compact_failure_logs(retention_days=None, batch_size=1000, max_batches=None):
+    """Compact every row older than the retention period. Returns the number of raw rows removed."""
+    cutoff = retention_cutoff(retention_days)
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        deleted = compact_batch(cutoff, batch_size)
+        if not deleted:
+            break
+        total += deleted
+        batches += 1
+    logger.info(f"Compacted {total} failure logs older than {cutoff} in {batches} batch(es)")
+    return total
+
+
+def hourly_failure_counts(since, until=None, api_name=None):
+    """
+    Failures per (hour, api_name, severity) in [since, until), oldest first,
+    combining rolled-up hours with the raw rows that are still kept.
+    """
+    until = until or now()
+    raw = FailureLog.objects.filter(timestamp__gte=since, timestamp__lt=until)
+    rollups = FailureLogRollup.objects.filter(hour__gte=since.replace(minute=0, second=0, microsecond=0), hour__lt=until)
+    if api_name:
+        raw = raw.filter(api_name=api_name)
+        rollups = rollups.filter(api_name=api_name)
+
+    counts = {}
+    for hour, name, severity, count in rollups.values_list('hour', 'api_name', 'severity', 'count'):
+        counts[(hour, name, severity)] = count
+    for row in (raw.annotate(hour=TruncHour('timestamp'))
+                .values('hour', 'api_name', 'severity').annotate(n=Sum('occurrences'))):
+        key = (row['hour'], row['api_name'], row['severity'])
+        counts[key] = counts.get(key, 0) + row['n']
+    return [
+        {'hour': hour, 'api_name': name, 'severity': severity, 'count': count}
+        for (hour, name, severity), count in sorted(counts.items())
+    ]
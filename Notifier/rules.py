@@ -0,0 +1,101 @@
+"""
+In-memory NotificationRule registry.
+
+All rules are loaded into a dict keyed by api_name on first use, so a failure
+report looks its rule up without a database query. Saving or deleting a rule
+bumps a version number in the Django cache once the change is committed (the
+receivers are connected in NotificationsConfig.ready()); every process compares
+its copy against that version (at most every
+NOTIFIER_RULES_VERSION_CHECK_INTERVAL seconds) and reloads when it is stale.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import NotificationRule
+
+
+class RuleRegistry:
+    VERSION_KEY = "notifier_rules_version"
+
+    def __init__(self, model=NotificationRule, check_interval=5):
+        self.model = model
+        self.check_interval = check_interval
+        self._rules = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def current_version(cls):
+        return cache.get(cls.VERSION_KEY, 0)
+
+    @classmethod
+    def bump_version(cls):
+        """Tell every process its rules are stale."""
+        cache.add(cls.VERSION_KEY, 0, None)
+        try:
+            cache.incr(cls.VERSION_KEY)
+        except ValueError:
+            cache.set(cls.VERSION_KEY, 1, None)
+
+    def load(self):
+        """Reload every rule and return the new api_name -> rule dict."""
+        with self._lock:
+            version = self.current_version()
+            rules = {rule.api_name: rule for rule in self.model.objects.all()}
+            self._rules = rules
+            self._version = version
+            self._checked_at = time.monotonic()
+            return rules
+
+    def invalidate(self):
+        with self._lock:
+            self._rules = None
+
+    def _current_rules(self):
+        # Read self._rules once: invalidate() may set it to None from another thread at any time.
+        rules = self._rules
+        if rules is None:
+            return self.load()
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return rules
+        self._checked_at = time.monotonic()
+        if self.current_version() != self._version:
+            return self.load()
+        return rules
+
+    def get(self, api_name):
+        """Return the rule for ``api_name``, or None. No database access while the registry is warm."""
+        return self._current_rules().get(api_name)
+
+    def all(self):
+        return list(self._current_rules().values())
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_rule_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = RuleRegistry(
+                    check_interval=getattr(settings, 'NOTIFIER_RULES_VERSION_CHECK_INTERVAL', 5),
+                )
+    return _registry
+
+
+def rules_changed():
+    RuleRegistry.bump_version()
+    get_rule_registry().invalidate()
+
+
+def invalidate_rules(sender, using=None, **kwargs):
+    # After commit: bumping earlier would let another process reload the old rows under the new version
+    transaction.on_commit(rules_changed, using=using)
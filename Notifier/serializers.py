@@ -11,6 +11,15 @@ class NotificationRuleSerializer(serializers.ModelSerializer):
         model = NotificationRule
         fields = '__all__'
 
+class FailureReportSerializer(serializers.Serializer):
+    # One failure report, as posted to notify-failure/ and as each item of notify-failure/batch/
+    api_name = serializers.CharField(max_length=255)
+    failure_details = serializers.CharField()
+    notification_method = serializers.ChoiceField(
+        choices=NotificationRule._meta.get_field('notification_method').choices,
+        required=False, allow_blank=True, allow_null=True
+    )
+
 class DummyAPI1Serializer(serializers.Serializer):
     age = serializers.IntegerField(required=True, min_value=1, error_messages={
         "required": "The 'age' field is required.",
@@ -0,0 +1,450 @@
+import csv
+import io
+import json
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils.timezone import now, timedelta
+from rest_framework.test import APIClient
+
+from . import rate_counter, rules
+from .coalesce import Coalescer, error_fingerprint
+from .dispatch import DispatchQueue, NotificationJob, requeue_stale
+from .models import FailureLog, FailureLogRollup, NotificationRule
+from .rate_counter import CacheThresholdEngine, SlidingWindowCounter, ThresholdEngine
+from .retention import add_to_rollups, compact_failure_logs, hourly_failure_counts
+from .rules import RuleRegistry, get_rule_registry
+
+
+class FailureNotificationBatchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificationRule.objects.create(api_name="Batch API", notification_method='email', threshold=100,
+                                            frequency=60)
+        enqueue = mock.patch('notify.apps.notifications.ingest.enqueue_notifications')
+        enqueue.start()
+        self.addCleanup(enqueue.stop)
+
+    def post_batch(self, items):
+        return self.client.post(reverse('notify-failure-batch'), items, format='json')
+
+    def test_non_string_api_name_is_reported_per_item(self):
+        response = self.post_batch([
+            {"api_name": ["Batch API"], "failure_details": "list api_name"},
+            {"api_name": "Batch API", "failure_details": "valid"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual(results[0]['status'], 'invalid')
+        self.assertIn('api_name', results[0]['error'])
+        self.assertEqual(results[1]['status'], 'queued')
+        self.assertEqual(FailureLog.objects.get().error_message, "valid")
+
+    def test_unknown_notification_method_is_rejected(self):
+        response = self.post_batch([
+            {"api_name": "Batch API", "failure_details": "pigeon", "notification_method": "pigeon"},
+            "not an object",
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data['results']], ['invalid', 'invalid'])
+        self.assertIn('notification_method', response.data['results'][0]['error'])
+        self.assertFalse(FailureLog.objects.exists())
+
+    def test_single_endpoint_uses_the_same_validation(self):
+        response = self.client.post(reverse('notify-failure'), {
+            "api_name": "Batch API", "failure_details": "pigeon", "notification_method": "pigeon",
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('notification_method', response.data['error'])
+
+
+class ThresholdEngineTests(SimpleTestCase):
+    threads = 16
+    attempts = 20
+    threshold = 25
+
+    def setUp(self):
+        cache.clear()
+
+    def race(self, engine):
+        """Have every thread try to reserve slots at once; return how many were granted."""
+        granted = []
+        start = threading.Barrier(self.threads)
+
+        def worker():
+            start.wait()
+            for _ in range(self.attempts):
+                if engine.reserve("Race API", self.threshold, 60):
+                    granted.append(1)
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return len(granted)
+
+    def test_concurrent_reservations_grant_exactly_the_threshold(self):
+        for engine_class in (CacheThresholdEngine, ThresholdEngine):
+            with self.subTest(engine=engine_class.__name__):
+                cache.clear()
+                self.assertEqual(self.race(engine_class()), self.threshold)
+
+    def test_cache_engine_is_the_default(self):
+        with mock.patch.dict(rate_counter._engines, clear=True), \
+                mock.patch.object(CacheThresholdEngine, 'rebuild'):
+            self.assertIsInstance(rate_counter.get_threshold_engine(), CacheThresholdEngine)
+
+
+class DispatchTests(TestCase):
+    def setUp(self):
+        self.log = FailureLog.objects.create(api_name="Dispatch API", error_message="boom", severity="critical",
+                                             notification_method='both')
+        self.queue = DispatchQueue(max_attempts=3, backoff=0)
+        self.submitted = []
+        mock.patch.object(self.queue, 'start').start()
+        mock.patch.object(self.queue, '_submit', side_effect=self.submitted.append).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def job(self, log=None):
+        log = log or self.log
+        return NotificationJob(log.pk, log.api_name, log.error_message, log.notification_method)
+
+    def test_failed_channel_is_retried_until_sent(self):
+        with mock.patch('notify.apps.notifications.dispatch.deliver', side_effect=[None, Exception("down"), None]) \
+                as deliver:
+            self.queue.process(self.job())
+        self.assertEqual([call.args[1] for call in deliver.call_args_list], ['email', 'sms', 'sms'])
+        self.log.refresh_from_db()
+        self.assertEqual((self.log.delivery_status, self.log.delivery_attempts), ('sent', 2))
+
+    def test_gives_up_after_max_attempts(self):
+        with mock.patch('notify.apps.notifications.dispatch.deliver', side_effect=Exception("down")):
+            self.queue.process(self.job())
+        self.log.refresh_from_db()
+        self.assertEqual((self.log.delivery_status, self.log.delivery_attempts), ('failed', 3))
+
+    def test_jobs_reach_workers_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.queue.enqueue(self.job())
+            self.log.refresh_from_db()
+            self.assertEqual(self.log.delivery_status, 'queued')
+            self.assertIsNotNone(self.log.queued_at)
+            self.assertEqual(self.submitted, [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual([job.log_id for job in self.submitted], [self.log.pk])
+
+    def test_requeue_stale_uses_queue_time_and_digest(self):
+        coalesced = FailureLog.objects.create(api_name="Dispatch API", error_message="first sample",
+                                              severity="critical", notification_method='email', occurrences=7,
+                                              digest="7 occurrence(s): first sample")
+        recent = FailureLog.objects.create(api_name="Dispatch API", error_message="recent", severity="critical",
+                                           notification_method='email')
+        long_ago = now() - timedelta(hours=1)
+        FailureLog.objects.update(delivery_status='queued', timestamp=long_ago, queued_at=long_ago)
+        FailureLog.objects.filter(pk=recent.pk).update(queued_at=now())  # Logged long ago, queued just now
+
+        with mock.patch('notify.apps.notifications.dispatch.get_dispatch_queue', return_value=self.queue), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(requeue_stale(older_than=600), 2)
+
+        details = {job.log_id: job.failure_details for job in self.submitted}
+        self.assertEqual(details, {self.log.pk: "boom", coalesced.pk: "7 occurrence(s): first sample"})
+        self.assertGreater(FailureLog.objects.get(pk=self.log.pk).queued_at, long_ago)
+
+
+class SlidingWindowTests(SimpleTestCase):
+    def test_window_includes_its_first_minute_only(self):
+        counter = SlidingWindowCounter(size=10)
+        counter.add(100, 2)
+        counter.add(102)
+        self.assertEqual(counter.count(102, 3), 3)  # Minutes 100-102
+        self.assertEqual(counter.count(103, 3), 1)  # Minutes 101-103
+        self.assertEqual(counter.count(105, 3), 0)
+
+    def test_counts_expire_after_the_buffer_wraps(self):
+        counter = SlidingWindowCounter(size=5)
+        counter.add(100, 4)
+        counter.add(107)
+        self.assertEqual(counter.count(107, 5), 1)
+        self.assertEqual(counter.count(200, 5), 0)
+
+    def test_window_is_capped_at_the_buffer_size(self):
+        counter = SlidingWindowCounter(size=5)
+        for minute in range(100, 110):
+            counter.add(minute)
+        self.assertEqual(counter.count(109, 60), 5)
+
+    def test_reserved_slots_free_up_when_the_window_moves_on(self):
+        start = now().replace(second=0, microsecond=0)
+        for engine_class in (ThresholdEngine, CacheThresholdEngine):
+            with self.subTest(engine=engine_class.__name__):
+                cache.clear()
+                engine = engine_class(window_minutes=60)
+                with mock.patch('notify.apps.notifications.rate_counter.now', return_value=start):
+                    self.assertEqual(engine.reserve_many("Window API", 3, 5, 5), 3)
+                    self.assertFalse(engine.reserve("Window API", 3, 5))
+                with mock.patch('notify.apps.notifications.rate_counter.now',
+                                return_value=start + timedelta(minutes=4, seconds=59)):
+                    self.assertFalse(engine.reserve("Window API", 3, 5))
+                with mock.patch('notify.apps.notifications.rate_counter.now',
+                                return_value=start + timedelta(minutes=5)):
+                    self.assertEqual(engine.count("Window API", 5), 0)
+                    self.assertTrue(engine.reserve("Window API", 3, 5))
+
+
+class ThresholdRebuildTests(TestCase):
+    def test_rebuild_counts_notified_rows_only(self):
+        for method in ['email', 'sms', 'none', 'none']:
+            FailureLog.objects.create(api_name="Rebuild API", error_message="boom", severity="critical",
+                                      notification_method=method)
+        FailureLog.objects.create(api_name="Rebuild API", error_message="old", severity="critical",
+                                  notification_method='email')
+        FailureLog.objects.filter(error_message="old").update(timestamp=now() - timedelta(hours=2))
+        engine = ThresholdEngine()
+        engine.rebuild()
+        self.assertEqual(engine.count("Rebuild API", 60), 2)
+        self.assertEqual(engine.count("Rebuild API", 180), 3)
+
+
+class RuleRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(rules, '_registry', RuleRegistry(check_interval=0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rule = NotificationRule.objects.create(api_name="Rule API", notification_method='email', threshold=3)
+
+    def test_warm_lookups_do_not_query_the_rules(self):
+        get_rule_registry().get("Rule API")
+        with self.assertNumQueries(0):
+            self.assertEqual(get_rule_registry().get("Rule API").threshold, 3)
+            self.assertIsNone(get_rule_registry().get("Other API"))
+
+    def test_save_invalidates_after_commit(self):
+        get_rule_registry().get("Rule API")
+        version = RuleRegistry.current_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rule.threshold = 10
+            self.rule.save()
+            self.assertEqual(RuleRegistry.current_version(), version)  # Not before the commit
+        self.assertEqual(RuleRegistry.current_version(), version + 1)
+        self.assertEqual(get_rule_registry().get("Rule API").threshold, 10)
+
+    def test_other_process_reloads_on_version_change(self):
+        other = RuleRegistry(check_interval=0)
+        other.get("Rule API")
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificationRule.objects.filter(pk=self.rule.pk).update(threshold=7)  # No signal
+            NotificationRule.objects.create(api_name="New API")
+        self.assertEqual(other.get("Rule API").threshold, 7)
+        self.assertIsNotNone(other.get("New API"))
+
+    def test_delete_invalidates(self):
+        get_rule_registry().get("Rule API")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rule.delete()
+        self.assertIsNone(get_rule_registry().get("Rule API"))
+
+
+class FailureLogPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        tied = now() - timedelta(minutes=5)
+        for i in range(7):
+            FailureLog.objects.create(api_name="Page API" if i % 3 else "Other API", error_message=f"error {i}",
+                                      severity="critical", notification_method='email')
+        # Rows sharing a timestamp must still page in id order, without skips or repeats
+        FailureLog.objects.filter(pk__in=FailureLog.objects.order_by('id').values('pk')[2:5]).update(timestamp=tied)
+
+    def pages(self, **params):
+        ids, cursor = [], None
+        while True:
+            query = dict(params, limit=2, **({'cursor': cursor} if cursor else {}))
+            response = self.client.get(reverse('failure-logs-api'), query)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_cursor_round_trip_visits_every_row_once(self):
+        expected = list(FailureLog.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+        self.assertEqual(self.pages(), expected)
+
+    def test_filters_carry_over_to_the_next_page(self):
+        expected = list(FailureLog.objects.filter(api_name="Page API").order_by('-timestamp', '-id')
+                        .values_list('id', flat=True))
+        self.assertEqual(self.pages(api_name="Page API"), expected)
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in ["not a cursor", "bm90fGEgbnVtYmVy"]:  # Not base64; base64 of "not|a number"
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('failure-logs-api'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.data)
+
+
+class FailureLogExportTests(TestCase):
+    def setUp(self):
+        self.logs = [
+            FailureLog.objects.create(api_name=api_name, error_message=message, severity="critical",
+                                      notification_method='email')
+            for api_name, message in [("Export API", 'quoted "value", comma'), ("Other API", "other"),
+                                      ("Export API", "multi\nline")]
+        ]
+        FailureLog.objects.filter(pk=self.logs[0].pk).update(timestamp=now() - timedelta(days=2))
+
+    def export(self, **params):
+        response = self.client.get(reverse('failure-logs-export'), params)
+        if response.status_code != 200:
+            return response, None
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_has_a_header_and_one_row_per_log_oldest_first(self):
+        response, body = self.export(format='csv', api_name="Export API")
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0][:3], ['id', 'timestamp', 'api_name'])
+        self.assertEqual([row[-1] for row in rows[1:]], ['quoted "value", comma', "multi\nline"])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [self.logs[0].pk, self.logs[2].pk])
+
+    def test_ndjson_respects_the_bounds(self):
+        since = (now() - timedelta(days=1)).isoformat()
+        response, body = self.export(format='ndjson', since=since)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([record['id'] for record in records], [self.logs[1].pk, self.logs[2].pk])
+        self.assertEqual(records[0]['error_message'], "other")
+
+        _, body = self.export(format='ndjson', until=since)
+        self.assertEqual([json.loads(line)['id'] for line in body.splitlines()], [self.logs[0].pk])
+
+    def test_invalid_format_and_bounds_are_rejected(self):
+        for params in [{'format': 'xml'}, {'since': 'yesterday'}, {'until': '2026-13-01T00:00:00'},
+                       {'since': '2026-02-30T00:00:00'}]:
+            with self.subTest(**params):
+                response, _ = self.export(**params)
+                self.assertEqual(response.status_code, 400)
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.hour = (now() - timedelta(days=40)).replace(minute=0, second=0, microsecond=0)
+
+    def log(self, timestamp, api_name="Retention API", severity="critical", occurrences=1):
+        log = FailureLog.objects.create(api_name=api_name, error_message="boom", severity=severity,
+                                        notification_method='email', occurrences=occurrences)
+        FailureLog.objects.filter(pk=log.pk).update(timestamp=timestamp)
+        return log
+
+    def test_compaction_sums_occurrences_per_hour(self):
+        self.log(self.hour + timedelta(minutes=5))
+        self.log(self.hour + timedelta(minutes=50), occurrences=4)  # A coalesced row
+        self.log(self.hour + timedelta(minutes=70))
+        self.log(self.hour + timedelta(minutes=10), severity="low")
+        recent = self.log(now() - timedelta(days=1))
+
+        self.assertEqual(compact_failure_logs(retention_days=30, batch_size=2), 4)
+        self.assertEqual(list(FailureLog.objects.values_list('pk', flat=True)), [recent.pk])
+        self.assertEqual(
+            set(FailureLogRollup.objects.values_list('hour', 'severity', 'count')),
+            {(self.hour, "critical", 5), (self.hour + timedelta(hours=1), "critical", 1), (self.hour, "low", 1)},
+        )
+
+    def test_rollup_created_by_another_run_is_added_to(self):
+        FailureLogRollup.objects.create(api_name="Retention API", severity="critical", hour=self.hour, count=5)
+        update = QuerySet.update
+        calls = []
+
+        def lose_the_race(queryset, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)  # The row appears after the first UPDATE
+
+        with mock.patch.object(QuerySet, 'update', lose_the_race):
+            add_to_rollups({("Retention API", "critical", self.hour): 3})
+        self.assertEqual(FailureLogRollup.objects.get().count, 8)
+
+    def test_hourly_counts_combine_rollups_and_raw_rows(self):
+        # The boundary hour is partly rolled up and partly still raw
+        FailureLogRollup.objects.create(api_name="Retention API", severity="critical", hour=self.hour, count=5)
+        FailureLogRollup.objects.create(api_name="Retention API", severity="critical",
+                                        hour=self.hour - timedelta(hours=1), count=2)
+        self.log(self.hour + timedelta(minutes=30), occurrences=3)
+        self.log(self.hour + timedelta(hours=1, minutes=1))
+        self.log(self.hour + timedelta(minutes=30), api_name="Other API")
+
+        counts = hourly_failure_counts(self.hour, self.hour + timedelta(hours=2), api_name="Retention API")
+        self.assertEqual([(row['hour'], row['count']) for row in counts],
+                         [(self.hour, 8), (self.hour + timedelta(hours=1), 1)])
+
+    def test_history_endpoint_rejects_bad_bounds(self):
+        for params in [{}, {'since': 'yesterday'}, {'since': self.hour.isoformat(), 'until': '2026-13-01T00:00:00'}]:
+            with self.subTest(**params):
+                response = self.client.get(reverse('failure-logs-history'), params)
+                self.assertEqual(response.status_code, 400)
+
+
+class CoalescerTests(TestCase):
+    def setUp(self):
+        self.coalescer = self.make_coalescer()
+        self.enqueue = mock.patch('notify.apps.notifications.coalesce.enqueue_notification').start()
+        mock.patch('notify.apps.notifications.coalesce.get_threshold_engine').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def make_coalescer(self):
+        coalescer = Coalescer(window=60)
+        coalescer.start = mock.Mock()  # No background flush thread
+        return coalescer
+
+    def test_failures_differing_in_volatile_parts_share_a_group(self):
+        self.assertEqual(self.coalescer.add("Coalesce API", "Timeout after 30s for id 123", 'email'), 1)
+        self.assertEqual(self.coalescer.add("Coalesce API", "Timeout after 45s for id 987", 'email'), 2)
+        self.assertEqual(self.coalescer.add("Coalesce API", "Connection refused", 'email'), 1)
+        self.assertEqual(self.coalescer.add("Other API", "Timeout after 30s for id 123", 'email'), 1)
+        self.coalescer.flush()
+        self.assertEqual(
+            sorted(FailureLog.objects.values_list('api_name', 'error_message', 'occurrences')),
+            [("Coalesce API", "Connection refused", 1), ("Coalesce API", "Timeout after 30s for id 123", 2),
+             ("Other API", "Timeout after 30s for id 123", 1)],
+        )
+
+    def test_flush_saves_counts_and_closing_queues_one_digest(self):
+        for i in range(3):
+            self.coalescer.add("Coalesce API", f"Timeout for id {i}", 'email')
+        self.assertEqual(self.coalescer.flush(), 0)  # Window still open: counts saved, nothing sent
+        log = FailureLog.objects.get()
+        self.assertEqual((log.occurrences, log.delivery_status), (3, 'pending'))
+        self.enqueue.assert_not_called()
+
+        self.coalescer.add("Coalesce API", "Timeout for id 99", 'email')
+        self.assertEqual(self.coalescer.flush(force=True), 1)
+        log.refresh_from_db()
+        self.assertEqual((log.occurrences, log.delivery_status), (4, 'queued'))
+        self.enqueue.assert_called_once()
+        self.assertTrue(self.enqueue.call_args.kwargs['failure_details'].startswith("4 occurrence(s)"))
+        self.assertEqual(self.coalescer.pending(), 0)
+
+    def test_another_process_joins_the_open_row_of_the_group(self):
+        self.coalescer.add("Coalesce API", "Timeout for id 1", 'email')
+        other = self.make_coalescer()
+        other.add("Coalesce API", "Timeout for id 2", 'email')  # Different first message, same fingerprint
+        other.add("Coalesce API", "Timeout for id 3", 'email')
+        other.flush()
+        log = FailureLog.objects.get()
+        self.assertEqual((log.occurrences, log.fingerprint), (3, error_fingerprint("Timeout for id 1")))
+
+    def test_ordinary_rows_are_never_joined(self):
+        ordinary = FailureLog.objects.create(api_name="Coalesce API", error_message="Timeout for id 1",
+                                             severity="critical", notification_method='email')
+        self.coalescer.add("Coalesce API", "Timeout for id 1", 'email')
+        self.assertEqual(FailureLog.objects.count(), 2)
+        ordinary.refresh_from_db()
+        self.assertEqual(ordinary.occurrences, 1)
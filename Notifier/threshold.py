@@ -1,34 +1,47 @@
-from django.utils.timezone import now, timedelta
-
+from .coalesce import get_coalescer
+from .dispatch import enqueue_notification
 from .logs import logger
-from .models import FailureLog, NotificationRule
-from .utils.email_sender import send_failure_notification
-from .utils.sms_sender import MockSMSService
+from .models import FailureLog
+from .rate_counter import get_threshold_engine
+from .rules import get_rule_registry
 
 def handle_threshold_logic(data, serializer):
     api_name = data.get('api_name')
     failure_details = data.get('failure_details')
     notification_method = data.get('notification_method')
 
-    try:
-        rule = NotificationRule.objects.get(api_name=api_name)
-    except NotificationRule.DoesNotExist:
+    rule = get_rule_registry().get(api_name)
+    if rule is None:
         raise ValueError(f"No notification rule found for API: {api_name}")
 
-    # Check threshold
-    recent_notifications = FailureLog.objects.filter(
-        timestamp__gte=now() - timedelta(minutes=rule.frequency),
-        api_name=api_name
-    ).count()
-
-    if recent_notifications >= rule.threshold:
-        serializer.save(api_name=api_name, error_message=failure_details, severity="critical", notification_method="none")
+    # Atomically check the threshold and reserve a notification slot
+    if not get_threshold_engine().reserve(api_name, rule.threshold, rule.frequency):
+        # Coalesced with identical failures into one log row and one digest notification per window
+        get_coalescer().add(api_name, failure_details, notification_method or rule.notification_method)
         logger.warning(f"Notification suppressed for {api_name} due to threshold.")
+        return False
     else:
-        # Send notifications
-        if notification_method in ['email', 'both']:
-            send_failure_notification(f"API: {api_name}, Details: {failure_details}")
-        if notification_method in ['sms', 'both']:
-            sms_service = MockSMSService(from_number="mock_sender_number")
-            sms_service.send_sms("mock_recipient_number", f"API: {api_name}, Details: {failure_details}")
-        serializer.save(api_name=api_name, error_message=failure_details, severity="critical", notification_method=notification_method)
\ No newline at end of file
+        # Log the failure and queue the notifications for background delivery
+        failure_log = serializer.save(api_name=api_name, error_message=failure_details, severity="critical", notification_method=notification_method)
+        enqueue_notification(failure_log, notification_method)
+        return True
+
+def report_failure(api_name, failure_details, notification_method=None):
+    """
+    Log a failure and notify about it if the API's rule allows, reserving the
+    threshold slot atomically. Returns ``(outcome, failure_log)`` where outcome
+    is 'queued', 'suppressed' (counted in its coalesced group's row) or 'no_rule'.
+    """
+    rule = get_rule_registry().get(api_name)
+    if rule is None:
+        return 'no_rule', None
+    notification_method = notification_method or rule.notification_method
+
+    if not get_threshold_engine().reserve(api_name, rule.threshold, rule.frequency):
+        get_coalescer().add(api_name, failure_details, notification_method)
+        logger.warning(f"Notification suppressed for {api_name} due to threshold.")
+        return 'suppressed', None
+
+    failure_log = FailureLog.objects.create(api_name=api_name, error_message=failure_details, severity="critical", notification_method=notification_method)
+    enqueue_notification(failure_log, notification_method)
+    return 'queued', failure_log
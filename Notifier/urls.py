@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.http import HttpResponse
-from notify.apps.notifications.views import FailureNotificationView, manage_rules_view, frontend_view, failure_logs_view
+from notify.apps.notifications.views import FailureNotificationView, FailureNotificationBatchView, manage_rules_view, frontend_view, failure_logs_view, FailureLogListView, export_failure_logs_view, FailureHistoryView
 
 
 #def home_view(request):
@@ -11,8 +11,12 @@ urlpatterns = [
     path('', frontend_view, name='home'), # USELESS
     path('manage-rules/', manage_rules_view, name='manage-rules'),
     path('notify-failure/', FailureNotificationView.as_view(), name='notify-failure'),
+    path('notify-failure/batch/', FailureNotificationBatchView.as_view(), name='notify-failure-batch'),
     path('admin/', admin.site.urls),
     path('user-validation/', include('user_validation.urls')),  # USELESS url of user_validation app
     path('dummy-apis/', include('dummy_apis.urls')),  # Dummy API its "dummy-apis"
     path('failure-logs/',failure_logs_view, name='failure-logs'),
+    path('api/failure-logs/', FailureLogListView.as_view(), name='failure-logs-api'),
+    path('failure-logs/export/', export_failure_logs_view, name='failure-logs-export'),
+    path('api/failure-logs/history/', FailureHistoryView.as_view(), name='failure-logs-history'),
 ]
\ No newline at end of file
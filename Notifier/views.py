@@ -1,11 +1,19 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .utils.email_sender import send_failure_notification
-from .utils.sms_sender import MockSMSService
+from .coalesce import get_coalescer
+from .dispatch import enqueue_notification
+from .ingest import ingest_failures
+from .logs import FILTER_FIELDS, InvalidCursor, export_failure_logs, get_failure_logs, stream_csv, stream_ndjson
 from .models import FailureLog, NotificationRule
+from .retention import hourly_failure_counts
+from .rate_counter import get_threshold_engine
+from .rules import get_rule_registry
+from .serializers import FailureLogSerializer, FailureReportSerializer
+from django.conf import settings
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.utils.timezone import now, timedelta
+from django.utils.dateparse import parse_datetime
 
 #FOR LOGGING
 import logging
@@ -15,9 +23,39 @@ def frontend_view(request):
     return render(request, 'index.html')  
 
 def failure_logs_view(request):
-    # Fetch all failure logs
-    logs = FailureLog.objects.all().order_by('-timestamp')  # ORDER Latest first
-    return render(request, 'failure_logs.html', {'logs': logs})
+    # One keyset page of failure logs, latest first
+    filters = {field: request.GET.get(field) for field in FILTER_FIELDS}
+    try:
+        logs, next_cursor = get_failure_logs(request.GET.get('cursor'), request.GET.get('limit'), **filters)
+    except InvalidCursor:
+        # A stale or hand-edited cursor: start again from the newest logs
+        logs, next_cursor = get_failure_logs(None, request.GET.get('limit'), **filters)
+    return render(request, 'failure_logs.html', {'logs': logs, 'next_cursor': next_cursor, 'filters': filters})
+
+def export_failure_logs_view(request):
+    # Stream failure logs as CSV (default) or NDJSON; memory use does not grow with the number of rows
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return HttpResponseBadRequest("format must be 'csv' or 'ndjson'.")
+
+    bounds = {}
+    for name in ('since', 'until'):
+        value = request.GET.get(name)
+        if value:
+            try:
+                bounds[name] = parse_datetime(value)
+            except ValueError:  # Well formed but out of range, e.g. month 13
+                bounds[name] = None
+            if bounds[name] is None:
+                return HttpResponseBadRequest(f"'{name}' must be an ISO 8601 datetime.")
+
+    rows = export_failure_logs(api_name=request.GET.get('api_name'), **bounds)
+    if export_format == 'ndjson':
+        response = StreamingHttpResponse(stream_ndjson(rows), content_type='application/x-ndjson')
+    else:
+        response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="failure_logs.{export_format}"'
+    return response
 
 def manage_rules_view(request):
     if request.method == 'POST':
@@ -57,37 +95,25 @@ class FailureNotificationView(APIView):
             logger.error("API name or failure details missing in the request.")
             return Response({"error": "API name and failure details are required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            rule = NotificationRule.objects.get(api_name=api_name)
-            logger.info(f"NotificationRule found for {api_name}: {rule.notification_method}, Threshold: {rule.threshold}, Frequency: {rule.frequency}")
-        except NotificationRule.DoesNotExist:
+        serializer = FailureReportSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.error(f"Invalid failure report: {serializer.errors}")
+            return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        api_name = serializer.validated_data['api_name']
+        failure_details = serializer.validated_data['failure_details']
+        notification_method = serializer.validated_data.get('notification_method')
+
+        rule = get_rule_registry().get(api_name)
+        if rule is None:
             logger.error(f"No NotificationRule found for {api_name}.")
             return Response({"error": f"No notification rule found for API: {api_name}"}, status=status.HTTP_404_NOT_FOUND)
+        logger.info(f"NotificationRule found for {api_name}: {rule.notification_method}, Threshold: {rule.threshold}, Frequency: {rule.frequency}")
 
-        # Check if the number of notifications sent for this API in the last `frequency` minutes exceeds the threshold
-        recent_notifications = FailureLog.objects.filter(
-            timestamp__gte=now() - timedelta(minutes=rule.frequency),
-            severity="critical",
-            api_name=api_name  # Ensure filtering by API name
-        ).count()
-        logger.info(f"Recent notifications for {api_name}: {recent_notifications}, Threshold: {rule.threshold}")
-
-        if recent_notifications >= rule.threshold:
-            # Check if a similar failure has already been logged recently for this API
-            existing_log = FailureLog.objects.filter(
-                api_name=api_name,
-                error_message=failure_details,
-                timestamp__gte=now() - timedelta(minutes=rule.frequency),
-                notification_method="none"
-            ).exists()
-
-            if not existing_log:
-                FailureLog.objects.create(
-                    api_name=api_name,
-                    error_message=failure_details,
-                    severity="critical",
-                    notification_method="none"
-                )
+        # Atomically reserve one of the `threshold` notifications allowed for this API in the last `frequency` minutes
+        # (concurrent requests cannot both take the last slot)
+        if not get_threshold_engine().reserve(api_name, rule.threshold, rule.frequency):
+            # Group it with identical failures: one log row and one digest notification per window
+            get_coalescer().add(api_name, failure_details, notification_method or rule.notification_method)
             logger.warning(f"Notification suppressed for {api_name} due to threshold.")
             return Response({"error": "Max notification limit reached for this API. Notification suppressed."}, status=status.HTTP_200_OK)
 
@@ -97,23 +123,72 @@ class FailureNotificationView(APIView):
 
         logger.info(f"Notification method for {api_name}: {notification_method}")
 
-        # Send notifications based on the notification method
-        if notification_method in ['email', 'both']:
-            logger.info(f"Sending email notification for {api_name}.")
-            send_failure_notification(f"API: {api_name}, Details: {failure_details}")
-
-        if notification_method in ['sms', 'both']:
-            logger.info(f"Sending SMS notification for {api_name}.")
-            sms_service = MockSMSService(from_number="mock_sender_number")
-            sms_service.send_sms("mock_recipient_number", f"API: {api_name}, Details: {failure_details}")
-
-        # Save the failure log
-        FailureLog.objects.create(
+        # Save the failure log, then hand email/SMS delivery to the background dispatch queue
+        failure_log = FailureLog.objects.create(
             api_name=api_name,
             error_message=failure_details,
             severity="critical",
             notification_method=notification_method
         )
-        logger.info(f"Failure log created for {api_name} with notification method: {notification_method}")
+        enqueue_notification(failure_log, notification_method)
+        logger.info(f"Failure log created and notification queued for {api_name} with notification method: {notification_method}")
 
+        # Same response as when delivery was synchronous; the outcome is recorded in the log's delivery_status
         return Response({"message": "Notification sent successfully."}, status=status.HTTP_200_OK)
+
+
+class FailureLogListView(APIView):
+    def get(self, request):
+        filters = {field: request.query_params.get(field) for field in FILTER_FIELDS}
+        try:
+            logs, next_cursor = get_failure_logs(request.query_params.get('cursor'), request.query_params.get('limit'), **filters)
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        next_url = None
+        if next_cursor:
+            params = request.query_params.copy()
+            params['cursor'] = next_cursor
+            next_url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+        return Response({
+            "results": FailureLogSerializer(logs, many=True).data,
+            "next_cursor": next_cursor,
+            "next": next_url,
+        })
+
+
+class FailureHistoryView(APIView):
+    # Hourly failure counts for dashboards; old hours come from FailureLogRollup, recent ones from FailureLog
+    def get(self, request):
+        try:
+            since = parse_datetime(request.query_params.get('since', ''))
+        except ValueError:  # Well formed but out of range, e.g. month 13
+            since = None
+        if since is None:
+            return Response({"error": "'since' must be an ISO 8601 datetime."}, status=status.HTTP_400_BAD_REQUEST)
+        until = request.query_params.get('until')
+        if until:
+            try:
+                until = parse_datetime(until)
+            except ValueError:
+                until = None
+            if until is None:
+                return Response({"error": "'until' must be an ISO 8601 datetime."}, status=status.HTTP_400_BAD_REQUEST)
+
+        counts = hourly_failure_counts(since, until, api_name=request.query_params.get('api_name'))
+        return Response({"results": counts})
+
+
+class FailureNotificationBatchView(APIView):
+    # Accepts a JSON array of {api_name, failure_details, notification_method} and answers per item
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({"error": "Expected a JSON array of failure reports."}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_items = getattr(settings, 'NOTIFIER_BATCH_MAX_ITEMS', 10000)
+        if len(items) > max_items:
+            return Response({"error": f"Batch exceeds the limit of {max_items} items."},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        return Response({"results": ingest_failures(items)})
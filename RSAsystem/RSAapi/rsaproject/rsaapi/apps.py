@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class RsaapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rsaapi'
+
+    def ready(self):
+        # Parse the partner private keys once at startup so the decrypt path
+        # never has to read them from disk.
+        from .keyring import get_keyring
+        get_keyring().load()
@@ -0,0 +1,208 @@
+"""
+Benchmark harness for the decrypt endpoints.
+
+Payloads are produced with the client logic in ``encrypt_for_api.py`` and
+pushed either straight through ``decrypt_and_verify`` (crypto layer) or through
+the URLconf with Django's test client (HTTP layer, in-process). Every run
+returns latency percentiles and throughput as plain dicts so the results can
+be dumped as JSON and compared between runs.
+"""
+import importlib.util
+import math
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import cryptography
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.conf import settings
+from django.test import Client, override_settings
+
+from . import envelope
+from .crypto import decrypt_and_verify
+from .keyring import reset_keyring
+
+CLIENT_SCRIPT = Path(__file__).resolve().parents[3] / 'encrypt_for_api.py'
+BENCH_KEY_ID = 'partner-benchmark'
+
+_client_module = None
+
+
+def client_module():
+    """Import ``encrypt_for_api.py`` from the RSAsystem directory (it has no side effects on import)."""
+    global _client_module
+    if _client_module is None:
+        spec = importlib.util.spec_from_file_location('encrypt_for_api', CLIENT_SCRIPT)
+        _client_module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_client_module)
+    return _client_module
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, math.ceil(pct * len(sorted_samples) / 100) - 1))
+    return sorted_samples[index]
+
+
+def summarize(samples, items_per_sample=1):
+    """Latency percentiles (ms) and throughput (items/sec) for a list of per-operation timings in seconds."""
+    ordered = sorted(samples)
+    total = sum(ordered)
+    return {
+        'operations': len(ordered),
+        'items': len(ordered) * items_per_sample,
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3) if ordered else 0.0,
+        'throughput_items_per_sec': round(len(ordered) * items_per_sample / total, 1) if total else 0.0,
+    }
+
+
+class BenchmarkKeys:
+    """
+    A throwaway partner/sender key pair of the given size, written to a
+    temporary keys directory so the key ring loads it exactly like the real
+    partner key.
+    """
+
+    def __init__(self, key_size):
+        self.key_size = key_size
+        self.partner_key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+        self.sender_key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+        self.sender_public_key_pem = self.sender_key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        self.keys_dir = tempfile.mkdtemp(prefix='rsaapi-bench-')
+        with open(os.path.join(self.keys_dir, f'{BENCH_KEY_ID}_private_key.pem'), 'wb') as f:
+            f.write(self.partner_key.private_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PrivateFormat.PKCS8,
+                encryption_algorithm=serialization.NoEncryption()
+            ))
+
+    def payloads(self, count, use_envelope=False):
+        client = client_module()
+        recipient_public_key = self.partner_key.public_key()
+        session = client.EnvelopeSession(recipient_public_key) if use_envelope else None
+        payloads = []
+        for i in range(count):
+            message = f'partner{i},customer{i},token{i}'.encode()
+            payload = client.build_payload(
+                recipient_public_key, self.sender_key, self.sender_public_key_pem, message, session
+            )
+            payload['key_id'] = BENCH_KEY_ID
+            payloads.append(payload)
+        return payloads
+
+    def cleanup(self):
+        shutil.rmtree(self.keys_dir, ignore_errors=True)
+
+
+def reset_caches():
+    """Forget every parsed key, as on a freshly started process."""
+    reset_keyring()
+    envelope.reset_data_key_cache()
+
+
+def _timed(operation, payloads, cold):
+    samples = []
+    for payload in payloads:
+        if cold:
+            reset_caches()
+        start = time.perf_counter()
+        operation(payload)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_crypto(keys, payloads, cold=False):
+    def operation(payload):
+        decrypt_and_verify(payload['encrypted_data'], payload['signature'], payload['public_key'], payload['key_id'])
+    return summarize(_timed(operation, payloads, cold))
+
+
+def bench_http_single(keys, payloads, cold=False):
+    client = Client()
+
+    def operation(payload):
+        response = client.post('/api/decrypt/', payload, content_type='application/json')
+        assert response.status_code == 200, response.content
+    return summarize(_timed(operation, payloads, cold))
+
+
+def bench_http_batch(keys, payloads, batch_size, cold=False):
+    client = Client()
+    batches = [payloads[i:i + batch_size] for i in range(0, len(payloads), batch_size)]
+    batches = [batch for batch in batches if len(batch) == batch_size] or batches
+
+    def operation(batch):
+        response = client.post('/api/decrypt/batch/', batch, content_type='application/json')
+        assert response.status_code == 200, response.content
+    return summarize(_timed(operation, batches, cold), items_per_sample=len(batches[0]))
+
+
+def run(key_sizes=(2048, 3072, 4096), requests=200, batch_size=50, use_envelope=False, progress=None):
+    """
+    Run every scenario for every key size and return a JSON-serialisable report.
+    Verification caching and the replay window are disabled so each operation
+    does the full verify and decrypt.
+    """
+    results = []
+    for key_size in key_sizes:
+        keys = BenchmarkKeys(key_size)
+        try:
+            with override_settings(
+                RSAAPI_KEYS_DIR=keys.keys_dir,
+                RSAAPI_KEY_RELOAD_INTERVAL=0,
+                RSAAPI_VERIFY_CACHE_TIMEOUT=0,
+                RSAAPI_REPLAY_MAX_USES=None,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            ):
+                scenarios = [
+                    ('crypto', 'single', 'cold', lambda p: bench_crypto(keys, p, cold=True)),
+                    ('crypto', 'single', 'warm', lambda p: bench_crypto(keys, p)),
+                    ('http', 'single', 'cold', lambda p: bench_http_single(keys, p, cold=True)),
+                    ('http', 'single', 'warm', lambda p: bench_http_single(keys, p)),
+                    ('http', 'batch', 'warm', lambda p: bench_http_batch(keys, p, batch_size)),
+                ]
+                for layer, mode, key_cache, bench in scenarios:
+                    if progress:
+                        progress(f"{key_size}-bit {layer}/{mode} ({key_cache} key cache)")
+                    payloads = keys.payloads(requests, use_envelope)
+                    reset_caches()
+                    if key_cache == 'warm':
+                        bench_crypto(keys, payloads[:1])
+                        payloads = payloads[1:]
+                    results.append({
+                        'layer': layer,
+                        'mode': mode,
+                        'key_cache': key_cache,
+                        'key_size': key_size,
+                        'envelope': use_envelope,
+                        **bench(payloads),
+                    })
+        finally:
+            keys.cleanup()
+            reset_caches()
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'cryptography': cryptography.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'requests': requests,
+            'batch_size': batch_size,
+        },
+        'results': results,
+    }
@@ -0,0 +1,218 @@
+import base64
+import logging
+import tempfile
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, utils
+from rest_framework import status
+
+from . import envelope
+from .keyring import KeyNotFound, PublicKeyNotAllowed, fingerprint, get_keyring, get_public_key_cache
+from .verification_cache import VerificationCache
+
+logger = logging.getLogger(__name__)
+
+
+class DecryptError(Exception):
+    """A payload that could not be verified or decrypted, with the error code and HTTP status to report."""
+
+    def __init__(self, code, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status_code = status_code
+
+    def __reduce__(self):
+        # Keep the code and status when the error crosses a process pool boundary.
+        return self.__class__, (self.code, self.message, self.status_code)
+
+    def as_dict(self):
+        return {'error': self.message, 'code': self.code}
+
+
+def base64_decode_padded(data: str) -> bytes:
+    data = data.strip()
+    missing_padding = len(data) % 4
+    if missing_padding:
+        data += '=' * (4 - missing_padding)
+    return base64.b64decode(data)
+
+
+def decrypt_and_verify(encrypted_data_b64, signature_b64, public_key_b64, key_id=None):
+    """
+    Verify the sender's PSS signature over the ciphertext, then decrypt it with
+    the partner private key (plain OAEP, or a hybrid envelope, see envelope.py).
+    Returns the decoded partner/customer/token fields, or raises DecryptError.
+    """
+    if not all([encrypted_data_b64, signature_b64, public_key_b64]):
+        raise DecryptError('missing_fields', 'Missing encrypted_data, signature, or public_key')
+
+    try:
+        encrypted_data = base64_decode_padded(encrypted_data_b64)
+        signature = base64_decode_padded(signature_b64)
+        public_key_pem = base64_decode_padded(public_key_b64)
+
+        # Byte-identical retries are answered from the verification cache, up to the replay limit.
+        # Replays are counted per message, so re-encoding the PEM or changing key_id does not reset the count.
+        if not VerificationCache.register_use(VerificationCache.message_digest(encrypted_data, signature)):
+            raise DecryptError('replayed', 'Payload has already been submitted', status.HTTP_409_CONFLICT)
+        digest = VerificationCache.digest(encrypted_data, signature, fingerprint(public_key_pem), key_id)
+        cached = VerificationCache.get(digest)
+        if cached is not None:
+            return cached
+
+        # Load public key (parsed once per fingerprint, then served from the cache)
+        try:
+            public_key = get_public_key_cache().get(public_key_pem)
+        except PublicKeyNotAllowed:
+            raise DecryptError('public_key_not_allowed', 'Public key not allowed', status.HTTP_403_FORBIDDEN)
+
+        # Verify the signature
+        try:
+            public_key.verify(signature, encrypted_data,  # Verify the encrypted data itself
+                padding.PSS(
+                    mgf=padding.MGF1(hashes.SHA256()),
+                    salt_length=padding.PSS.MAX_LENGTH
+                ),
+                hashes.SHA256()
+            )
+            logger.debug("Signature is valid.")
+        except InvalidSignature:
+            raise DecryptError('invalid_signature', 'Invalid signature')
+        except Exception as e:
+            raise DecryptError('verification_error', f'Error during signature verification: {str(e)}')
+
+        # Private key for decryption comes from the in-memory key ring
+        try:
+            private_key = get_keyring().get(key_id)
+        except KeyNotFound:
+            raise DecryptError('private_key_not_found', 'Private key not found')
+
+        # Decrypt the data: either a hybrid RSA+AES-GCM envelope or a single RSA block
+        if envelope.is_envelope(encrypted_data, private_key):
+            try:
+                plaintext_bytes = envelope.open_envelope(private_key, encrypted_data, envelope.get_data_key_cache())
+            except envelope.EnvelopeError as e:
+                raise DecryptError('invalid_envelope', str(e))
+        else:
+            plaintext_bytes = private_key.decrypt(
+                encrypted_data,
+                padding.OAEP(
+                    mgf=padding.MGF1(algorithm=hashes.SHA256()),
+                    algorithm=hashes.SHA256(),
+                    label=None
+                )
+            )
+
+        plaintext = plaintext_bytes.decode()
+        partner_id, customer_id, auth_token = plaintext.split(',')
+
+        result = {
+            'partner_id': partner_id,
+            'customer_id': customer_id,
+            'auth_token': auth_token
+        }
+        VerificationCache.set(digest, result)
+        return result
+
+    except DecryptError:
+        raise
+    except Exception as e:
+        raise DecryptError('decrypt_error', str(e))
+
+
+def decrypt_item(item):
+    """
+    Run decrypt_and_verify for one batch item and return ``(status_code, body)``
+    instead of raising, so results can be collected from a worker pool.
+    """
+    if not isinstance(item, dict):
+        error = DecryptError('invalid_item', 'Expected an object with encrypted_data, signature and public_key')
+        return error.status_code, error.as_dict()
+    try:
+        result = decrypt_and_verify(
+            item.get('encrypted_data'),
+            item.get('signature'),
+            item.get('public_key'),
+            key_id=item.get('key_id'),
+        )
+    except DecryptError as e:
+        return e.status_code, e.as_dict()
+    return status.HTTP_200_OK, result
+
+
+class HashingReader:
+    """Wraps a file-like stream, hashing and counting every byte read and enforcing ``max_bytes``."""
+
+    def __init__(self, stream, max_bytes=None):
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        self._hash = hashes.Hash(hashes.SHA256())
+
+    def read(self, size):
+        data = self.stream.read(size)
+        self.bytes_read += len(data)
+        if self.max_bytes is not None and self.bytes_read > self.max_bytes:
+            raise DecryptError('payload_too_large', 'Encrypted upload is too large',
+                               status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self._hash.update(data)
+        return data
+
+    def digest(self):
+        return self._hash.finalize()
+
+
+def decrypt_stream(stream, signature_b64, public_key_b64, key_id=None, max_bytes=None):
+    """
+    Decrypt a chunked envelope read incrementally from ``stream`` into a
+    temporary file, hashing the ciphertext on the way so the sender's PSS
+    signature can be checked without holding the upload in memory. The
+    plaintext file is only returned (rewound) once the signature verifies.
+    """
+    if not all([stream, signature_b64, public_key_b64]):
+        raise DecryptError('missing_fields', 'Missing encrypted body, signature, or public_key')
+
+    try:
+        signature = base64_decode_padded(signature_b64)
+        public_key = get_public_key_cache().get(base64_decode_padded(public_key_b64))
+    except PublicKeyNotAllowed:
+        raise DecryptError('public_key_not_allowed', 'Public key not allowed', status.HTTP_403_FORBIDDEN)
+    except Exception as e:
+        raise DecryptError('decrypt_error', str(e))
+
+    try:
+        private_key = get_keyring().get(key_id)
+    except KeyNotFound:
+        raise DecryptError('private_key_not_found', 'Private key not found')
+
+    reader = HashingReader(stream, max_bytes)
+    plaintext_file = tempfile.TemporaryFile()
+    try:
+        for chunk in envelope.open_stream(private_key, reader.read, envelope.get_data_key_cache()):
+            plaintext_file.write(chunk)
+        if reader.read(1):
+            raise DecryptError('invalid_envelope', 'Unexpected data after the last chunk')
+
+        try:
+            public_key.verify(
+                signature,
+                reader.digest(),
+                padding.PSS(
+                    mgf=padding.MGF1(hashes.SHA256()),
+                    salt_length=padding.PSS.MAX_LENGTH
+                ),
+                utils.Prehashed(hashes.SHA256())
+            )
+        except InvalidSignature:
+            raise DecryptError('invalid_signature', 'Invalid signature')
+    except envelope.EnvelopeError as e:
+        plaintext_file.close()
+        raise DecryptError('invalid_envelope', str(e))
+    except Exception:
+        plaintext_file.close()
+        raise
+
+    plaintext_file.seek(0)
+    return plaintext_file
@@ -0,0 +1,253 @@
+"""
+Hybrid RSA + AES-256-GCM envelope format.
+
+An envelope carries an AES-256 data key wrapped with the partner's RSA public
+key (OAEP/SHA-256) next to the AES-GCM ciphertext of the message, so payloads
+are no longer limited to a single RSA block:
+
+    magic (3 bytes, b'RSE') | version (1 byte) | wrapped key length (2 bytes, big endian)
+    | wrapped key | nonce (12 bytes) | GCM ciphertext + tag
+
+The header and wrapped key are authenticated as GCM associated data. A sender
+may reuse one wrapped data key for every message of a session (with a fresh
+nonce each time); the unwrapped key is cached so the RSA private-key operation
+runs once per session instead of once per message.
+
+Version 2 is the chunked variant used for large uploads. The message is split
+into fixed-size chunks that are sealed independently, so it can be encrypted
+and decrypted incrementally with bounded memory:
+
+    magic | version (2) | wrapped key length | wrapped key | nonce prefix (7 bytes)
+    | chunk size (4 bytes, big endian) | chunk 0 | chunk 1 | ... | last chunk
+
+Each chunk is ``chunk size`` bytes of plaintext plus a 16-byte GCM tag (the
+last one may be shorter) and uses the nonce ``prefix | counter (4 bytes) |
+last flag (1 byte)``, which rejects reordered, dropped or truncated chunks.
+"""
+import hashlib
+import os
+import struct
+import threading
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from django.conf import settings
+
+from .keyring import LRUCache
+
+MAGIC = b'RSE'
+VERSION = 1
+STREAM_VERSION = 2
+HEADER = struct.Struct('>3sBH')
+STREAM_HEADER = struct.Struct('>7sI')
+NONCE_SIZE = 12
+TAG_SIZE = 16
+DATA_KEY_SIZE = 32
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+OAEP = padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
+
+
+class EnvelopeError(ValueError):
+    pass
+
+
+def is_envelope(data, private_key):
+    """
+    Legacy payloads are a single RSA block, exactly as long as the modulus, so
+    anything longer that starts with the magic bytes is an envelope.
+    """
+    return data[:len(MAGIC)] == MAGIC and len(data) > private_key.key_size // 8
+
+
+def wrap_data_key(recipient_public_key, data_key=None):
+    """Return ``(data_key, wrapped_key)``, generating a fresh AES-256 key when none is given."""
+    data_key = data_key or AESGCM.generate_key(bit_length=DATA_KEY_SIZE * 8)
+    return data_key, recipient_public_key.encrypt(data_key, OAEP)
+
+
+def seal(recipient_public_key, plaintext, data_key=None, wrapped_key=None):
+    """Encrypt ``plaintext`` into an envelope. Pass a ``data_key``/``wrapped_key`` pair to reuse a session key."""
+    if wrapped_key is None:
+        data_key, wrapped_key = wrap_data_key(recipient_public_key, data_key)
+    header = HEADER.pack(MAGIC, VERSION, len(wrapped_key)) + wrapped_key
+    nonce = os.urandom(NONCE_SIZE)
+    return header + nonce + AESGCM(data_key).encrypt(nonce, plaintext, header)
+
+
+def parse(data):
+    """Split an envelope into ``(header, wrapped_key, nonce, ciphertext)``."""
+    if len(data) < HEADER.size:
+        raise EnvelopeError('Envelope is truncated')
+    magic, version, wrapped_key_length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise EnvelopeError('Not an envelope')
+    if version != VERSION:
+        raise EnvelopeError(f'Unsupported envelope version: {version}')
+
+    key_end = HEADER.size + wrapped_key_length
+    if len(data) < key_end + NONCE_SIZE:
+        raise EnvelopeError('Envelope is truncated')
+    return data[:key_end], data[HEADER.size:key_end], data[key_end:key_end + NONCE_SIZE], data[key_end + NONCE_SIZE:]
+
+
+class DataKeyCache(LRUCache):
+    """Unwrapped session data keys, keyed by the partner key modulus and a hash of the wrapped key."""
+
+    def unwrap(self, private_key, wrapped_key):
+        cache_key = (private_key.public_key().public_numbers().n, hashlib.sha256(wrapped_key).digest())
+        data_key = self.get(cache_key)
+        if data_key is None:
+            data_key = private_key.decrypt(wrapped_key, OAEP)
+            if len(data_key) != DATA_KEY_SIZE:
+                raise EnvelopeError('Invalid data key')
+            self.set(cache_key, data_key)
+        return data_key
+
+
+def _unwrap(private_key, wrapped_key, data_key_cache):
+    try:
+        if data_key_cache is not None:
+            return data_key_cache.unwrap(private_key, wrapped_key)
+        return private_key.decrypt(wrapped_key, OAEP)
+    except EnvelopeError:
+        raise
+    except ValueError:
+        # Corrupted, or wrapped for a different partner key
+        raise EnvelopeError('Data key could not be unwrapped')
+
+
+def open_envelope(private_key, data, data_key_cache=None):
+    """Decrypt an envelope with the partner private key and return the plaintext bytes."""
+    header, wrapped_key, nonce, ciphertext = parse(data)
+    data_key = _unwrap(private_key, wrapped_key, data_key_cache)
+    try:
+        return AESGCM(data_key).decrypt(nonce, ciphertext, header)
+    except InvalidTag:
+        raise EnvelopeError('Envelope authentication failed')
+
+
+def _chunk_nonce(prefix, counter, last):
+    return prefix + struct.pack('>IB', counter, 1 if last else 0)
+
+
+def _read_exactly(read, size):
+    """Read up to ``size`` bytes from ``read``, looping over short reads; shorter only at end of stream."""
+    parts = []
+    remaining = size
+    while remaining:
+        part = read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b''.join(parts)
+
+
+def _with_last_flag(blocks):
+    """Yield ``(block, is_last)`` pairs, looking one block ahead."""
+    previous = next(blocks, None)
+    if previous is None:
+        return
+    for block in blocks:
+        yield previous, False
+        previous = block
+    yield previous, True
+
+
+def _read_blocks(read, size):
+    while True:
+        block = _read_exactly(read, size)
+        if not block:
+            return
+        yield block
+        if len(block) < size:
+            return
+
+
+def seal_stream(recipient_public_key, chunks, chunk_size=DEFAULT_CHUNK_SIZE, data_key=None, wrapped_key=None):
+    """
+    Generator that seals an iterable of plaintext byte strings into a chunked
+    (version 2) envelope, yielding the header and then one sealed chunk at a time.
+    """
+    if wrapped_key is None:
+        data_key, wrapped_key = wrap_data_key(recipient_public_key, data_key)
+    prefix = os.urandom(STREAM_HEADER.size - 4)
+    header = HEADER.pack(MAGIC, STREAM_VERSION, len(wrapped_key)) + wrapped_key + STREAM_HEADER.pack(prefix, chunk_size)
+    yield header
+
+    aesgcm = AESGCM(data_key)
+
+    def plaintext_blocks():
+        buffer = b''
+        for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= chunk_size:
+                yield buffer[:chunk_size]
+                buffer = buffer[chunk_size:]
+        yield buffer
+
+    for counter, (block, last) in enumerate(_with_last_flag(plaintext_blocks())):
+        yield aesgcm.encrypt(_chunk_nonce(prefix, counter, last), block, header)
+
+
+def open_stream(private_key, read, data_key_cache=None):
+    """
+    Generator that decrypts a chunked envelope read incrementally through
+    ``read(size)`` and yields the plaintext one chunk at a time. Raises
+    EnvelopeError on a malformed, tampered or truncated stream.
+    """
+    fixed = _read_exactly(read, HEADER.size)
+    if len(fixed) < HEADER.size:
+        raise EnvelopeError('Envelope is truncated')
+    magic, version, wrapped_key_length = HEADER.unpack(fixed)
+    if magic != MAGIC:
+        raise EnvelopeError('Not an envelope')
+    if version != STREAM_VERSION:
+        raise EnvelopeError(f'Unsupported envelope version: {version}')
+
+    wrapped_key = _read_exactly(read, wrapped_key_length)
+    stream_header = _read_exactly(read, STREAM_HEADER.size)
+    if len(wrapped_key) < wrapped_key_length or len(stream_header) < STREAM_HEADER.size:
+        raise EnvelopeError('Envelope is truncated')
+    prefix, chunk_size = STREAM_HEADER.unpack(stream_header)
+    if not 0 < chunk_size <= 16 * 1024 * 1024:
+        raise EnvelopeError('Invalid chunk size')
+
+    header = fixed + wrapped_key + stream_header
+    aesgcm = AESGCM(_unwrap(private_key, wrapped_key, data_key_cache))
+
+    empty = True
+    for counter, (block, last) in enumerate(_with_last_flag(_read_blocks(read, chunk_size + TAG_SIZE))):
+        empty = False
+        try:
+            yield aesgcm.decrypt(_chunk_nonce(prefix, counter, last), block, header)
+        except InvalidTag:
+            raise EnvelopeError('Envelope authentication failed')
+    if empty:
+        raise EnvelopeError('Envelope is truncated')
+
+
+_data_key_cache = None
+_data_key_cache_lock = threading.Lock()
+
+
+def get_data_key_cache():
+    """Return the process-wide data key cache, building it from settings on first use."""
+    global _data_key_cache
+    if _data_key_cache is None:
+        with _data_key_cache_lock:
+            if _data_key_cache is None:
+                _data_key_cache = DataKeyCache(
+                    max_size=getattr(settings, 'RSAAPI_DATA_KEY_CACHE_SIZE', 1024),
+                    ttl=getattr(settings, 'RSAAPI_DATA_KEY_CACHE_TTL', 900),
+                )
+    return _data_key_cache
+
+
+def reset_data_key_cache():
+    global _data_key_cache
+    with _data_key_cache_lock:
+        _data_key_cache = None
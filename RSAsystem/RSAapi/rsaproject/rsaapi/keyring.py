@@ -0,0 +1,262 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cryptography.hazmat.primitives import serialization
+from django.conf import settings
+
+PRIVATE_KEY_SUFFIX = '_private_key.pem'
+
+
+class KeyNotFound(KeyError):
+    pass
+
+
+class PublicKeyNotAllowed(ValueError):
+    pass
+
+
+class KeyRing:
+    """
+    In-memory store of the partner private keys, keyed by key ID.
+
+    Every ``<key_id>_private_key.pem`` file in ``keys_dir`` is parsed once and
+    kept in memory. When ``reload_interval`` is set, the directory is re-scanned
+    at most once per interval and keys whose mtime changed (or new files dropped
+    in for rotation) are re-loaded; between scans lookups never touch the disk.
+    An unknown key ID also triggers a re-scan, but at most once per
+    ``reload_interval`` (``MISS_RESCAN_INTERVAL`` when reloading is off), since
+    key IDs come from the client. For the same reason only key IDs starting
+    with ``key_id_prefix`` are loaded or served, so other keys kept in the
+    directory (e.g. ``sender``) can never be selected by a request.
+    """
+
+    MISS_RESCAN_INTERVAL = 1.0  # seconds
+
+    def __init__(self, keys_dir, default_key_id='partner', reload_interval=0, key_id_prefix='partner'):
+        self.keys_dir = str(keys_dir)
+        self.default_key_id = default_key_id
+        self.reload_interval = reload_interval
+        self.key_id_prefix = key_id_prefix
+        self._keys = {}  # key_id -> (private_key, mtime)
+        self._lock = threading.Lock()
+        self._last_scan = None
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def load(self):
+        """Scan the keys directory and (re)load any new or modified private keys."""
+        with self._lock:
+            self._scan()
+
+    def _scan(self):
+        self._last_scan = time.monotonic()
+        try:
+            names = os.listdir(self.keys_dir)
+        except FileNotFoundError:
+            return
+
+        for name in names:
+            if not name.endswith(PRIVATE_KEY_SUFFIX):
+                continue
+            key_id = name[:-len(PRIVATE_KEY_SUFFIX)]
+            if not self._servable(key_id):
+                continue
+            path = os.path.join(self.keys_dir, name)
+            mtime = os.stat(path).st_mtime_ns
+
+            cached = self._keys.get(key_id)
+            if cached is not None and cached[1] == mtime:
+                continue
+
+            with open(path, 'rb') as key_file:
+                private_key = serialization.load_pem_private_key(key_file.read(), password=None)
+            if cached is not None:
+                self.reloads += 1
+            self._keys[key_id] = (private_key, mtime)
+
+    def _servable(self, key_id):
+        return key_id.startswith(self.key_id_prefix)
+
+    def _reload_due(self):
+        if self._last_scan is None:
+            return True
+        return bool(self.reload_interval) and time.monotonic() - self._last_scan >= self.reload_interval
+
+    def _miss_rescan_due(self):
+        interval = self.reload_interval or self.MISS_RESCAN_INTERVAL
+        return self._last_scan is None or time.monotonic() - self._last_scan >= interval
+
+    def add(self, key_id, private_key):
+        """Register an already-parsed key, e.g. one rotated in without a file on disk."""
+        with self._lock:
+            if key_id in self._keys:
+                self.reloads += 1
+            self._keys[key_id] = (private_key, None)
+
+    def remove(self, key_id):
+        with self._lock:
+            self._keys.pop(key_id, None)
+
+    def get(self, key_id=None):
+        """Return the private key for ``key_id`` (the default key when omitted)."""
+        key_id = key_id or self.default_key_id
+        if not self._servable(key_id):
+            with self._lock:
+                self.misses += 1
+            raise KeyNotFound(key_id)
+
+        if self._reload_due():
+            with self._lock:
+                if self._reload_due():
+                    self._scan()
+
+        cached = self._keys.get(key_id)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached[0]
+
+        # Unknown key: a rotated key may have landed since the last scan.
+        with self._lock:
+            self.misses += 1
+            if self._miss_rescan_due():
+                self._scan()
+            cached = self._keys.get(key_id)
+        if cached is None:
+            raise KeyNotFound(key_id)
+        return cached[0]
+
+    def key_ids(self):
+        return sorted(self._keys)
+
+    def stats(self):
+        return {
+            'keys': self.key_ids(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'reloads': self.reloads,
+        }
+
+
+def fingerprint(public_key_pem):
+    """SHA-256 hex digest of the PEM bytes of a public key."""
+    return hashlib.sha256(public_key_pem).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe bounded LRU mapping whose entries expire ``ttl`` seconds after insertion (0 never expires)."""
+
+    def __init__(self, max_size=128, ttl=0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and (cached[1] is None or cached[1] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class PublicKeyCache(LRUCache):
+    """
+    Bounded LRU cache of parsed sender public keys, keyed by PEM fingerprint.
+
+    Entries expire ``ttl`` seconds after they were parsed (0 keeps them until
+    evicted). When ``allowlist`` is given, fingerprints outside it are rejected
+    before the PEM is parsed.
+    """
+
+    def __init__(self, max_size=128, ttl=3600, allowlist=None):
+        super().__init__(max_size=max_size, ttl=ttl)
+        self.allowlist = frozenset(allowlist) if allowlist is not None else None
+
+    def get(self, public_key_pem):
+        """Return the parsed public key for ``public_key_pem``, parsing it only on a miss."""
+        key_fingerprint = fingerprint(public_key_pem)
+        if self.allowlist is not None and key_fingerprint not in self.allowlist:
+            raise PublicKeyNotAllowed(key_fingerprint)
+
+        public_key = super().get(key_fingerprint)
+        if public_key is None:
+            public_key = serialization.load_pem_public_key(public_key_pem)
+            self.set(key_fingerprint, public_key)
+        return public_key
+
+
+_keyring = None
+_public_key_cache = None
+_keyring_lock = threading.Lock()
+
+
+def get_keyring():
+    """Return the process-wide key ring, building it from settings on first use."""
+    global _keyring
+    if _keyring is None:
+        with _keyring_lock:
+            if _keyring is None:
+                _keyring = KeyRing(
+                    getattr(settings, 'RSAAPI_KEYS_DIR', os.path.join(os.path.dirname(__file__), 'keys')),
+                    default_key_id=getattr(settings, 'RSAAPI_DEFAULT_KEY_ID', 'partner'),
+                    reload_interval=getattr(settings, 'RSAAPI_KEY_RELOAD_INTERVAL', 0),
+                    key_id_prefix=getattr(settings, 'RSAAPI_KEY_ID_PREFIX', 'partner'),
+                )
+    return _keyring
+
+
+def get_public_key_cache():
+    """Return the process-wide sender public key cache, building it from settings on first use."""
+    global _public_key_cache
+    if _public_key_cache is None:
+        with _keyring_lock:
+            if _public_key_cache is None:
+                _public_key_cache = PublicKeyCache(
+                    max_size=getattr(settings, 'RSAAPI_PUBLIC_KEY_CACHE_SIZE', 128),
+                    ttl=getattr(settings, 'RSAAPI_PUBLIC_KEY_CACHE_TTL', 3600),
+                    allowlist=getattr(settings, 'RSAAPI_PUBLIC_KEY_ALLOWLIST', None),
+                )
+    return _public_key_cache
+
+
+def reset_keyring():
+    """Drop the process-wide key ring and public key cache so they are rebuilt (used by tests)."""
+    global _keyring, _public_key_cache
+    with _keyring_lock:
+        _keyring = None
+        _public_key_cache = None
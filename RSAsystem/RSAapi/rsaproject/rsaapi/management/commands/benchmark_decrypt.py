@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from rsaapi import benchmarks
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the decrypt endpoints in-process (crypto layer and Django test client) and print "
+            "p50/p95/p99 latency and throughput as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--key-sizes', type=int, nargs='+', default=[2048, 3072, 4096])
+        parser.add_argument('--requests', type=int, default=200, help="Payloads per scenario.")
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--envelope', action='store_true', help="Use the hybrid RSA + AES-GCM envelope format.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        report = benchmarks.run(
+            key_sizes=options['key_sizes'],
+            requests=options['requests'],
+            batch_size=options['batch_size'],
+            use_envelope=options['envelope'],
+            progress=lambda message: self.stderr.write(message),
+        )
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(output)
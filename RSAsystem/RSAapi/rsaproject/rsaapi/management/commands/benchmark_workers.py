@@ -0,0 +1,73 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from rsaapi.benchmarks import BENCH_KEY_ID, BenchmarkKeys
+from rsaapi.keyring import get_keyring
+from rsaapi.workers import create_executor, decrypt_items
+
+
+class Command(BaseCommand):
+    help = "Measure batch verify+decrypt throughput (items/sec) against worker pool size."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=256, help="Payloads per run.")
+        parser.add_argument('--key-size', type=int, default=2048)
+        parser.add_argument('--kind', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--workers', type=int, nargs='+',
+                            help="Pool sizes to measure (default: powers of two up to the CPU count).")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        # Every run re-submits the same payloads, so keep the result cache and replay window out of the way.
+        with override_settings(RSAAPI_VERIFY_CACHE_TIMEOUT=0, RSAAPI_REPLAY_MAX_USES=None):
+            self.run(options)
+
+    def run(self, options):
+        cpus = os.cpu_count() or 1
+        worker_counts = options['workers'] or [n for n in (1, 2, 4, 8, 16, 32, 64) if n <= cpus] or [1]
+        keys = BenchmarkKeys(options['key_size'])
+        get_keyring().add(BENCH_KEY_ID, keys.partner_key)
+        items = keys.payloads(options['items'])
+        keys.cleanup()
+
+        # Warm the public key cache so every run measures the same crypto work.
+        decrypt_items(items[:1], executor=None)
+
+        results = []
+        baseline = None
+        for workers in worker_counts:
+            executor = create_executor(options['kind'], workers)
+            try:
+                start = time.perf_counter()
+                outcomes = decrypt_items(items, executor=executor)
+                elapsed = time.perf_counter() - start
+            finally:
+                executor.shutdown(wait=True)
+
+            failures = sum(1 for status_code, _ in outcomes if status_code != 200)
+            items_per_sec = len(items) / elapsed
+            baseline = baseline or items_per_sec
+            results.append({
+                'workers': workers,
+                'kind': options['kind'],
+                'items': len(items),
+                'seconds': round(elapsed, 4),
+                'items_per_sec': round(items_per_sec, 1),
+                'speedup': round(items_per_sec / baseline, 2),
+                'failures': failures,
+            })
+
+        get_keyring().remove(BENCH_KEY_ID)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for row in results:
+            self.stdout.write(
+                f"workers={row['workers']:<3} items/sec={row['items_per_sec']:<10} "
+                f"speedup={row['speedup']:<6} failures={row['failures']}"
+            )
@@ -1,3 +1,463 @@
-from django.test import TestCase
+import base64
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
 
-# Create your tests here.
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa, utils
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+
+from . import benchmarks, envelope
+from .crypto import DecryptError, decrypt_stream
+from .keyring import (
+    KeyNotFound, KeyRing, PublicKeyCache, PublicKeyNotAllowed, fingerprint, get_keyring, get_public_key_cache,
+    reset_keyring,
+)
+from .workers import create_executor, decrypt_items
+
+
+def generate_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def write_private_key(path, private_key):
+    with open(path, 'wb') as f:
+        f.write(private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        ))
+
+
+def build_payload(recipient_public_key, sender_private_key, message):
+    ciphertext = recipient_public_key.encrypt(
+        message,
+        padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
+    )
+    signature = sender_private_key.sign(
+        ciphertext,
+        padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH),
+        hashes.SHA256()
+    )
+    sender_public_key_pem = sender_private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return {
+        'encrypted_data': base64.b64encode(ciphertext).decode('utf-8'),
+        'signature': base64.b64encode(signature).decode('utf-8'),
+        'public_key': base64.b64encode(sender_public_key_pem).decode('utf-8'),
+    }
+
+
+class RSATestCase(SimpleTestCase):
+    """Base class that provides a throwaway keys directory with a partner and sender key."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner_key = generate_key()
+        cls.sender_key = generate_key()
+
+    def setUp(self):
+        self.keys_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.keys_dir)
+        write_private_key(os.path.join(self.keys_dir, 'partner_private_key.pem'), self.partner_key)
+
+        settings_override = override_settings(RSAAPI_KEYS_DIR=self.keys_dir, RSAAPI_KEY_RELOAD_INTERVAL=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        reset_keyring()
+        self.addCleanup(reset_keyring)
+        envelope.reset_data_key_cache()
+        self.addCleanup(envelope.reset_data_key_cache)
+        cache.clear()
+
+    def payload(self, message=b'partner1,customer1,token1', recipient_key=None):
+        recipient_key = recipient_key or self.partner_key
+        return build_payload(recipient_key.public_key(), self.sender_key, message)
+
+    def envelope_payload(self, message, data_key=None, wrapped_key=None):
+        sealed = envelope.seal(self.partner_key.public_key(), message, data_key=data_key, wrapped_key=wrapped_key)
+        signature = self.sender_key.sign(
+            sealed,
+            padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH),
+            hashes.SHA256()
+        )
+        return dict(
+            self.payload(),
+            encrypted_data=base64.b64encode(sealed).decode('utf-8'),
+            signature=base64.b64encode(signature).decode('utf-8'),
+        )
+
+
+class KeyRingTests(RSATestCase):
+    def test_keys_are_read_once(self):
+        keyring = KeyRing(self.keys_dir)
+        first = keyring.get()
+        second = keyring.get('partner')
+        self.assertIs(first, second)
+        self.assertEqual(keyring.stats(), {'keys': ['partner'], 'hits': 2, 'misses': 0, 'reloads': 0})
+
+    def test_unknown_key_counts_a_miss(self):
+        keyring = KeyRing(self.keys_dir)
+        with self.assertRaises(KeyNotFound):
+            keyring.get('missing')
+        self.assertEqual(keyring.misses, 1)
+
+    def test_rotated_key_is_picked_up_on_miss(self):
+        keyring = KeyRing(self.keys_dir)
+        keyring.load()
+        write_private_key(os.path.join(self.keys_dir, 'partner2_private_key.pem'), generate_key())
+        keyring._last_scan -= KeyRing.MISS_RESCAN_INTERVAL
+        self.assertIsNotNone(keyring.get('partner2'))
+        self.assertEqual(keyring.key_ids(), ['partner', 'partner2'])
+
+    def test_only_partner_keys_are_loaded(self):
+        write_private_key(os.path.join(self.keys_dir, 'sender_private_key.pem'), self.sender_key)
+        keyring = KeyRing(self.keys_dir)
+        keyring.load()
+        self.assertEqual(keyring.key_ids(), ['partner'])
+        with self.assertRaises(KeyNotFound):
+            keyring.get('sender')
+
+    def test_unknown_keys_do_not_rescan_every_request(self):
+        keyring = KeyRing(self.keys_dir)
+        keyring.load()
+        with mock.patch('os.listdir', wraps=os.listdir) as listdir:
+            for i in range(20):
+                with self.assertRaises(KeyNotFound):
+                    keyring.get(f'missing{i}')
+        self.assertEqual(listdir.call_count, 0)
+        self.assertEqual(keyring.misses, 20)
+
+    def test_modified_key_is_reloaded(self):
+        keyring = KeyRing(self.keys_dir, reload_interval=0.001)
+        original = keyring.get()
+        path = os.path.join(self.keys_dir, 'partner_private_key.pem')
+        write_private_key(path, generate_key())
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        keyring._last_scan -= 1
+        self.assertIsNot(keyring.get(), original)
+        self.assertEqual(keyring.reloads, 1)
+
+
+def public_key_pem(private_key):
+    return private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+
+
+class PublicKeyCacheTests(RSATestCase):
+    def test_same_pem_is_parsed_once(self):
+        cache = PublicKeyCache()
+        pem = public_key_pem(self.sender_key)
+        self.assertIs(cache.get(pem), cache.get(pem))
+        self.assertEqual(cache.stats(), {'size': 1, 'hits': 1, 'misses': 1, 'evictions': 0})
+
+    def test_least_recently_used_key_is_evicted(self):
+        cache = PublicKeyCache(max_size=2)
+        pems = [public_key_pem(self.sender_key), public_key_pem(self.partner_key), public_key_pem(generate_key())]
+        cache.get(pems[0])
+        cache.get(pems[1])
+        cache.get(pems[0])
+        cache.get(pems[2])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+        cache.get(pems[0])
+        self.assertEqual(cache.hits, 2)
+
+    def test_expired_entry_is_reparsed(self):
+        cache = PublicKeyCache(ttl=60)
+        pem = public_key_pem(self.sender_key)
+        cache.get(pem)
+        with mock.patch('rsaapi.keyring.time.monotonic', return_value=time.monotonic() + 61):
+            cache.get(pem)
+        self.assertEqual(cache.misses, 2)
+
+    def test_allowlist_rejects_before_parsing(self):
+        cache = PublicKeyCache(allowlist=[fingerprint(public_key_pem(self.sender_key))])
+        self.assertIsNotNone(cache.get(public_key_pem(self.sender_key)))
+        with self.assertRaises(PublicKeyNotAllowed):
+            cache.get(b'not even a pem')
+        self.assertEqual(cache.misses, 1)
+
+
+class DecryptAndVerifyDataTests(RSATestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_decrypts_with_cached_key(self):
+        for _ in range(2):
+            response = self.client.post('/api/decrypt/', self.payload(), format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data, {'partner_id': 'partner1', 'customer_id': 'customer1', 'auth_token': 'token1'})
+        self.assertEqual(get_keyring().reloads, 0)
+        self.assertEqual(get_keyring().hits, 2)
+        self.assertEqual(get_public_key_cache().stats()['misses'], 1)
+
+    def test_sender_key_outside_allowlist_is_rejected(self):
+        with override_settings(RSAAPI_PUBLIC_KEY_ALLOWLIST=['0' * 64]):
+            reset_keyring()
+            response = self.client.post('/api/decrypt/', self.payload(), format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_unknown_key_id(self):
+        payload = dict(self.payload(), key_id='nope')
+        response = self.client.post('/api/decrypt/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_sender_key_cannot_be_selected(self):
+        write_private_key(os.path.join(self.keys_dir, 'sender_private_key.pem'), self.sender_key)
+        payload = dict(self.payload(recipient_key=self.sender_key), key_id='sender')
+        response = self.client.post('/api/decrypt/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class DecryptAndVerifyBatchTests(RSATestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_bad_items_do_not_fail_the_batch(self):
+        tampered = self.payload()
+        tampered['signature'] = self.payload(b'other,message,here')['signature']
+        items = [
+            self.payload(b'p1,c1,t1'),
+            tampered,
+            {'encrypted_data': 'abc'},
+            'not an object',
+            self.payload(b'p2,c2,t2'),
+        ]
+        response = self.client.post('/api/decrypt/batch/', items, format='json')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([r['status'] for r in results], [200, 400, 400, 400, 200])
+        self.assertEqual([r.get('code') for r in results],
+                         [None, 'invalid_signature', 'missing_fields', 'invalid_item', None])
+        self.assertEqual(results[4]['partner_id'], 'p2')
+        self.assertEqual(get_public_key_cache().stats()['misses'], 1)
+
+    def test_rejects_non_array_body(self):
+        response = self.client.post('/api/decrypt/batch/', self.payload(), format='json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(RSAAPI_BATCH_MAX_ITEMS=1)
+    def test_rejects_oversized_batch(self):
+        response = self.client.post('/api/decrypt/batch/', [self.payload(), self.payload()], format='json')
+        self.assertEqual(response.status_code, 413)
+
+
+class WorkerPoolTests(RSATestCase):
+    def test_pool_results_match_inline_results_in_order(self):
+        items = [self.payload(f'p{i},c{i},t{i}'.encode()) for i in range(8)]
+        items[3] = dict(items[3], signature=items[4]['signature'])
+        executor = create_executor('thread', 4)
+        self.addCleanup(executor.shutdown)
+        self.assertEqual(decrypt_items(items, executor=executor), decrypt_items(items))
+        self.assertEqual(decrypt_items(items, executor=executor)[3][1]['code'], 'invalid_signature')
+
+    def test_decrypt_error_survives_pickling(self):
+        error = pickle.loads(pickle.dumps(DecryptError('invalid_signature', 'Invalid signature')))
+        self.assertEqual((error.code, error.status_code), ('invalid_signature', 400))
+
+
+class EnvelopeTests(RSATestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_decrypts_payload_larger_than_one_rsa_block(self):
+        auth_token = 'a' * 4096
+        payload = self.envelope_payload(f'partner1,customer1,{auth_token}'.encode())
+        response = self.client.post('/api/decrypt/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['auth_token'], auth_token)
+
+    def test_session_data_key_is_unwrapped_once(self):
+        data_key, wrapped_key = envelope.wrap_data_key(self.partner_key.public_key())
+        for i in range(3):
+            payload = self.envelope_payload(f'p{i},c{i},t{i}'.encode(), data_key=data_key, wrapped_key=wrapped_key)
+            response = self.client.post('/api/decrypt/', payload, format='json')
+            self.assertEqual(response.data['partner_id'], f'p{i}')
+        self.assertEqual(envelope.get_data_key_cache().stats()['misses'], 1)
+        self.assertEqual(envelope.get_data_key_cache().stats()['hits'], 2)
+
+    def test_tampered_envelope_is_rejected(self):
+        sealed = bytearray(envelope.seal(self.partner_key.public_key(), b'p,c,t'))
+        sealed[-1] ^= 1
+        with self.assertRaises(envelope.EnvelopeError):
+            envelope.open_envelope(self.partner_key, bytes(sealed))
+
+    def test_unsupported_version_is_rejected(self):
+        sealed = bytearray(envelope.seal(self.partner_key.public_key(), b'p,c,t'))
+        sealed[3] = 9
+        with self.assertRaisesMessage(envelope.EnvelopeError, 'Unsupported envelope version: 9'):
+            envelope.open_envelope(self.partner_key, bytes(sealed))
+
+
+class StreamingDecryptTests(RSATestCase):
+    chunk_size = 64 * 1024
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def seal_to_file(self, size, recipient_key=None):
+        """Seal ``size`` bytes of generated plaintext into a temp file; return it with the b64 signature."""
+        recipient_key = recipient_key or self.partner_key
+
+        def plaintext():
+            block = bytes(range(256)) * 256
+            remaining = size
+            while remaining:
+                yield block[:min(remaining, len(block))]
+                remaining -= min(remaining, len(block))
+
+        sealed_file = tempfile.TemporaryFile()
+        self.addCleanup(sealed_file.close)
+        digest = hashes.Hash(hashes.SHA256())
+        for part in envelope.seal_stream(recipient_key.public_key(), plaintext(), chunk_size=self.chunk_size):
+            digest.update(part)
+            sealed_file.write(part)
+        sealed_file.seek(0)
+        signature = self.sender_key.sign(
+            digest.finalize(),
+            padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH),
+            utils.Prehashed(hashes.SHA256())
+        )
+        return sealed_file, base64.b64encode(signature).decode('utf-8')
+
+    def peak_memory(self, size):
+        sealed_file, signature = self.seal_to_file(size)
+        tracemalloc.start()
+        try:
+            plaintext_file = decrypt_stream(sealed_file, signature, self.payload()['public_key'])
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        plaintext_file.seek(0, os.SEEK_END)
+        self.assertEqual(plaintext_file.tell(), size)
+        plaintext_file.close()
+        return peak
+
+    def test_peak_memory_stays_flat_as_payload_grows(self):
+        self.peak_memory(self.chunk_size)  # warm caches and lazy imports
+        small = self.peak_memory(1024 * 1024)
+        large = self.peak_memory(16 * 1024 * 1024)
+        self.assertLess(large, small * 1.5 + self.chunk_size)
+        self.assertLess(large, 16 * self.chunk_size)
+
+    def test_stream_endpoint_returns_plaintext(self):
+        sealed_file, signature = self.seal_to_file(200 * 1024 + 7)
+        response = self.client.post(
+            '/api/decrypt/stream/', sealed_file.read(), content_type='application/octet-stream',
+            HTTP_X_SIGNATURE=signature, HTTP_X_PUBLIC_KEY=self.payload()['public_key'],
+        )
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content)
+        self.assertEqual(len(body), 200 * 1024 + 7)
+        self.assertEqual(body[:256], bytes(range(256)))
+
+    def test_truncated_stream_is_rejected(self):
+        sealed_file, signature = self.seal_to_file(3 * self.chunk_size)
+        truncated = sealed_file.read()[:-(self.chunk_size // 2)]
+        response = self.client.post(
+            '/api/decrypt/stream/', truncated, content_type='application/octet-stream',
+            HTTP_X_SIGNATURE=signature, HTTP_X_PUBLIC_KEY=self.payload()['public_key'],
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['code'], 'invalid_envelope')
+
+    def test_stream_for_another_key_is_rejected(self):
+        sealed_file, signature = self.seal_to_file(1000, recipient_key=generate_key())
+        response = self.client.post(
+            '/api/decrypt/stream/', sealed_file.read(), content_type='application/octet-stream',
+            HTTP_X_SIGNATURE=signature, HTTP_X_PUBLIC_KEY=self.payload()['public_key'],
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['code'], 'invalid_envelope')
+
+    def test_wrong_signature_is_rejected(self):
+        sealed_file, _ = self.seal_to_file(1000)
+        _, other_signature = self.seal_to_file(1000)
+        response = self.client.post(
+            '/api/decrypt/stream/', sealed_file.read(), content_type='application/octet-stream',
+            HTTP_X_SIGNATURE=other_signature, HTTP_X_PUBLIC_KEY=self.payload()['public_key'],
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['code'], 'invalid_signature')
+
+    @override_settings(RSAAPI_STREAM_MAX_BYTES=1024)
+    def test_oversized_stream_is_rejected(self):
+        sealed_file, signature = self.seal_to_file(4096)
+        response = self.client.post(
+            '/api/decrypt/stream/', sealed_file.read(), content_type='application/octet-stream',
+            HTTP_X_SIGNATURE=signature, HTTP_X_PUBLIC_KEY=self.payload()['public_key'],
+        )
+        self.assertEqual(response.status_code, 413)
+
+
+class VerificationCacheTests(RSATestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_retry_is_answered_without_redoing_crypto(self):
+        payload = self.payload()
+        first = self.client.post('/api/decrypt/', payload, format='json')
+        with mock.patch.object(KeyRing, 'get', side_effect=AssertionError('crypto should be skipped')):
+            second = self.client.post('/api/decrypt/', payload, format='json')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data, first.data)
+
+    @override_settings(RSAAPI_REPLAY_MAX_USES=2)
+    def test_replayed_ciphertext_is_rejected_beyond_limit(self):
+        payload = self.payload()
+        statuses = [self.client.post('/api/decrypt/', payload, format='json').status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 409])
+        self.assertEqual(self.client.post('/api/decrypt/', self.payload(), format='json').status_code, 200)
+
+    @override_settings(RSAAPI_REPLAY_MAX_USES=2)
+    def test_replay_limit_ignores_pem_encoding_and_key_id(self):
+        payload = self.payload()
+        for _ in range(2):
+            self.assertEqual(self.client.post('/api/decrypt/', payload, format='json').status_code, 200)
+        padded_pem = base64.b64encode(public_key_pem(self.sender_key) + b'\n\n\n').decode('utf-8')
+        variants = [dict(payload, public_key=padded_pem), dict(payload, key_id='partner2')]
+        for variant in variants:
+            self.assertEqual(self.client.post('/api/decrypt/', variant, format='json').status_code, 409)
+
+    @override_settings(RSAAPI_REPLAY_MAX_USES=None, RSAAPI_VERIFY_CACHE_TIMEOUT=0)
+    def test_cache_and_replay_window_can_be_disabled(self):
+        payload = self.payload()
+        for _ in range(7):
+            self.assertEqual(self.client.post('/api/decrypt/', payload, format='json').status_code, 200)
+        self.assertEqual(get_keyring().hits, 7)
+
+
+class BenchmarkTests(SimpleTestCase):
+    def test_percentiles_use_nearest_rank(self):
+        samples = [i / 1000 for i in range(1, 101)]
+        summary = benchmarks.summarize(samples)
+        self.assertEqual((summary['p50_ms'], summary['p95_ms'], summary['p99_ms']), (50.0, 95.0, 99.0))
+        self.assertEqual(summary['operations'], 100)
+
+    def test_run_reports_every_scenario(self):
+        report = benchmarks.run(key_sizes=(1024,), requests=5, batch_size=2)
+        self.addCleanup(reset_keyring)
+        scenarios = {(r['layer'], r['mode'], r['key_cache']) for r in report['results']}
+        self.assertEqual(scenarios, {
+            ('crypto', 'single', 'cold'), ('crypto', 'single', 'warm'),
+            ('http', 'single', 'cold'), ('http', 'single', 'warm'), ('http', 'batch', 'warm'),
+        })
+        self.assertTrue(all(r['throughput_items_per_sec'] > 0 for r in report['results']))
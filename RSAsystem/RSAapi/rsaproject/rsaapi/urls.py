@@ -1,7 +1,9 @@
 from django.urls import path
-from .views import DecryptAndVerifyData
+from .views import DecryptAndVerifyBatch, DecryptAndVerifyData, DecryptAndVerifyStream
 
 
 urlpatterns = [
     path('decrypt/', DecryptAndVerifyData.as_view(), name='decrypt-client-data'),
+    path('decrypt/batch/', DecryptAndVerifyBatch.as_view(), name='decrypt-client-data-batch'),
+    path('decrypt/stream/', DecryptAndVerifyStream.as_view(), name='decrypt-client-data-stream'),
 ]
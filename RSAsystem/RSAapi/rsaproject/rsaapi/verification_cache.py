@@ -0,0 +1,79 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class VerificationCache:
+    """
+    Short-lived cache of decrypt_and_verify results plus a replay window, both
+    kept in the Django cache (locmem in development and tests, a shared backend
+    such as Redis or Memcached in production).
+
+    Results are keyed by a hash of (ciphertext, signature, sender key
+    fingerprint, key ID), so a byte-identical retry is answered without redoing
+    the PSS verify and OAEP decrypt. The replay counter is keyed by the message
+    alone (ciphertext and signature), so the same ciphertext is rejected once it
+    has been submitted more than RSAAPI_REPLAY_MAX_USES times in the window,
+    whatever PEM encoding or key ID accompanies it.
+    """
+    RESULT_PREFIX = "rsaapi_verify_"
+    REPLAY_PREFIX = "rsaapi_replay_"
+
+    @classmethod
+    def _cache(cls):
+        return caches[getattr(settings, 'RSAAPI_VERIFY_CACHE_ALIAS', 'default')]
+
+    @staticmethod
+    def _hash(*parts):
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(len(part).to_bytes(8, 'big'))
+            h.update(part)
+        return h.hexdigest()
+
+    @classmethod
+    def digest(cls, encrypted_data, signature, public_key_fingerprint, key_id=None):
+        """Key of the cached result for this exact request."""
+        return cls._hash(encrypted_data, signature, public_key_fingerprint.encode(), (key_id or '').encode())
+
+    @classmethod
+    def message_digest(cls, encrypted_data, signature):
+        """Key of the replay counter: the signed message only."""
+        return cls._hash(encrypted_data, signature)
+
+    @classmethod
+    def register_use(cls, digest):
+        """
+        Count one more submission of the message with this message_digest()
+        and return False when it exceeds the replay limit. Always True when
+        replay protection is off.
+        """
+        max_uses = getattr(settings, 'RSAAPI_REPLAY_MAX_USES', None)
+        if not max_uses:
+            return True
+
+        cache = cls._cache()
+        key = f"{cls.REPLAY_PREFIX}{digest}"
+        # add() only sets the counter when it is missing, so the window starts at the first use.
+        if cache.add(key, 1, getattr(settings, 'RSAAPI_REPLAY_WINDOW', 300)):
+            return True
+        try:
+            uses = cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr(): this is the first use of a new window.
+            cache.add(key, 1, getattr(settings, 'RSAAPI_REPLAY_WINDOW', 300))
+            return True
+        return uses <= max_uses
+
+    @classmethod
+    def get(cls, digest):
+        if not getattr(settings, 'RSAAPI_VERIFY_CACHE_TIMEOUT', 0):
+            return None
+        return cls._cache().get(f"{cls.RESULT_PREFIX}{digest}")
+
+    @classmethod
+    def set(cls, digest, result):
+        timeout = getattr(settings, 'RSAAPI_VERIFY_CACHE_TIMEOUT', 0)
+        if timeout:
+            cls._cache().set(f"{cls.RESULT_PREFIX}{digest}", result, timeout)
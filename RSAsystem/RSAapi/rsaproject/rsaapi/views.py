@@ -1,85 +1,72 @@
-import base64
-import os
-
-from cryptography.exceptions import InvalidSignature
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import padding
+from django.conf import settings
+from django.http import FileResponse
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .crypto import DecryptError, decrypt_and_verify, decrypt_stream
+from .workers import decrypt_items
+
 
 class DecryptAndVerifyData(APIView):
     def post(self, request):
-        # Retrieve data from request
-        encrypted_data_b64 = request.data.get('encrypted_data')
-        signature_b64 = request.data.get('signature')
-        public_key_b64 = request.data.get('public_key')
+        try:
+            result = decrypt_and_verify(
+                request.data.get('encrypted_data'),
+                request.data.get('signature'),
+                request.data.get('public_key'),
+                key_id=request.data.get('key_id'),
+            )
+        except DecryptError as e:
+            return Response({'error': e.message}, status=e.status_code)
 
-        # Missing data check
-        if not all([encrypted_data_b64, signature_b64, public_key_b64]):
-            return Response({'error': 'Missing encrypted_data, signature, or public_key'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
 
-        try:
-            # Decode base64 encoded data
-            def base64_decode_padded(data: str) -> bytes:
-                data = data.strip()
-                missing_padding = len(data) % 4
-                if missing_padding:
-                    data += '=' * (4 - missing_padding)
-                return base64.b64decode(data)
 
-            encrypted_data = base64_decode_padded(encrypted_data_b64)
-            signature = base64_decode_padded(signature_b64)
-            public_key_pem = base64_decode_padded(public_key_b64)
+class DecryptAndVerifyBatch(APIView):
+    """
+    Verify and decrypt a JSON array of ``{encrypted_data, signature, public_key}``
+    items in one request. Every item gets its own result and error code, so one
+    bad item does not fail the batch. Large batches are spread over the worker
+    pool.
+    """
 
-            # Load public key
-            public_key = serialization.load_pem_public_key(public_key_pem, backend=None)
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'error': 'Expected a JSON array of items'}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Verify the signature
-            try:
-                public_key.verify(signature, encrypted_data,  # Verify the encrypted data itself
-                    padding.PSS(
-                        mgf=padding.MGF1(hashes.SHA256()),
-                        salt_length=padding.PSS.MAX_LENGTH
-                    ),
-                    hashes.SHA256()
-                )
-                print("Signature is valid.")
-            except InvalidSignature:
-                return Response({'error': 'Invalid signature'}, status=status.HTTP_400_BAD_REQUEST)
-            except Exception as e:
-                return Response({'error': f'Error during signature verification: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+        max_items = getattr(settings, 'RSAAPI_BATCH_MAX_ITEMS', 1000)
+        if len(items) > max_items:
+            return Response({'error': f'Batch exceeds the limit of {max_items} items'},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
 
-            # Load private key for decryption
-            key_path = 'rsaapi/keys/partner_private_key.pem'
-            if not os.path.exists(key_path):
-                return Response({'error': 'Private key file not found'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        results = [
+            {'index': index, 'status': status_code, **body}
+            for index, (status_code, body) in enumerate(decrypt_items(items))
+        ]
 
-            with open(key_path, 'rb') as key_file:
-                private_key = serialization.load_pem_private_key(
-                    key_file.read(),
-                    password=None
-                )
+        return Response({'results': results})
 
-            # Decrypt the data
-            plaintext_bytes = private_key.decrypt(
-                encrypted_data,
-                padding.OAEP(
-                    mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                    algorithm=hashes.SHA256(),
-                    label=None
-                )
-            )
 
-            plaintext = plaintext_bytes.decode()
-            partner_id, customer_id, auth_token = plaintext.split(',')
+class DecryptAndVerifyStream(APIView):
+    """
+    Decrypt a large upload sent as a raw chunked envelope body, with the
+    base64 signature and sender public key in the X-Signature and X-Public-Key
+    headers. The body is consumed incrementally and the plaintext is streamed
+    back from a temporary file, so memory use does not grow with the upload.
+    """
 
-            return Response({
-                'partner_id': partner_id,
-                'customer_id': customer_id,
-                'auth_token': auth_token
-            })
+    def post(self, request):
+        try:
+            plaintext_file = decrypt_stream(
+                request.stream,
+                request.headers.get('X-Signature'),
+                request.headers.get('X-Public-Key'),
+                key_id=request.headers.get('X-Key-Id'),
+                max_bytes=getattr(settings, 'RSAAPI_STREAM_MAX_BYTES', None),
+            )
+        except DecryptError as e:
+            return Response({'error': e.message, 'code': e.code}, status=e.status_code)
 
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return FileResponse(plaintext_file, content_type='application/octet-stream')
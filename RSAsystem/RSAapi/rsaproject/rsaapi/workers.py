@@ -0,0 +1,57 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+
+from .crypto import decrypt_item
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def pool_size():
+    return getattr(settings, 'RSAAPI_WORKER_POOL_SIZE', None) or os.cpu_count() or 1
+
+
+def create_executor(kind='thread', workers=None):
+    """Build a verify/decrypt pool. The cryptography RSA operations release the GIL, so threads scale."""
+    workers = workers or pool_size()
+    if kind == 'process':
+        return ProcessPoolExecutor(max_workers=workers)
+    if kind == 'thread':
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rsaapi-worker')
+    raise ValueError(f"Unknown worker pool kind: {kind}")
+
+
+def get_executor():
+    """Return the process-wide worker pool, creating it from settings on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = create_executor(getattr(settings, 'RSAAPI_WORKER_POOL_KIND', 'thread'))
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def decrypt_items(items, executor=None):
+    """
+    Verify and decrypt ``items`` and return their ``(status_code, body)`` results
+    in order. Batches smaller than RSAAPI_PARALLEL_MIN_ITEMS, or a pool of one
+    worker, run inline in the calling thread.
+    """
+    min_items = getattr(settings, 'RSAAPI_PARALLEL_MIN_ITEMS', 16)
+    if executor is None:
+        if len(items) < min_items or pool_size() < 2:
+            return [decrypt_item(item) for item in items]
+        executor = get_executor()
+    chunksize = max(1, len(items) // (pool_size() * 4))
+    return list(executor.map(decrypt_item, items, chunksize=chunksize))
@@ -37,6 +37,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rest_framework',
+    'rsaapi',
 ]
 
 MIDDLEWARE = [
@@ -80,6 +82,17 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'rsaapi',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -120,3 +133,69 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# RSA API
+# Private keys are loaded into memory once; the directory is re-scanned for
+# rotated or modified keys at most every RSAAPI_KEY_RELOAD_INTERVAL seconds
+# (0 disables hot reload).
+
+RSAAPI_KEYS_DIR = BASE_DIR / 'rsaapi' / 'keys'
+
+RSAAPI_DEFAULT_KEY_ID = 'partner'
+
+# Only key IDs with this prefix can be selected by a request's key_id; other
+# keys in RSAAPI_KEYS_DIR (the sender key) are never loaded
+RSAAPI_KEY_ID_PREFIX = 'partner'
+
+RSAAPI_KEY_RELOAD_INTERVAL = 30
+
+# Parsed sender public keys are cached by the SHA-256 fingerprint of their PEM
+# bytes. Set RSAAPI_PUBLIC_KEY_ALLOWLIST to a list of fingerprints to reject
+# every other sender key before it is parsed.
+
+RSAAPI_PUBLIC_KEY_CACHE_SIZE = 128
+
+RSAAPI_PUBLIC_KEY_CACHE_TTL = 3600
+
+RSAAPI_PUBLIC_KEY_ALLOWLIST = None
+
+# Maximum number of items accepted by the batch decrypt endpoint.
+
+RSAAPI_BATCH_MAX_ITEMS = 1000
+
+# Worker pool used to verify and decrypt batches of at least
+# RSAAPI_PARALLEL_MIN_ITEMS items. RSAAPI_WORKER_POOL_KIND is 'thread' or
+# 'process'; a pool size of None uses one worker per CPU.
+
+RSAAPI_WORKER_POOL_KIND = 'thread'
+
+RSAAPI_WORKER_POOL_SIZE = None
+
+RSAAPI_PARALLEL_MIN_ITEMS = 16
+
+# Unwrapped AES data keys of hybrid envelopes, cached so senders reusing one
+# data key per session only pay for the RSA unwrap once.
+
+RSAAPI_DATA_KEY_CACHE_SIZE = 1024
+
+RSAAPI_DATA_KEY_CACHE_TTL = 900
+
+# Largest chunked envelope accepted by the streaming decrypt endpoint, in bytes.
+
+RSAAPI_STREAM_MAX_BYTES = 1024 * 1024 * 1024
+
+# Successful verify+decrypt results are cached for RSAAPI_VERIFY_CACHE_TIMEOUT
+# seconds (0 disables) so byte-identical retries skip the RSA work. The same
+# cache tracks a replay window: a ciphertext and signature submitted more than
+# RSAAPI_REPLAY_MAX_USES times within RSAAPI_REPLAY_WINDOW seconds is rejected
+# (None disables). Point RSAAPI_VERIFY_CACHE_ALIAS at a shared backend when
+# running several processes.
+
+RSAAPI_VERIFY_CACHE_ALIAS = 'default'
+
+RSAAPI_VERIFY_CACHE_TIMEOUT = 60
+
+RSAAPI_REPLAY_WINDOW = 300
+
+RSAAPI_REPLAY_MAX_USES = 5
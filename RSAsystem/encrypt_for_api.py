@@ -1,114 +1,166 @@
 import base64
-import datetime
 import json
 import os
+import struct
+import sys
 
-import jwt
-from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import padding as asym_padding
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 # --- Keys ---
-# Recipient's public key (for encryption)
-RECIPIENT_PUBLIC_KEY_PATH = 'rsaapi/keys/partner_public_key.pem'
-# Sender's private key (for signing)
-SENDER_PRIVATE_KEY_PATH = 'rsaapi/keys/sender_private_key.pem' # You'll need to generate this key pair
-# Sender's public key (to be sent to recipient for signature verification)
-SENDER_PUBLIC_KEY_PATH = 'rsaapi/keys/sender_public_key.pem'  # You'll need to generate this key pair
+# Keystore written by generate_keys.py (<key_id>_private_key.pem / <key_id>_public_key.pem)
+KEYSTORE_DIR = 'rsaapi/keys'
+# Recipient's key pair (its public key is used for encryption)
+RECIPIENT_KEY_ID = 'partner'
+# Sender's key pair (private key for signing, public key sent to the recipient for verification)
+SENDER_KEY_ID = 'sender'  # Generated on first run if missing
+
+# --- Hybrid envelope (pass --envelope to use it) ---
+# RSA-wrapped AES-256-GCM data key + GCM ciphertext, so the message is not limited
+# to one RSA block. Must match rsaapi/envelope.py:
+#   b'RSE' | version | wrapped key length (2 bytes) | wrapped key | nonce (12 bytes) | ciphertext + tag
+ENVELOPE_MAGIC = b'RSE'
+ENVELOPE_VERSION = 1
+ENVELOPE_HEADER = struct.Struct('>3sBH')
+
+
+class EnvelopeSession:
+    """Wraps one AES-256 data key for the recipient and reuses it for every message sealed in the session."""
+
+    def __init__(self, recipient_public_key):
+        self.data_key = AESGCM.generate_key(bit_length=256)
+        self.wrapped_key = recipient_public_key.encrypt(
+            self.data_key,
+            asym_padding.OAEP(
+                mgf=asym_padding.MGF1(algorithm=hashes.SHA256()),
+                algorithm=hashes.SHA256(),
+                label=None
+            )
+        )
+
+    def seal(self, plaintext):
+        header = ENVELOPE_HEADER.pack(ENVELOPE_MAGIC, ENVELOPE_VERSION, len(self.wrapped_key)) + self.wrapped_key
+        nonce = os.urandom(12)
+        return header + nonce + AESGCM(self.data_key).encrypt(nonce, plaintext, header)
+
+
+_keystore = None
+
+
+def keystore():
+    """Keystore for KEYSTORE_DIR, created on first use; keys are only read when asked for."""
+    global _keystore
+    if _keystore is None:
+        from generate_keys import KeyStore
+        _keystore = KeyStore(KEYSTORE_DIR)
+    return _keystore
+
 
 # --- Helper function to generate sender keys if they don't exist (for demonstration) ---
 def generate_and_save_sender_keys_if_needed():
+    store = keystore()
+    if not store.exists(SENDER_KEY_ID):
+        from generate_keys import generate_key_pairs, write_keystore
 
-    if not os.path.exists(SENDER_PRIVATE_KEY_PATH) or not os.path.exists(SENDER_PUBLIC_KEY_PATH):
         print("Sender keys not found, generating new ones...")
-        private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=2048
-        )
-        with open(SENDER_PRIVATE_KEY_PATH, 'wb') as f:
-            f.write(private_key.private_bytes(
-                encoding=serialization.Encoding.PEM,
-                format=serialization.PrivateFormat.PKCS8,
-                encryption_algorithm=serialization.NoEncryption()
-            ))
-        public_key = private_key.public_key()
-        with open(SENDER_PUBLIC_KEY_PATH, 'wb') as f:
-            f.write(public_key.public_bytes(
-                encoding=serialization.Encoding.PEM,
-                format=serialization.PublicFormat.SubjectPublicKeyInfo
-            ))
-        print(f"Sender keys generated and saved to {SENDER_PRIVATE_KEY_PATH} and {SENDER_PUBLIC_KEY_PATH}")
-
-# Generate sender keys if they don't exist (you might do this once separately)
-generate_and_save_sender_keys_if_needed()
+        write_keystore(KEYSTORE_DIR, [SENDER_KEY_ID], generate_key_pairs(1), key_size=2048)
+        store.refresh()
+        print(f"Sender keys generated and saved to {KEYSTORE_DIR}/ as '{SENDER_KEY_ID}'")
 
 
 # 1. Load Recipient's Public Key (for encryption)
-with open(RECIPIENT_PUBLIC_KEY_PATH, 'rb') as f:
-    recipient_public_key = serialization.load_pem_public_key(f.read())
+def load_recipient_public_key(key_id=RECIPIENT_KEY_ID):
+    return keystore().public_key(key_id)
+
 
 # 2. Load Sender's Private Key (for signing)
-with open(SENDER_PRIVATE_KEY_PATH, 'rb') as f:
-    sender_private_key = serialization.load_pem_private_key(
-        f.read(),
-        password=None # Assuming no password on the private key for simplicity
-    )
+def load_sender_private_key(key_id=SENDER_KEY_ID):
+    return keystore().private_key(key_id)
+
 
 # 3. Load Sender's Public Key (to send to recipient)
-with open(SENDER_PUBLIC_KEY_PATH, 'rb') as f:
-    sender_public_key_pem = f.read() # Read as bytes to be base64 encoded later
-
-
-# --- Data to encrypt ---
-partner_id = "partner12520"*5
-customer_id = 'customer456'
-auth_token="a"*80
-message = f'{partner_id},{customer_id},{auth_token}'.encode()
-print(f'Message: {partner_id},{customer_id},{auth_token}')
-
-# --- Encrypt with Recipient's RSA public key and OAEP padding ---
-ciphertext = recipient_public_key.encrypt(
-    message,
-    asym_padding.OAEP( # Use the renamed import
-        mgf=asym_padding.MGF1(algorithm=hashes.SHA256()),
-        algorithm=hashes.SHA256(),
-        label=None
+def load_sender_public_key_pem(key_id=SENDER_KEY_ID):
+    return keystore().public_key_pem(key_id) # Bytes, base64 encoded later
+
+
+def encrypt_message(recipient_public_key, message, session=None):
+    if session is not None:
+        # --- Encrypt into a hybrid envelope (no size limit, data key reusable for the session) ---
+        return session.seal(message)
+
+    # --- Encrypt with Recipient's RSA public key and OAEP padding ---
+    return recipient_public_key.encrypt(
+        message,
+        asym_padding.OAEP( # Use the renamed import
+            mgf=asym_padding.MGF1(algorithm=hashes.SHA256()),
+            algorithm=hashes.SHA256(),
+            label=None
+        )
+    )
+
+
+def sign_ciphertext(sender_private_key, ciphertext):
+    # --- Sign the CIPHERTEXT with Sender's RSA private key and PSS padding ---
+    return sender_private_key.sign(
+        ciphertext, # Sign the encrypted data
+        asym_padding.PSS( # Use the renamed import
+            mgf=asym_padding.MGF1(hashes.SHA256()),
+            salt_length=asym_padding.PSS.MAX_LENGTH
+        ),
+        hashes.SHA256()
     )
-)
-
-# --- Sign the CIPHERTEXT with Sender's RSA private key and PSS padding ---
-signature = sender_private_key.sign(
-    ciphertext, # Sign the encrypted data
-    asym_padding.PSS( # Use the renamed import
-        mgf=asym_padding.MGF1(hashes.SHA256()),
-        salt_length=asym_padding.PSS.MAX_LENGTH
-    ),
-    hashes.SHA256()
-)
-
-# --- Base64 encode data for transmission ---
-encrypted_data_b64 = base64.b64encode(ciphertext).decode('utf-8')
-signature_b64 = base64.b64encode(signature).decode('utf-8')
-sender_public_key_b64 = base64.b64encode(sender_public_key_pem).decode('utf-8')
-
-
-# --- Output ---
-print("--- Data to be sent to the recipient ---")
-print("\nBase64 Encrypted Data:")
-print(encrypted_data_b64)
-
-print("\nBase64 Signature of Encrypted Data:")
-print(signature_b64)
-
-print("\nBase64 Sender's Public Key (for signature verification):")
-print(sender_public_key_b64)
-
-# You would typically package this into a JSON object for an API call
-payload_for_api = {
-    "encrypted_data": encrypted_data_b64,
-    "signature": signature_b64,
-    "public_key": sender_public_key_b64 # This is the sender's public key
-}
-
-print("\nJSON Payload Example:")
-print(json.dumps(payload_for_api, indent=2))
+
+
+def build_payload(recipient_public_key, sender_private_key, sender_public_key_pem, message, session=None):
+    """Encrypt and sign ``message`` and return the JSON payload expected by the decrypt API."""
+    ciphertext = encrypt_message(recipient_public_key, message, session)
+    signature = sign_ciphertext(sender_private_key, ciphertext)
+
+    # --- Base64 encode data for transmission ---
+    return {
+        "encrypted_data": base64.b64encode(ciphertext).decode('utf-8'),
+        "signature": base64.b64encode(signature).decode('utf-8'),
+        "public_key": base64.b64encode(sender_public_key_pem).decode('utf-8') # This is the sender's public key
+    }
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    use_envelope = '--envelope' in argv  # hybrid RSA + AES-GCM envelope instead of a single RSA block
+
+    # Generate sender keys if they don't exist (you might do this once separately)
+    generate_and_save_sender_keys_if_needed()
+
+    recipient_public_key = load_recipient_public_key()
+    sender_private_key = load_sender_private_key()
+    sender_public_key_pem = load_sender_public_key_pem()
+
+    # --- Data to encrypt ---
+    partner_id = "partner12520"*5
+    customer_id = 'customer456'
+    auth_token="a"*80
+    message = f'{partner_id},{customer_id},{auth_token}'.encode()
+    print(f'Message: {partner_id},{customer_id},{auth_token}')
+
+    session = EnvelopeSession(recipient_public_key) if use_envelope else None
+    payload_for_api = build_payload(recipient_public_key, sender_private_key, sender_public_key_pem, message, session)
+
+    # --- Output ---
+    print("--- Data to be sent to the recipient ---")
+    print("\nBase64 Encrypted Data:")
+    print(payload_for_api["encrypted_data"])
+
+    print("\nBase64 Signature of Encrypted Data:")
+    print(payload_for_api["signature"])
+
+    print("\nBase64 Sender's Public Key (for signature verification):")
+    print(payload_for_api["public_key"])
+
+    # You would typically package this into a JSON object for an API call
+    print("\nJSON Payload Example:")
+    print(json.dumps(payload_for_api, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,172 @@
-from cryptography.hazmat.primitives.asymmetric import rsa
+"""
+Generate RSA key pairs into a keystore directory.
+
+    python generate_keys.py                              # partner key pair, as before
+    python generate_keys.py --count 8 --prefix sender    # sender-1 ... sender-8, generated in parallel
+
+Each key pair is written as ``<key_id>_private_key.pem`` / ``<key_id>_public_key.pem``
+(the naming the rsaapi key ring loads) and recorded in ``index.json`` in the
+keystore. Nothing runs on import: other scripts use ``KeyStore`` to load keys
+lazily, on first use.
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
 from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
 
-# Generate private key
-private_key = rsa.generate_private_key(
-    public_exponent=65537,
-    key_size=2048
-)
+KEYSTORE_DIR = 'rsaapi/keys'
+INDEX_FILE = 'index.json'
+PRIVATE_KEY_SUFFIX = '_private_key.pem'
+PUBLIC_KEY_SUFFIX = '_public_key.pem'
 
-# Serialize and save private key to file
-with open('rsaapi/keys/partner_private_key.pem', 'wb') as f:
-    f.write(private_key.private_bytes(
+
+def generate_key_pair_pem(key_size=2048):
+    """Generate one key pair and return ``(private_pem, public_pem)`` (bytes, so it can cross processes)."""
+    # Generate private key
+    private_key = rsa.generate_private_key(
+        public_exponent=65537,
+        key_size=key_size
+    )
+    private_pem = private_key.private_bytes(
         encoding=serialization.Encoding.PEM,
         format=serialization.PrivateFormat.PKCS8,
         encryption_algorithm=serialization.NoEncryption()  # No password encryption for simplicity
-    ))
-
-# Generate public key
-public_key = private_key.public_key()
-
-# Serialize and save public key to file
-with open('rsaapi/keys/partner_public_key.pem', 'wb') as f:
-    f.write(public_key.public_bytes(
+    )
+    public_pem = private_key.public_key().public_bytes(
         encoding=serialization.Encoding.PEM,
         format=serialization.PublicFormat.SubjectPublicKeyInfo
-    ))
+    )
+    return private_pem, public_pem
+
+
+def generate_key_pairs(count, key_size=2048, workers=None):
+    """Generate ``count`` key pairs, spread over a process pool when there is more than one."""
+    if count == 1 or workers == 1:
+        return [generate_key_pair_pem(key_size) for _ in range(count)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(generate_key_pair_pem, [key_size] * count))
+
+
+def key_ids_for(prefix, count):
+    if count == 1:
+        return [prefix]
+    return [f'{prefix}-{i}' for i in range(1, count + 1)]
+
+
+def read_index(keystore_dir=KEYSTORE_DIR):
+    try:
+        with open(os.path.join(keystore_dir, INDEX_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'keys': {}}
+
+
+def write_keystore(keystore_dir, key_ids, pairs, key_size):
+    """Write the PEM files for ``key_ids`` and merge them into the keystore index."""
+    os.makedirs(keystore_dir, exist_ok=True)
+    index = read_index(keystore_dir)
+    created_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+    for key_id, (private_pem, public_pem) in zip(key_ids, pairs):
+        # Serialize and save private key to file
+        with open(os.path.join(keystore_dir, key_id + PRIVATE_KEY_SUFFIX), 'wb') as f:
+            f.write(private_pem)
+        # Serialize and save public key to file
+        with open(os.path.join(keystore_dir, key_id + PUBLIC_KEY_SUFFIX), 'wb') as f:
+            f.write(public_pem)
+        index['keys'][key_id] = {
+            'private_key': key_id + PRIVATE_KEY_SUFFIX,
+            'public_key': key_id + PUBLIC_KEY_SUFFIX,
+            'key_size': key_size,
+            'fingerprint': hashlib.sha256(public_pem).hexdigest(),
+            'created_at': created_at,
+        }
+
+    # Write the index atomically so readers never see a half-written file.
+    tmp_path = os.path.join(keystore_dir, INDEX_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(keystore_dir, INDEX_FILE))
+    return index
+
+
+class KeyStore:
+    """
+    Lazy reader for a keystore directory. Files are only read and parsed the
+    first time a key is asked for, then kept in memory.
+    """
+
+    def __init__(self, keystore_dir=KEYSTORE_DIR):
+        self.keystore_dir = keystore_dir
+        self._index = None
+        self._private_keys = {}
+        self._public_key_pems = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Forget the cached index and keys so they are re-read on next use."""
+        with self._lock:
+            self._index = None
+            self._private_keys.clear()
+            self._public_key_pems.clear()
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = read_index(self.keystore_dir)
+        return self._index
+
+    def key_ids(self):
+        return sorted(self.index['keys'])
+
+    def _path(self, key_id, suffix):
+        entry = self.index['keys'].get(key_id)
+        name = entry['private_key' if suffix == PRIVATE_KEY_SUFFIX else 'public_key'] if entry else key_id + suffix
+        return os.path.join(self.keystore_dir, name)
+
+    def exists(self, key_id):
+        return (os.path.exists(self._path(key_id, PRIVATE_KEY_SUFFIX))
+                and os.path.exists(self._path(key_id, PUBLIC_KEY_SUFFIX)))
+
+    def private_key(self, key_id):
+        with self._lock:
+            if key_id not in self._private_keys:
+                with open(self._path(key_id, PRIVATE_KEY_SUFFIX), 'rb') as f:
+                    self._private_keys[key_id] = serialization.load_pem_private_key(f.read(), password=None)
+            return self._private_keys[key_id]
+
+    def public_key_pem(self, key_id):
+        with self._lock:
+            if key_id not in self._public_key_pems:
+                with open(self._path(key_id, PUBLIC_KEY_SUFFIX), 'rb') as f:
+                    self._public_key_pems[key_id] = f.read()
+            return self._public_key_pems[key_id]
+
+    def public_key(self, key_id):
+        return serialization.load_pem_public_key(self.public_key_pem(key_id))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate RSA key pairs into a keystore directory.")
+    parser.add_argument('--count', type=int, default=1, help="Number of key pairs to generate.")
+    parser.add_argument('--key-size', type=int, default=2048)
+    parser.add_argument('--prefix', default='partner', help="Key ID, or key ID prefix when --count > 1.")
+    parser.add_argument('--keystore', default=KEYSTORE_DIR)
+    parser.add_argument('--workers', type=int, help="Worker processes (default: one per CPU).")
+    args = parser.parse_args(argv)
+
+    key_ids = key_ids_for(args.prefix, args.count)
+    pairs = generate_key_pairs(args.count, args.key_size, args.workers)
+    write_keystore(args.keystore, key_ids, pairs, args.key_size)
+
+    print(f"{len(key_ids)} RSA key pair(s) generated and saved in {args.keystore}/: {', '.join(key_ids)}")
+
 
-print("RSA key pair generated and saved in rsaapi/keys/")
+if __name__ == '__main__':
+    main()
@@ -6,7 +6,9 @@ It defines how models are displayed, filtered, and edited in the admin interface
 """
 
 from django.contrib import admin
+from django.db.models import F
 from .models import Category, Product, Cart, CartItem, Order, OrderItem
+from .paginators import EstimatedCountPaginator
 
 
 @admin.register(Category)
@@ -20,6 +22,7 @@ class CategoryAdmin(admin.ModelAdmin):
 class ProductAdmin(admin.ModelAdmin):
     """Admin configuration for the Product model."""
     list_display = ('name', 'category', 'price', 'stock')
+    list_select_related = ('category',)
     list_filter = ('category',)
     search_fields = ('name', 'description')
     
@@ -42,6 +45,11 @@ class CartItemInline(admin.TabularInline):
     model = CartItem
     extra = 0
     readonly_fields = ('total_price',)
+    raw_id_fields = ('product',)  # No <select> of every product per row
+    
+    def get_queryset(self, request):
+        """Load each item's product with it (total_price reads the product price)."""
+        return super().get_queryset(request).select_related('product')
 
 
 @admin.register(Cart)
@@ -50,17 +58,33 @@ class CartAdmin(admin.ModelAdmin):
     list_display = ('customer_id', 'created_at', 'updated_at', 'item_count', 'cart_total')
     search_fields = ('customer_id',)
     inlines = [CartItemInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def get_queryset(self, request):
+        """
+        Annotate the item count and total for the changelist columns.
+        
+        They are read from the cart's cached columns (kept current by
+        update_cart_totals) instead of aggregating the items, so sorting by
+        them needs no JOIN or GROUP BY.
+        """
+        return super().get_queryset(request).annotate(
+            item_count=F('cached_item_count'),
+            cart_total=F('cached_total'),
+        )
     
     def item_count(self, obj):
         """Return the number of items in the cart."""
-        return obj.items.count()
+        return obj.item_count
     item_count.short_description = 'Items'
+    item_count.admin_order_field = 'item_count'
     
     def cart_total(self, obj):
-        """Calculate and return the total value of the cart."""
-        total = sum(item.total_price for item in obj.items.all())
-        return f"${total:.2f}"
+        """Return the total value of the cart."""
+        return f"${obj.cart_total:.2f}"
     cart_total.short_description = 'Total'
+    cart_total.admin_order_field = 'cart_total'
 
 
 class OrderItemInline(admin.TabularInline):
@@ -68,6 +92,7 @@ class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
     readonly_fields = ('price',)
+    raw_id_fields = ('product',)  # No <select> of every product per row
 
 
 @admin.register(Order)
@@ -78,6 +103,8 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ('customer_id', 'id')
     inlines = [OrderItemInline]
     date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = (
         (None, {
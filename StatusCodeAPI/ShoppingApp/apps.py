@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ShoppingAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'shoppingapp'
+
+    def ready(self):
+        # Connect the stock, cart total and catalog cache receivers in every process, not only where the views are imported
+        from . import signals  # noqa: F401
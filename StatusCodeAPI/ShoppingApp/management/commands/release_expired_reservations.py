@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ...services import InventoryService
+
+
+class Command(BaseCommand):
+    help = "Give back the stock held by expired cart reservations. Run it periodically, e.g. from cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help="Release at most this many reservations.")
+
+    def handle(self, *args, **options):
+        released = InventoryService.release_expired(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired reservation(s)."))
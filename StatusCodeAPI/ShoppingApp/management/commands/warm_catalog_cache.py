@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from ...services import CatalogService
+
+
+class Command(BaseCommand):
+    help = (
+        "Load categories, featured products, per-category product lists and "
+        "product details into the catalog cache so the first browse requests "
+        "after a deploy or cache flush do not hit the database."
+    )
+
+    def handle(self, *args, **options):
+        cached = CatalogService.warm()
+        self.stdout.write(self.style.SUCCESS(
+            f"Cached {cached} catalog entries (version {CatalogService.version()})."
+        ))
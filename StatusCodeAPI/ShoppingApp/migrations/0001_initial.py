@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_id', models.CharField(help_text='Unique identifier for the customer', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When the cart was created')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='When the cart was last updated')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Category name', max_length=100)),
+                ('description', models.TextField(blank=True, help_text='Optional category description', null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Categories',
+            },
+        ),
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_id', models.CharField(help_text='Unique identifier for the customer', max_length=100)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], default='pending', help_text='Current status of the order', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When the order was created')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='When the order was last updated')),
+                ('total_amount', models.DecimalField(decimal_places=2, help_text='Total order amount in dollars', max_digits=10)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Product name', max_length=200)),
+                ('description', models.TextField(help_text='Detailed product description')),
+                ('price', models.DecimalField(decimal_places=2, help_text='Product price in dollars', max_digits=10)),
+                ('image_url', models.URLField(blank=True, help_text='URL to product image', null=True)),
+                ('stock', models.PositiveIntegerField(default=0, help_text='Current quantity available for purchase')),
+                ('category', models.ForeignKey(help_text='Category this product belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='products', to='shoppingapp.category')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1, help_text='Quantity of the product purchased')),
+                ('price', models.DecimalField(decimal_places=2, help_text='Price of the product at time of purchase', max_digits=10)),
+                ('order', models.ForeignKey(help_text='Order this item belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='items', to='shoppingapp.order')),
+                ('product', models.ForeignKey(help_text='Product purchased', on_delete=django.db.models.deletion.CASCADE, to='shoppingapp.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1, help_text='Quantity of the product')),
+                ('cart', models.ForeignKey(help_text='Cart this item belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='items', to='shoppingapp.cart')),
+                ('product', models.ForeignKey(help_text='Product added to the cart', on_delete=django.db.models.deletion.CASCADE, to='shoppingapp.product')),
+            ],
+        ),
+    ]
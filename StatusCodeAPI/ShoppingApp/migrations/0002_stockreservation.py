@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(help_text="Quantity taken out of the product's stock")),
+                ('expires_at', models.DateTimeField(db_index=True, help_text='When the stock is given back if the cart has not been checked out')),
+                ('cart_item', models.OneToOneField(help_text='Cart item the stock is held for', on_delete=django.db.models.deletion.CASCADE, related_name='reservation', to='shoppingapp.cartitem')),
+                ('product', models.ForeignKey(help_text='Product the stock was taken from', on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='shoppingapp.product')),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:47
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_cart_totals(apps, schema_editor):
+    Cart = apps.get_model('shoppingapp', 'Cart')
+    CartItem = apps.get_model('shoppingapp', 'CartItem')
+    price = DecimalField(max_digits=10, decimal_places=2)
+    items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    line_total = ExpressionWrapper(F('quantity') * F('product__price'), output_field=price)
+    Cart.objects.update(
+        cached_total=Coalesce(Subquery(items.annotate(total=Sum(line_total)).values('total')), Value(0, output_field=price)),
+        cached_item_count=Coalesce(Subquery(items.annotate(count=Count('pk')).values('count')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingapp', '0002_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='cached_item_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of cart items, kept up to date by update_cart_totals()'),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='cached_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Total price of the cart items, kept up to date by update_cart_totals()', max_digits=10),
+        ),
+        migrations.RunPython(backfill_cart_totals, migrations.RunPython.noop),
+    ]
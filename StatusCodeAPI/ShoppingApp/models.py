@@ -5,7 +5,12 @@ This module defines the data models for the e-commerce shopping application.
 It includes models for products, categories, shopping carts, and orders.
 """
 
+import threading
+from contextlib import contextmanager
+
 from django.db import models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 
 
 class Category(models.Model):
@@ -60,6 +65,11 @@ class Product(models.Model):
         """String representation of the product"""
         return self.name
     
+    def save(self, *args, **kwargs):
+        """Save the product and re-price the carts holding it"""
+        super().save(*args, **kwargs)
+        update_cart_totals(Cart.objects.filter(items__product=self))
+    
     def is_in_stock(self):
         """Check if the product is currently in stock"""
         return self.stock > 0
@@ -84,14 +94,31 @@ class Cart(models.Model):
         auto_now=True, 
         help_text="When the cart was last updated"
     )
+    cached_total = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        help_text="Total price of the cart items, kept up to date by update_cart_totals()"
+    )
+    cached_item_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of cart items, kept up to date by update_cart_totals()"
+    )
     
     def __str__(self):
         """String representation of the cart"""
         return f"Cart for {self.customer_id}"
     
     def get_total(self):
-        """Calculate the total price of all items in the cart"""
-        return sum(item.total_price for item in self.items.all())
+        """Calculate the total price of all items in the cart, in one aggregate query"""
+        return self.items.aggregate(total=Coalesce(Sum(line_total()), Value(0, output_field=PRICE_FIELD)))['total']
+    
+    def refresh_totals(self):
+        """Recompute the cached total and item count (one UPDATE) and reload them"""
+        update_cart_totals(Cart.objects.filter(pk=self.pk))
+        self.refresh_from_db(fields=['cached_total', 'cached_item_count'])
 
 
 class CartItem(models.Model):
@@ -120,12 +147,108 @@ class CartItem(models.Model):
         """String representation of the cart item"""
         return f"{self.quantity} x {self.product.name}"
     
+    def save(self, *args, **kwargs):
+        """Save the item and update the cart's cached totals"""
+        super().save(*args, **kwargs)
+        update_cart_totals(Cart.objects.filter(pk=self.cart_id))
+    
     @property
     def total_price(self):
         """Calculate the total price for this cart item (quantity * price)"""
         return self.quantity * self.product.price
 
 
+PRICE_FIELD = DecimalField(max_digits=10, decimal_places=2)
+
+
+def line_total():
+    """Expression for quantity * product price of a cart item"""
+    return ExpressionWrapper(F('quantity') * F('product__price'), output_field=PRICE_FIELD)
+
+
+def update_cart_totals(carts):
+    """
+    Recompute cached_total and cached_item_count for a queryset of carts in a single UPDATE.
+    
+    CartItem.save() calls this, and so does every delete of a cart item,
+    including queryset and cascade deletes (see signals.refresh_cart_totals);
+    code that changes cart items with queryset update() must call it too.
+    """
+    items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    return carts.update(
+        cached_total=Coalesce(
+            Subquery(items.annotate(total=Sum(line_total())).values('total')),
+            Value(0, output_field=PRICE_FIELD)
+        ),
+        cached_item_count=Coalesce(Subquery(items.annotate(count=Count('pk')).values('count')), Value(0)),
+    )
+
+
+_deferred_totals = threading.local()
+
+
+@contextmanager
+def deferred_cart_totals():
+    """
+    Refresh the totals of carts whose items are deleted inside the block once, at
+    the end, instead of once per deleted item.
+    """
+    if getattr(_deferred_totals, 'cart_ids', None) is not None:
+        yield  # Already deferred by an enclosing block
+        return
+    _deferred_totals.cart_ids = cart_ids = set()
+    try:
+        yield
+    finally:
+        _deferred_totals.cart_ids = None
+    if cart_ids:
+        update_cart_totals(Cart.objects.filter(pk__in=cart_ids))
+
+
+def cart_items_deleted(cart_id):
+    """Refresh the cart's totals now, or at the end of the enclosing deferred_cart_totals() block"""
+    cart_ids = getattr(_deferred_totals, 'cart_ids', None)
+    if cart_ids is not None:
+        cart_ids.add(cart_id)
+    else:
+        update_cart_totals(Cart.objects.filter(pk=cart_id))
+
+
+class StockReservation(models.Model):
+    """
+    Stock held for a cart item.
+    
+    Adding to the cart takes the quantity out of Product.stock straight away
+    and records it here. Checkout turns the reservation into an order; if the
+    customer never checks out, the stock is given back once the reservation
+    expires, or when it is deleted with its cart item (see
+    signals.return_reserved_stock).
+    """
+    cart_item = models.OneToOneField(
+        CartItem,
+        on_delete=models.CASCADE,
+        related_name='reservation',
+        help_text="Cart item the stock is held for"
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='reservations',
+        help_text="Product the stock was taken from"
+    )
+    quantity = models.PositiveIntegerField(
+        help_text="Quantity taken out of the product's stock"
+    )
+    expires_at = models.DateTimeField(
+        db_index=True,
+        help_text="When the stock is given back if the cart has not been checked out"
+    )
+    
+    def __str__(self):
+        """String representation of the reservation"""
+        return f"{self.quantity} x {self.product.name} until {self.expires_at}"
+
+
 class Order(models.Model):
     """
     Customer order model.
@@ -0,0 +1,51 @@
+"""
+Shopping Application Paginators
+
+Paginators for admin changelists over large tables.
+"""
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that does not COUNT(*) large, unfiltered tables.
+    
+    When the changelist is not filtered, the row count comes from the
+    database's table statistics (PostgreSQL and MySQL), which is instant but
+    approximate. Filtered querysets, small tables and other databases fall
+    back to an exact count.
+    """
+    ESTIMATE_THRESHOLD = 10000  # Below this, an exact count is cheap enough
+    
+    @cached_property
+    def count(self):
+        """Return the estimated number of rows, or the exact count when an estimate does not apply."""
+        estimate = self.estimated_count()
+        if estimate is not None and estimate >= self.ESTIMATE_THRESHOLD:
+            return estimate
+        return super().count
+    
+    def estimated_count(self):
+        """Return the table statistics row count, or None when the queryset is filtered or the backend has none."""
+        queryset = self.object_list
+        if not hasattr(queryset, 'query') or queryset.query.where:
+            return None
+        
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+        if connection.vendor == 'postgresql':
+            sql = "SELECT reltuples::bigint FROM pg_class WHERE relname = %s"
+        elif connection.vendor == 'mysql':
+            sql = "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s"
+        else:
+            return None
+        
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+        if not row or row[0] is None or row[0] < 0:  # PostgreSQL reports -1 before the first ANALYZE
+            return None
+        return int(row[0])
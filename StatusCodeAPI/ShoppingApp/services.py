@@ -0,0 +1,396 @@
+"""
+Shopping Application Services
+
+This module holds the service layer for the shopping application. Views handle
+requests, sessions and failure simulation; the services do the database work.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+from django.utils import timezone
+
+from .models import (
+    Cart, CartItem, Category, Order, OrderItem, Product, StockReservation, deferred_cart_totals, update_cart_totals
+)
+
+
+class CheckoutError(Exception):
+    """Base class for errors that stop a checkout."""
+
+
+class EmptyCart(CheckoutError):
+    """The cart has no items."""
+
+
+class OutOfStock(CheckoutError):
+    """A product in the cart does not have enough stock left."""
+
+    def __init__(self, product):
+        super().__init__(f"Out of stock: {product.name}")
+        self.product = product
+
+
+class ReservationLost(CheckoutError):
+    """A reservation was released while the cart was being checked out."""
+
+
+class InventoryService:
+    """
+    Holds stock for carts (Single Responsibility Principle)
+
+    Stock is taken with a conditional UPDATE (``stock = stock - qty WHERE
+    stock >= qty``) when an item is added to the cart, so concurrent customers
+    can never reserve more than there is. Reservations expire after
+    SHOPPINGAPP_RESERVATION_TTL seconds and are then given back, either by
+    release_expired() (run it periodically) or on demand when a product runs out.
+    Whoever zeroes a reservation's quantity owns its stock: checkout keeps it,
+    while release, or deleting the reservation in any way (including a cascade
+    from its cart item, cart or product), gives it back, and the two can never
+    both happen.
+    """
+    DEFAULT_TTL = 15 * 60  # 15 minutes
+
+    @classmethod
+    def ttl(cls):
+        return getattr(settings, 'SHOPPINGAPP_RESERVATION_TTL', cls.DEFAULT_TTL)
+
+    @staticmethod
+    def take_stock(product_id, quantity):
+        """Atomically take ``quantity`` from the product's stock. Returns False if there is not enough."""
+        return Product.objects.filter(pk=product_id, stock__gte=quantity).update(stock=F('stock') - quantity) == 1
+
+    @staticmethod
+    def return_stock(reservation):
+        """
+        Claim a reservation's stock and put it back on the product, unless someone
+        else (checkout or another release) claimed it first.
+
+        The claim is a compare-and-set of the quantity to zero, so it needs no row
+        locks; a stale ``reservation`` (added to since it was loaded) is re-read.
+
+        Returns:
+            bool: Whether the stock was given back
+        """
+        quantity = reservation.quantity
+        while quantity:
+            if StockReservation.objects.filter(pk=reservation.pk, quantity=quantity).update(quantity=0):
+                Product.objects.filter(pk=reservation.product_id).update(stock=F('stock') + quantity)
+                return True
+            quantity = StockReservation.objects.filter(pk=reservation.pk).values_list('quantity', flat=True).first()
+        return False
+
+    @classmethod
+    def release(cls, reservation):
+        """
+        Give a reservation's stock back and delete it.
+
+        Returns:
+            bool: Whether the stock was given back
+        """
+        with transaction.atomic():
+            released = cls.return_stock(reservation)
+            StockReservation.objects.filter(pk=reservation.pk).delete()
+        return released
+
+    @classmethod
+    def release_expired(cls, product=None, limit=None):
+        """
+        Give back the stock of expired reservations.
+
+        Args:
+            product (Product, optional): Only release reservations of this product
+            limit (int, optional): Release at most this many reservations
+
+        Returns:
+            int: Number of reservations released
+        """
+        expired = StockReservation.objects.filter(expires_at__lt=timezone.now()).order_by('expires_at')
+        if product is not None:
+            expired = expired.filter(product=product)
+        if limit is not None:
+            expired = expired[:limit]
+        return sum(cls.release(reservation) for reservation in expired)
+
+    @classmethod
+    def release_cart(cls, cart):
+        """Give back the stock held by every item of the cart (e.g. before clearing it)."""
+        return sum(cls.release(reservation) for reservation in StockReservation.objects.filter(cart_item__cart=cart))
+
+    @classmethod
+    def add_to_cart(cls, cart, product, quantity):
+        """
+        Reserve stock and add it to the cart.
+
+        Args:
+            cart (Cart): The customer's shopping cart
+            product (Product): The product to add
+            quantity (int): How many to add
+
+        Returns:
+            CartItem: The cart item holding the product
+
+        Raises:
+            OutOfStock: If there is not enough unreserved stock
+        """
+        with transaction.atomic():
+            if not cls.take_stock(product.pk, quantity):
+                # Stock held by abandoned carts may be due back
+                if not cls.release_expired(product=product) or not cls.take_stock(product.pk, quantity):
+                    raise OutOfStock(product)
+
+            cart_item, created = CartItem.objects.get_or_create(
+                cart=cart,
+                product=product,
+                defaults={'quantity': quantity}
+            )
+            if not created:
+                CartItem.objects.filter(pk=cart_item.pk).update(quantity=F('quantity') + quantity)
+                cart_item.refresh_from_db(fields=['quantity'])
+                update_cart_totals(Cart.objects.filter(pk=cart.pk))
+
+            expires_at = timezone.now() + timedelta(seconds=cls.ttl())
+            reservation, created = StockReservation.objects.get_or_create(
+                cart_item=cart_item,
+                defaults={'product': product, 'quantity': quantity, 'expires_at': expires_at}
+            )
+            if not created:
+                # Adding more keeps the whole item reserved for another TTL
+                StockReservation.objects.filter(pk=reservation.pk).update(
+                    quantity=F('quantity') + quantity,
+                    expires_at=expires_at
+                )
+        return cart_item
+
+
+class CheckoutService:
+    """
+    Turns a cart into an order (Single Responsibility Principle)
+
+    The whole checkout runs inside one transaction with a fixed number of
+    queries, whatever the number of items in the cart:
+    the cart items with their products, the order, one bulk insert of the
+    order items, claiming the stock reservations, one conditional stock UPDATE
+    for whatever was not reserved, one DELETE of the cart items and one UPDATE
+    of the cart's cached totals.
+    """
+
+    @staticmethod
+    def get_cart_items(cart):
+        """
+        Load the cart items together with their products in one query.
+
+        Args:
+            cart (Cart): The customer's shopping cart
+
+        Returns:
+            list[CartItem]: The cart items, each with its product already loaded
+        """
+        return list(CartItem.objects.filter(cart=cart).select_related('product'))
+
+    @staticmethod
+    def decrement_stock(quantities):
+        """
+        Decrement stock for every product in one conditional UPDATE.
+
+        Each product is only decremented when it still has enough stock, so two
+        concurrent checkouts can never take the stock below zero.
+
+        Args:
+            quantities (dict): Quantity to take, keyed by product ID
+
+        Raises:
+            OutOfStock: If any product lacks stock. Call this inside a
+                transaction so the other decrements are rolled back.
+        """
+        condition = Q()
+        for product_id, quantity in quantities.items():
+            condition |= Q(pk=product_id, stock__gte=quantity)
+        updated = Product.objects.filter(condition).update(
+            stock=Case(
+                *[When(pk=product_id, then=F('stock') - quantity) for product_id, quantity in quantities.items()],
+                default=F('stock'),
+                output_field=PositiveIntegerField(),
+            )
+        )
+        if updated != len(quantities):
+            # Only on failure: find the product that ran out to report it
+            for product in Product.objects.filter(pk__in=quantities):
+                if product.stock < quantities[product.pk]:
+                    raise OutOfStock(product)
+            raise CheckoutError("Stock changed during checkout")
+
+    @classmethod
+    def checkout(cls, cart, customer_id, cart_items=None, simulate_partial_failure=False):
+        """
+        Create an order from the cart, decrement stock and empty the cart, atomically.
+
+        Args:
+            cart (Cart): The customer's shopping cart
+            customer_id (str): The unique identifier for the customer
+            cart_items (list[CartItem], optional): Items already loaded with
+                get_cart_items(), to avoid loading them again
+            simulate_partial_failure (bool): Fail after the order items are
+                written, to demonstrate that nothing is left behind
+
+        Returns:
+            Order: The new order
+
+        Raises:
+            EmptyCart: If the cart has no items
+            OutOfStock: If a product does not have enough stock
+        """
+        if cart_items is None:
+            cart_items = cls.get_cart_items(cart)
+        if not cart_items:
+            raise EmptyCart("Your cart is empty")
+
+        total = sum(item.product.price * item.quantity for item in cart_items)
+
+        with transaction.atomic():
+            order = Order.objects.create(customer_id=customer_id, total_amount=total)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=item.product, quantity=item.quantity, price=item.product.price)
+                for item in cart_items
+            ])
+
+            if simulate_partial_failure:
+                raise CheckoutError("Simulated partial order failure")
+
+            # Claim the stock reserved when the items were added by zeroing the reservations (deleting
+            # the cart items then removes them without giving the stock back); a reservation released
+            # or changed in the meantime makes the counts differ and the customer retries the checkout
+            reservations = list(StockReservation.objects.filter(cart_item__in=cart_items, quantity__gt=0))
+            if reservations:
+                condition = Q()
+                for reservation in reservations:
+                    condition |= Q(pk=reservation.pk, quantity=reservation.quantity)
+                claimed = StockReservation.objects.filter(condition).update(quantity=0)
+                if claimed != len(reservations):
+                    raise ReservationLost("A reservation expired during checkout")
+            reserved = {r.cart_item_id: r.quantity for r in reservations}
+
+            # Anything not (or no longer) reserved is taken from stock now
+            quantities = {}
+            for item in cart_items:
+                missing = item.quantity - reserved.get(item.pk, 0)
+                if missing > 0:
+                    quantities[item.product_id] = quantities.get(item.product_id, 0) + missing
+            if quantities:
+                cls.decrement_stock(quantities)
+
+            with deferred_cart_totals():
+                CartItem.objects.filter(pk__in=[item.pk for item in cart_items]).delete()
+
+        return order
+
+
+class CatalogService:
+    """
+    Cached read model of the catalog for the browse pages (Single Responsibility Principle)
+    
+    Categories, featured products, per-category product lists and product
+    details are cached under keys that include a catalog version. Saving or
+    deleting a Product or Category bumps the version once the change is
+    committed (see signals.invalidate_catalog), so every cached entry is
+    replaced on next use and stale entries simply expire. On a warm cache the
+    browse pages run no catalog queries.
+    
+    Stock changed with queryset updates (cart reservations, checkout) does not
+    bump the version: cached stock figures may lag by up to CACHE_TIMEOUT, but
+    add to cart and checkout always check the database.
+    """
+    CACHE_PREFIX = "catalog_"
+    CACHE_TIMEOUT = 300  # 5 minutes
+    VERSION_KEY = "catalog_version"
+    FEATURED_COUNT = 6
+    
+    @classmethod
+    def version(cls):
+        """Return the current catalog version"""
+        return cache.get(cls.VERSION_KEY, 0)
+    
+    @classmethod
+    def bump_version(cls):
+        """Invalidate every cached catalog entry"""
+        cache.add(cls.VERSION_KEY, 0, None)
+        try:
+            cache.incr(cls.VERSION_KEY)
+        except ValueError:
+            cache.set(cls.VERSION_KEY, 1, None)
+    
+    @classmethod
+    def _get_or_load(cls, name, loader):
+        """Return the cached entry ``name`` for the current version, loading and caching it on a miss"""
+        cache_key = f"{cls.CACHE_PREFIX}v{cls.version()}_{name}"
+        value = cache.get(cache_key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                cache.set(cache_key, value, cls.CACHE_TIMEOUT)
+        return value
+    
+    @classmethod
+    def get_categories(cls):
+        """Return all categories"""
+        return cls._get_or_load('categories', lambda: list(Category.objects.all()))
+    
+    @classmethod
+    def get_featured_products(cls):
+        """Return the products featured on the homepage"""
+        return cls._get_or_load('featured', lambda: list(Product.objects.all()[:cls.FEATURED_COUNT]))
+    
+    @classmethod
+    def get_category_products(cls, category_id):
+        """
+        Return a category and its products.
+        
+        Returns:
+            tuple: (Category, list[Product]), or None if the category does not exist
+        """
+        def load():
+            category = Category.objects.filter(pk=category_id).first()
+            if category is None:
+                return None
+            return category, list(Product.objects.filter(category=category))
+        return cls._get_or_load(f'category_{category_id}', load)
+    
+    @classmethod
+    def get_product(cls, product_id):
+        """Return a product with its category, or None if it does not exist"""
+        return cls._get_or_load(
+            f'product_{product_id}',
+            lambda: Product.objects.select_related('category').filter(pk=product_id).first()
+        )
+    
+    @classmethod
+    def warm(cls):
+        """
+        Load every catalog entry into the cache.
+        
+        Returns:
+            int: Number of entries cached
+        """
+        categories = list(Category.objects.all())
+        products = list(Product.objects.select_related('category'))
+        by_category = {category.pk: [] for category in categories}
+        for product in products:
+            by_category.setdefault(product.category_id, []).append(product)
+        
+        version = cls.version()
+        entries = {
+            'categories': categories,
+            'featured': products[:cls.FEATURED_COUNT],
+        }
+        for category in categories:
+            entries[f'category_{category.pk}'] = (category, by_category[category.pk])
+        for product in products:
+            entries[f'product_{product.pk}'] = product
+        cache.set_many(
+            {f"{cls.CACHE_PREFIX}v{version}_{name}": value for name, value in entries.items()},
+            cls.CACHE_TIMEOUT
+        )
+        return len(entries)
@@ -0,0 +1,38 @@
+"""
+Shopping Application Signal Handlers
+
+Connected by ShoppingAppConfig.ready(), so they run in every process that loads
+the app (web, shell, workers, management commands), not only where the views
+are imported. They keep reserved stock and cached cart totals right however a
+cart item is deleted: one at a time, with a queryset, from the admin, or by a
+cascade from its cart or product, and invalidate the cached catalog.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import CartItem, Category, Product, StockReservation, cart_items_deleted
+from .services import CatalogService, InventoryService
+
+
+@receiver(pre_delete, sender=StockReservation, dispatch_uid="shoppingapp_reservation_deleted")
+def return_reserved_stock(sender, instance, **kwargs):
+    """Give back the stock of a reservation deleted before checkout, e.g. by a cascade from its cart or product"""
+    InventoryService.return_stock(instance)
+
+
+@receiver(post_delete, sender=CartItem, dispatch_uid="shoppingapp_cart_item_deleted")
+def refresh_cart_totals(sender, instance, **kwargs):
+    """Keep the cart's cached totals right however an item is deleted, e.g. by a cascade from its product"""
+    cart_items_deleted(instance.cart_id)
+
+
+@receiver(post_save, sender=Product, dispatch_uid="shoppingapp_catalog_product_saved")
+@receiver(post_delete, sender=Product, dispatch_uid="shoppingapp_catalog_product_deleted")
+@receiver(post_save, sender=Category, dispatch_uid="shoppingapp_catalog_category_saved")
+@receiver(post_delete, sender=Category, dispatch_uid="shoppingapp_catalog_category_deleted")
+def invalidate_catalog(sender, using=None, **kwargs):
+    """Bump the catalog version whenever a product or category changes"""
+    # After commit: bumping earlier would let a concurrent request cache the old rows under the new version
+    transaction.on_commit(CatalogService.bump_version, using=using)
@@ -0,0 +1,323 @@
+import threading
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from . import paginators, views
+from .models import Cart, CartItem, Category, Order, OrderItem, Product, StockReservation, deferred_cart_totals
+from .paginators import EstimatedCountPaginator
+from .services import CatalogService, CheckoutService, InventoryService, OutOfStock, ReservationLost
+
+
+class ShoppingMixin:
+    """A category and helpers to build products and carts."""
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name="Books")
+
+    def make_products(self, count, stock=10, price=Decimal('2.50')):
+        return [
+            Product.objects.create(name=f"Product {i}", description="", price=price, category=self.category, stock=stock)
+            for i in range(count)
+        ]
+
+    def make_cart(self, products, quantity=3, customer_id="customer"):
+        cart = Cart.objects.create(customer_id=customer_id)
+        for product in products:
+            CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+        return cart
+
+
+class ShoppingTestCase(ShoppingMixin, TestCase):
+    pass
+
+
+class CheckoutQueryTests(ShoppingTestCase):
+    # The same for one item or many: see CheckoutService
+    CHECKOUT_QUERIES = 11
+
+    def checkout(self, item_count):
+        cart = self.make_cart(self.make_products(item_count), customer_id=f"customer-{item_count}")
+        with self.assertNumQueries(self.CHECKOUT_QUERIES):
+            order = CheckoutService.checkout(cart, cart.customer_id)
+        return order
+
+    def test_single_item_checkout_query_count(self):
+        order = self.checkout(1)
+        self.assertEqual(order.items.count(), 1)
+
+    def test_query_count_does_not_grow_with_items(self):
+        order = self.checkout(25)
+        self.assertEqual(order.items.count(), 25)
+        self.assertEqual(order.total_amount, Decimal('2.50') * 3 * 25)
+        self.assertEqual(set(Product.objects.values_list('stock', flat=True)), {7})
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class ReservationReleaseTests(ShoppingTestCase):
+    def reserve(self, products, quantity=3):
+        cart = Cart.objects.create(customer_id="customer")
+        for product in products:
+            InventoryService.add_to_cart(cart, product, quantity)
+        return cart
+
+    def assertStock(self, products, stock):
+        self.assertEqual([product.stock for product in Product.objects.filter(pk__in=[p.pk for p in products])],
+                         [stock] * len(products))
+
+    def test_deleting_cart_gives_stock_back(self):
+        products = self.make_products(2)
+        cart = self.reserve(products)
+        self.assertStock(products, 7)
+        cart.delete()
+        self.assertStock(products, 10)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_queryset_delete_of_items_gives_stock_back(self):
+        products = self.make_products(2)
+        self.reserve(products)
+        self.reserve(products[:1], quantity=2)
+        CartItem.objects.filter(product=products[0]).delete()
+        self.assertStock(products[:1], 10)
+        self.assertStock(products[1:], 7)
+
+    def test_release_gives_stock_back_once(self):
+        product, = self.make_products(1)
+        self.reserve([product])
+        reservation = StockReservation.objects.get()
+        self.assertTrue(InventoryService.release(reservation))
+        self.assertFalse(InventoryService.release(reservation))
+        self.assertStock([product], 10)
+
+    def test_checkout_keeps_reserved_stock(self):
+        products = self.make_products(2)
+        cart = self.reserve(products)
+        CheckoutService.checkout(cart, cart.customer_id)
+        self.assertStock(products, 7)
+        self.assertFalse(StockReservation.objects.exists())
+
+
+class OversellStressTests(ShoppingMixin, TransactionTestCase):
+    threads = 12
+    stock = 5
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # Threads get their own connections, which cannot share an in-memory database
+            self.skipTest("needs a file test database, e.g. DATABASES['default']['TEST']['NAME']")
+        super().setUp()
+
+    def test_concurrent_customers_cannot_oversell(self):
+        product, = self.make_products(1, stock=self.stock)
+        sold = []
+        errors = []
+        start = threading.Barrier(self.threads)
+
+        def customer(i):
+            try:
+                cart = Cart.objects.create(customer_id=f"customer-{i}")
+                start.wait()
+                try:
+                    InventoryService.add_to_cart(cart, product, 1)
+                    CheckoutService.checkout(cart, cart.customer_id)
+                    sold.append(1)
+                except (OutOfStock, ReservationLost):
+                    pass
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=customer, args=(i,)) for i in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        product.refresh_from_db()
+        ordered = sum(OrderItem.objects.values_list('quantity', flat=True))
+        self.assertEqual(len(sold), self.stock)
+        self.assertEqual(ordered, self.stock)
+        self.assertEqual(product.stock, 0)
+
+
+class CartTotalsTests(ShoppingTestCase):
+    def assertTotals(self, cart, total, item_count):
+        cart.refresh_from_db(fields=['cached_total', 'cached_item_count'])
+        self.assertEqual((cart.cached_total, cart.cached_item_count), (total, item_count))
+
+    def test_deleting_product_updates_carts(self):
+        products = self.make_products(2)
+        carts = [self.make_cart(products, customer_id=f"customer-{i}") for i in range(2)]
+        products[0].delete()
+        for cart in carts:
+            self.assertTotals(cart, Decimal('7.50'), 1)
+
+    def test_queryset_delete_updates_each_cart_once(self):
+        products = self.make_products(3)
+        carts = [self.make_cart(products, customer_id=f"customer-{i}") for i in range(2)]
+        with self.assertNumQueries(4):  # Items, their reservations, one DELETE and one UPDATE
+            with deferred_cart_totals():
+                CartItem.objects.filter(product__in=products[:2]).delete()
+        for cart in carts:
+            self.assertTotals(cart, Decimal('7.50'), 1)
+
+    def test_item_delete_updates_cart(self):
+        cart = self.make_cart(self.make_products(2))
+        cart.items.first().delete()
+        self.assertTotals(cart, Decimal('7.50'), 1)
+
+
+class AdminChangelistQueryTests(ShoppingTestCase):
+    # The same for one row or a full page: see CartAdmin and OrderAdmin
+    CART_CHANGELIST_QUERIES = 4
+    ORDER_CHANGELIST_QUERIES = 6
+
+    def setUp(self):
+        super().setUp()
+        self.products = self.make_products(3)
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "password"))
+
+    def add_rows(self, count):
+        for i in range(count):
+            customer_id = f"customer-{Cart.objects.count()}"
+            self.make_cart(self.products, customer_id=customer_id)
+            order = Order.objects.create(customer_id=customer_id, total_amount=Decimal('22.50'))
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=3, price=product.price) for product in self.products
+            ])
+
+    def assertChangelistQueries(self, model, queries):
+        url = reverse(f"admin:{model._meta.app_label}_{model._meta.model_name}_changelist")
+        for rows in (1, 40):
+            self.add_rows(rows - model.objects.count())
+            with self.subTest(rows=rows), self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['cl'].result_count, rows)
+
+    def test_cart_changelist_query_count(self):
+        self.assertChangelistQueries(Cart, self.CART_CHANGELIST_QUERIES)
+
+    def test_order_changelist_query_count(self):
+        self.assertChangelistQueries(Order, self.ORDER_CHANGELIST_QUERIES)
+
+
+class EstimatedCountPaginatorTests(ShoppingTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            Cart.objects.create(customer_id=f"customer-{i}")
+
+    def postgresql(self, reltuples):
+        """Stand-in for connections with a PostgreSQL connection whose statistics report ``reltuples`` rows."""
+        connection = mock.MagicMock(vendor='postgresql')
+        connection.cursor.return_value.__enter__.return_value.fetchone.return_value = (reltuples,)
+        return mock.patch.object(paginators, 'connections', {'default': connection})
+
+    def test_large_unfiltered_table_uses_the_estimate(self):
+        paginator = EstimatedCountPaginator(Cart.objects.order_by('pk'), 100)
+        with mock.patch.object(EstimatedCountPaginator, 'estimated_count', return_value=50000), \
+                self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 50000)
+        self.assertEqual(paginator.num_pages, 500)
+
+    def test_statistics_are_read_on_postgresql(self):
+        with self.postgresql(50000):
+            self.assertEqual(EstimatedCountPaginator(Cart.objects.order_by('pk'), 100).count, 50000)
+        with self.postgresql(-1):  # Never analyzed
+            self.assertIsNone(EstimatedCountPaginator(Cart.objects.order_by('pk'), 100).estimated_count())
+
+    def test_small_estimate_falls_back_to_exact_count(self):
+        with mock.patch.object(EstimatedCountPaginator, 'estimated_count', return_value=10):
+            self.assertEqual(EstimatedCountPaginator(Cart.objects.order_by('pk'), 100).count, 3)
+
+    def test_filtered_queryset_uses_exact_count(self):
+        paginator = EstimatedCountPaginator(Cart.objects.filter(customer_id="customer-1").order_by('pk'), 100)
+        with self.postgresql(50000):
+            self.assertIsNone(paginator.estimated_count())
+            self.assertEqual(paginator.count, 1)
+
+
+class CatalogServiceTests(ShoppingTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.products = self.make_products(3)
+        self.empty = Category.objects.create(name="Empty")
+        # Only the browse logic is under test: the status-log write is stubbed out and templates are not rendered
+        self.log_status = self.patch(views, 'log_status')
+        self.render = self.patch(views, 'render', side_effect=lambda request, template, context: HttpResponse())
+
+    def patch(self, target, name, **kwargs):
+        patcher = mock.patch.object(target, name, **kwargs)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def get(self, view, *args):
+        request = RequestFactory().get('/')
+        request.session = {'customer_id': "customer"}
+        return view(request, *args)
+
+    def test_warm_cache_browse_pages_run_no_queries(self):
+        CatalogService.warm()
+        pages = [
+            (views.index, ()),
+            (views.category_list, ()),
+            (views.product_list, (self.category.pk,)),
+            (views.product_detail, (self.products[0].pk,)),
+        ]
+        for view, args in pages:
+            with self.subTest(view=view.__name__):
+                self.log_status.reset_mock()
+                with self.assertNumQueries(0):
+                    response = self.get(view, *args)
+                self.assertEqual(response.status_code, 200)
+                self.log_status.assert_called_once()
+                self.assertTrue(self.log_status.call_args.args[2])
+
+        context = self.render.call_args_list[2].args[2]
+        self.assertEqual(context['category'], self.category)
+        self.assertEqual(context['products'], self.products)
+
+    def assertBumpsVersion(self, change):
+        version = CatalogService.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+            self.assertEqual(CatalogService.version(), version)  # Not before the commit
+        self.assertEqual(CatalogService.version(), version + 1)
+
+    def test_product_changes_bump_version(self):
+        product = self.products[0]
+        self.assertBumpsVersion(lambda: self.make_products(1))
+        self.assertBumpsVersion(product.save)
+        self.assertBumpsVersion(product.delete)
+
+    def test_category_changes_bump_version(self):
+        self.assertBumpsVersion(lambda: Category.objects.create(name="Music"))
+        self.assertBumpsVersion(self.empty.save)
+        self.assertBumpsVersion(self.empty.delete)
+
+    def test_saved_product_replaces_cached_entry(self):
+        product = self.products[0]
+        self.assertEqual(CatalogService.get_product(product.pk).name, "Product 0")
+        product.name = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertEqual(CatalogService.get_product(product.pk).name, "Renamed")
+
+    def test_missing_category_or_product_is_404(self):
+        for view in (views.product_list, views.product_detail):
+            with self.subTest(view=view.__name__), self.assertRaises(Http404):
+                self.get(view, 999999)
+        self.log_status.assert_not_called()
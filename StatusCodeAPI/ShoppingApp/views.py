@@ -15,13 +15,14 @@ import uuid
 
 from django.contrib import messages
 from django.core.exceptions import ValidationError
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.http import require_http_methods
 from statustracker.models import StatusLog
 from statustracker.views import log_status
 
-from .models import Cart, CartItem, Category, Order, OrderItem, Product
+from .models import Cart, CartItem, Category, Order, OrderItem, Product, deferred_cart_totals
+from .services import CatalogService, CheckoutService, InventoryService, OutOfStock
 
 
 def get_or_create_cart(customer_id):
@@ -95,8 +96,8 @@ def index(request):
         time.sleep(5)  # 5-second delay
     
     try:
-        # Retrieve all product categories
-        categories = Category.objects.all()
+        # Retrieve all product categories from the catalog cache
+        categories = CatalogService.get_categories()
         
         # Simulate database query failure
         if request.GET.get('fail') == 'query':
@@ -104,7 +105,7 @@ def index(request):
             categories = Category.objects.filter(name__contains=None)
             
         # Get featured products for the homepage
-        featured_products = Product.objects.all()[:6]  # Get some featured products
+        featured_products = CatalogService.get_featured_products()
     except Exception as e:
         # Log and handle database errors
         log_status(StatusLog.SELECT_SHOPPING_PAGE, customer_id, False, f"Database error: {str(e)}")
@@ -133,18 +134,20 @@ def category_list(request):
     # Log the operation
     log_status(StatusLog.SELECT_CATEGORY, customer_id, True, "User viewed categories")
     
-    categories = Category.objects.all()
+    categories = CatalogService.get_categories()
     return render(request, 'shoppingapp/category_list.html', {'categories': categories})
 
 def product_list(request, category_id):
     """Browse products in a category - Status Code: 104"""
     customer_id = request.session.get('customer_id', str(uuid.uuid4()))
-    category = get_object_or_404(Category, id=category_id)
+    catalog_entry = CatalogService.get_category_products(category_id)
+    if catalog_entry is None:
+        raise Http404("No Category matches the given query.")
+    category, products = catalog_entry
     
     # Log the operation
     log_status(StatusLog.BROWSE_ITEMS, customer_id, True, f"User browsed products in {category.name}")
     
-    products = Product.objects.filter(category=category)
     return render(request, 'shoppingapp/product_list.html', {
         'category': category,
         'products': products
@@ -160,9 +163,11 @@ def product_detail(request, product_id):
         messages.error(request, "The product you're looking for doesn't exist or has been removed.")
         return redirect('category_list')
     
+    product = CatalogService.get_product(product_id)
+    if product is None:
+        raise Http404("No Product matches the given query.")
+    
     try:
-        product = get_object_or_404(Product, id=product_id)
-        
         # Simulate data corruption
         if request.GET.get('fail') == 'corrupt':
             log_status(StatusLog.SELECT_ITEM, customer_id, False, f"Product data corruption for {product.name}")
@@ -232,16 +237,13 @@ def add_to_cart(request, product_id):
                 messages.error(request, "Your shopping session has expired. Please try again.")
                 return redirect('index')
                 
-            # Check if product already in cart
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart,
-                product=product,
-                defaults={'quantity': quantity}
-            )
-            
-            if not created:
-                cart_item.quantity += quantity
-                cart_item.save()
+            # Reserve the stock and add it to the cart (or top up the existing item) atomically
+            try:
+                InventoryService.add_to_cart(cart, product, quantity)
+            except OutOfStock:
+                log_status(StatusLog.ADD_TO_CART, customer_id, False, f"Failed to add {product.name} to cart - Insufficient stock")
+                messages.error(request, "Invalid quantity")
+                return redirect('product_detail', product_id=product_id)
             
             # Simulate transaction failure
             if request.GET.get('fail') == 'transaction':
@@ -279,10 +281,11 @@ def cart_view(request):
     """
     customer_id = request.session.get('customer_id', str(uuid.uuid4()))
     cart = get_or_create_cart(customer_id)
-    cart_items = CartItem.objects.filter(cart=cart)
+    # Items with their products in one query (the template shows product details)
+    cart_items = CartItem.objects.filter(cart=cart).select_related('product')
     
-    # Calculate total price of all items in cart
-    total = sum(item.product.price * item.quantity for item in cart_items)
+    # Total kept on the cart by update_cart_totals(), no per-item arithmetic or queries
+    total = cart.cached_total
     
     return render(request, 'shoppingapp/cart.html', {
         'cart_items': cart_items,
@@ -314,9 +317,11 @@ def clear_cart(request):
             messages.error(request, "Your shopping session has expired. Please try again.")
             return redirect('index')
             
-        # Delete all cart items
+        # Give back the stock reserved for the items, then delete them
+        InventoryService.release_cart(cart)
         item_count = CartItem.objects.filter(cart=cart).count()
-        CartItem.objects.filter(cart=cart).delete()
+        with deferred_cart_totals():
+            CartItem.objects.filter(cart=cart).delete()
         
         # Log the operation (using ADD_TO_CART code since there's no specific clear cart code)
         log_status(
@@ -383,7 +388,8 @@ def checkout(request):
             messages.error(request, "Your shopping session has expired. Please try again.")
             return redirect('index')
             
-        cart_items = CartItem.objects.filter(cart=cart)
+        # Items and their products in one query
+        cart_items = CheckoutService.get_cart_items(cart)
         
         if not cart_items:
             # Log failure
@@ -391,9 +397,6 @@ def checkout(request):
             messages.error(request, "Your cart is empty")
             return redirect('cart_view')
         
-        # Calculate total
-        total = sum(item.product.price * item.quantity for item in cart_items)
-        
         # Simulate third-party service failure
         if request.GET.get('fail') == 'service':
             service_type = request.GET.get('type', 'shipping')
@@ -414,52 +417,34 @@ def checkout(request):
             messages.error(request, "We're experiencing technical difficulties. Please try again later.")
             return redirect('cart_view')
         
+        # Simulate out-of-stock condition (nothing is written; real shortages raise OutOfStock below)
+        if request.GET.get('fail') == 'stock':
+            product = cart_items[0].product
+            log_status(StatusLog.BUY_ITEM, customer_id, False, f"Out of stock: {product.name}")
+            messages.error(request, f"{product.name} is out of stock. Please remove it from your cart.")
+            return redirect('cart_view')
+        
         try:
-            # Create order
-            order = Order.objects.create(
-                customer_id=customer_id,
-                total_amount=total
+            # Create the order and its items, decrement stock and clear the cart in one transaction
+            # (a simulated partial failure rolls all of it back)
+            order = CheckoutService.checkout(
+                cart,
+                customer_id,
+                cart_items=cart_items,
+                simulate_partial_failure=request.GET.get('fail') == 'partial'
             )
             
-            # Simulate partial order failure
-            partial_failure = request.GET.get('fail') == 'partial'
-            processed_items = 0
-            
-            # Create order items
-            for cart_item in cart_items:
-                # If simulating partial failure, fail after processing half the items
-                if partial_failure and processed_items >= len(cart_items) // 2:
-                    raise Exception("Simulated partial order failure")
-                
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    quantity=cart_item.quantity,
-                    price=cart_item.product.price
-                )
-                
-                # Update product stock
-                product = cart_item.product
-                
-                # Simulate out-of-stock condition
-                if request.GET.get('fail') == 'stock' and product.stock < cart_item.quantity:
-                    log_status(StatusLog.BUY_ITEM, customer_id, False, f"Out of stock: {product.name}")
-                    messages.error(request, f"{product.name} is out of stock. Please remove it from your cart.")
-                    return redirect('cart_view')
-                
-                product.stock -= cart_item.quantity
-                product.save()
-                processed_items += 1
-            
-            # Clear cart
-            cart_items.delete()
-            
             # Log success
             log_status(StatusLog.BUY_ITEM, customer_id, True, f"Completed purchase - Order #{order.id}")
             
             messages.success(request, "Your order has been placed successfully!")
             return redirect('order_confirmation', order_id=order.id)
             
+        except OutOfStock as e:
+            log_status(StatusLog.BUY_ITEM, customer_id, False, f"Out of stock: {e.product.name}")
+            messages.error(request, f"{e.product.name} is out of stock. Please remove it from your cart.")
+            return redirect('cart_view')
+            
         except Exception as e:
             # Log order processing failure
             log_status(StatusLog.BUY_ITEM, customer_id, False, f"Order processing error: {str(e)}")